@@ -0,0 +1,360 @@
+# backend/ann_index.py
+import os
+import time
+import argparse
+import tempfile
+
+import numpy as np
+
+# IVF (inverted file) over L2-normaliserte vektorer:
+#   - k-means (sfærisk, dvs. cosine) deler katalogen i `nlist` klynger
+#   - et søk scorer bare sentroidene + radene i de `nprobe` nærmeste klyngene
+# Arbeid per søk ~ nlist*D + N*nprobe/nlist*D i stedet for N*D.
+#
+# PQ (product quantization) for lite minne:
+#   - vektoren deles i `m` delvektorer, hver kodes som 1 byte (256 kodeord per delrom)
+#   - 512 float32 (2 KB) -> m byte (32–64), scoring via tabelloppslag (ADC)
+#   - topp-kandidatene re-rankes eksakt mot de fulle vektorene (gjerne memory-mappet)
+
+ASSIGN_CHUNK = 65536  # rader per matmul ved tilordning (holder minnet flatt)
+
+
+def _normalize(x: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(x, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return x / norms
+
+
+def _assign(x: np.ndarray, centroids: np.ndarray, spherical: bool = True) -> np.ndarray:
+    """
+    Nærmeste sentroide for hver rad, i biter.
+    spherical=True: størst dot (cosine). False: minst L2-avstand, dvs. størst x·c - |c|²/2.
+    """
+    bias = None if spherical else -0.5 * np.einsum("ij,ij->i", centroids, centroids)
+    out = np.empty(x.shape[0], dtype=np.int32)
+    for i in range(0, x.shape[0], ASSIGN_CHUNK):
+        chunk = np.asarray(x[i:i + ASSIGN_CHUNK], dtype=np.float32)
+        scores = chunk @ centroids.T
+        if bias is not None:
+            scores += bias
+        out[i:i + ASSIGN_CHUNK] = np.argmax(scores, axis=1)
+    return out
+
+
+def kmeans(x: np.ndarray, k: int, iters: int = 20, max_train: int = 100_000, seed: int = 0,
+           spherical: bool = True) -> np.ndarray:
+    """
+    k-means, sfærisk (cosine) som standard eller vanlig L2 (spherical=False, brukes av PQ).
+    Trener på et tilfeldig utvalg på maks `max_train` rader. Returnerer (k, D) sentroider.
+    """
+    rng = np.random.default_rng(seed)
+    n = x.shape[0]
+    if k > n:
+        raise ValueError(f"k={k} er større enn antall vektorer ({n})")
+    train_idx = np.sort(rng.choice(n, size=min(n, max_train), replace=False))
+    sample = np.asarray(x[train_idx], dtype=np.float32)
+    centroids = sample[rng.choice(sample.shape[0], size=k, replace=False)].copy()
+
+    for _ in range(iters):
+        assign = _assign(sample, centroids, spherical)
+        order = np.argsort(assign, kind="stable")
+        counts = np.bincount(assign, minlength=k)
+        nonempty = np.flatnonzero(counts)
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))[nonempty]
+        sums = np.add.reduceat(sample[order], starts, axis=0)
+        centroids[nonempty] = sums if spherical else sums / counts[nonempty, None]
+        empty = np.flatnonzero(counts == 0)
+        if len(empty):
+            # Tomme klynger får et tilfeldig punkt på nytt
+            centroids[empty] = sample[rng.choice(sample.shape[0], size=len(empty), replace=False)]
+        if spherical:
+            centroids = _normalize(centroids)
+    return centroids.astype(np.float32)
+
+
+def default_nlist(n: int) -> int:
+    # Tommelfingerregel: ~4*sqrt(N) klynger, minst 1
+    return max(1, min(n, int(4 * np.sqrt(n))))
+
+
+class IVFIndex:
+    """
+    Invertert fil-indeks. Holder bare sentroider og radnumre per klynge (CSR: order + offsets);
+    selve vektorene ligger i VectorStore.matrix (gjerne memory-mappet) og sendes inn ved søk.
+    """
+
+    def __init__(self, centroids: np.ndarray, order: np.ndarray, offsets: np.ndarray, nprobe: int = 8):
+        self.centroids = np.ascontiguousarray(centroids, dtype=np.float32)
+        self.order = np.asarray(order, dtype=np.int64)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.nprobe = nprobe
+
+    @property
+    def nlist(self) -> int:
+        return self.centroids.shape[0]
+
+    @property
+    def count(self) -> int:
+        return self.order.shape[0]
+
+    @classmethod
+    def build(cls, vectors: np.ndarray, nlist: int | None = None, iters: int = 20,
+              nprobe: int = 8, seed: int = 0) -> "IVFIndex":
+        started = time.time()
+        nlist = nlist or default_nlist(vectors.shape[0])
+        centroids = kmeans(vectors, nlist, iters=iters, seed=seed)
+        assign = _assign(vectors, centroids)
+        order = np.argsort(assign, kind="stable")
+        offsets = np.concatenate(([0], np.cumsum(np.bincount(assign, minlength=nlist))))
+        print(f"[IVF] Bygget nlist={nlist} over {vectors.shape[0]} vektorer på {time.time()-started:.1f}s")
+        return cls(centroids, order, offsets, nprobe=nprobe)
+
+    def save(self, path: str):
+        # temp-fil + rename, så en annen prosess aldri leser en halvskrevet indeks
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            np.savez(f, centroids=self.centroids, order=self.order, offsets=self.offsets)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str, nprobe: int = 8) -> "IVFIndex":
+        with np.load(path) as data:
+            return cls(data["centroids"], data["order"], data["offsets"], nprobe=nprobe)
+
+    def candidates(self, query: np.ndarray, nprobe: int | None = None) -> np.ndarray:
+        """Radnumre i de nprobe klyngene nærmest spørringen."""
+        nprobe = min(nprobe or self.nprobe, self.nlist)
+        cs = self.centroids @ query
+        probe = np.argpartition(-cs, nprobe - 1)[:nprobe]
+        return np.concatenate([self.order[self.offsets[c]:self.offsets[c + 1]] for c in probe])
+
+    def search(self, vectors: np.ndarray, query: np.ndarray, k: int,
+               nprobe: int | None = None) -> list[tuple[int, float]]:
+        ids = self.candidates(query, nprobe)
+        return topk_exact(vectors, query, k, ids)
+
+
+class ProductQuantizer:
+    """
+    Deler D-dim vektorer i m delrom à D/m dimensjoner og lærer ks (≤256) kodeord per delrom.
+    codebooks: (m, ks, D/m). Hver vektor lagres som m byte (uint8).
+    """
+
+    def __init__(self, codebooks: np.ndarray):
+        self.codebooks = np.ascontiguousarray(codebooks, dtype=np.float32)
+
+    @property
+    def m(self) -> int:
+        return self.codebooks.shape[0]
+
+    @property
+    def ks(self) -> int:
+        return self.codebooks.shape[1]
+
+    @property
+    def dsub(self) -> int:
+        return self.codebooks.shape[2]
+
+    @classmethod
+    def train(cls, vectors: np.ndarray, m: int = 64, ks: int = 256, iters: int = 20,
+              max_train: int = 50_000, seed: int = 0) -> "ProductQuantizer":
+        n, dim = vectors.shape
+        if dim % m:
+            raise ValueError(f"D={dim} er ikke delelig med m={m}")
+        ks = min(ks, 256, n)
+        dsub = dim // m
+        rng = np.random.default_rng(seed)
+        sample = np.asarray(vectors[np.sort(rng.choice(n, size=min(n, max_train), replace=False))], dtype=np.float32)
+        books = np.empty((m, ks, dsub), dtype=np.float32)
+        for j in range(m):
+            sub = np.ascontiguousarray(sample[:, j * dsub:(j + 1) * dsub])
+            books[j] = kmeans(sub, ks, iters=iters, max_train=sub.shape[0], seed=seed + j, spherical=False)
+        return cls(books)
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        """(N, D) -> (N, m) uint8-koder."""
+        codes = np.empty((vectors.shape[0], self.m), dtype=np.uint8)
+        for i in range(0, vectors.shape[0], ASSIGN_CHUNK):
+            chunk = np.asarray(vectors[i:i + ASSIGN_CHUNK], dtype=np.float32)
+            for j in range(self.m):
+                sub = chunk[:, j * self.dsub:(j + 1) * self.dsub]
+                codes[i:i + ASSIGN_CHUNK, j] = _assign(sub, self.codebooks[j], spherical=False)
+        return codes
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        """(N, m) -> (N, D) approksimerte vektorer."""
+        return self.codebooks[np.arange(self.m), codes].reshape(codes.shape[0], -1)
+
+    def score_table(self, query: np.ndarray) -> np.ndarray:
+        """(m, ks): q_j · kodeord_j,c. Summen over j gir approksimert dot (ADC)."""
+        q = query.reshape(self.m, 1, self.dsub)
+        return np.matmul(self.codebooks, q.transpose(0, 2, 1))[..., 0]
+
+    def scores(self, codes_t: np.ndarray, table: np.ndarray) -> np.ndarray:
+        """
+        ADC-score for kolonnevise koder (m, N): sum_j table[j, codes_t[j]].
+        Ett take() per delrom over en sammenhengende uint8-rad er mye raskere enn fancy-indeksering over (N, m).
+        """
+        out = np.zeros(codes_t.shape[1], dtype=np.float32)
+        for j in range(self.m):
+            out += table[j].take(codes_t[j])
+        return out
+
+
+class PQIndex:
+    """
+    Komprimert søk: ADC-score over PQ-kodene (valgfritt bare i IVF-kandidatene),
+    deretter eksakt re-rank av de `rerank` beste mot de fulle vektorene.
+    Kun kodene (N*m byte) trenger å ligge i RAM; fulle vektorer leses bare for kandidatene.
+    Kodene lagres kolonnevis (m, N) for rask scoring.
+    """
+
+    def __init__(self, pq: ProductQuantizer, codes: np.ndarray, rerank: int = 100,
+                 ivf: IVFIndex | None = None):
+        self.pq = pq
+        self.codes_t = np.ascontiguousarray(np.asarray(codes, dtype=np.uint8).T)  # (m, N)
+        self.rerank = rerank
+        self.ivf = ivf
+
+    @property
+    def count(self) -> int:
+        return self.codes_t.shape[1]
+
+    @property
+    def nbytes(self) -> int:
+        return self.codes_t.nbytes
+
+    @classmethod
+    def build(cls, vectors: np.ndarray, m: int = 64, rerank: int = 100,
+              ivf: IVFIndex | None = None, seed: int = 0) -> "PQIndex":
+        started = time.time()
+        pq = ProductQuantizer.train(vectors, m=m, seed=seed)
+        codes = pq.encode(vectors)
+        print(f"[PQ] Bygget m={m} ({vectors.shape[1]*4} -> {m} byte per vektor) "
+              f"over {vectors.shape[0]} vektorer på {time.time()-started:.1f}s")
+        return cls(pq, codes, rerank=rerank, ivf=ivf)
+
+    def save(self, path: str):
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            np.savez(f, codebooks=self.pq.codebooks, codes=self.codes_t.T)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str, rerank: int = 100, ivf: IVFIndex | None = None) -> "PQIndex":
+        with np.load(path) as data:
+            return cls(ProductQuantizer(data["codebooks"]), data["codes"], rerank=rerank, ivf=ivf)
+
+    def search(self, vectors: np.ndarray | None, query: np.ndarray, k: int,
+               rerank: int | None = None, nprobe: int | None = None,
+               ids: np.ndarray | None = None) -> list[tuple[int, float]]:
+        """ids: begrens til disse radene (f.eks. én kategori-partisjon) i stedet for IVF-kandidatene."""
+        rerank = self.rerank if rerank is None else rerank
+        if ids is None and self.ivf is not None:
+            ids = self.ivf.candidates(query, nprobe)
+        codes_t = self.codes_t[:, ids] if ids is not None else self.codes_t
+        if codes_t.shape[1] == 0:
+            return []
+        approx = self.pq.scores(codes_t, self.pq.score_table(query))
+
+        n_keep = min(max(k, rerank), approx.shape[0])
+        top = np.argpartition(-approx, n_keep - 1)[:n_keep]
+        rows = ids[top] if ids is not None else top
+        if rerank > 0 and vectors is not None:
+            return topk_exact(vectors, query, k, rows)  # eksakt re-rank av kandidatene
+        order = np.argsort(-approx[top])[:k]
+        return [(int(rows[i]), float(approx[top[i]])) for i in order]
+
+
+def topk_exact(vectors: np.ndarray, query: np.ndarray, k: int, ids: np.ndarray | None = None) -> list[tuple[int, float]]:
+    """Eksakt topp-k over alle rader (ids=None) eller bare over gitte radnumre."""
+    if ids is not None:
+        if len(ids) == 0:
+            return []
+        ids = np.sort(ids)  # sekvensiell lesing er billigere (særlig for memmap)
+        scores = vectors[ids] @ query
+    else:
+        scores = vectors @ query
+    k = min(k, scores.shape[0])
+    if k <= 0:
+        return []
+    top = np.argpartition(-scores, k - 1)[:k]
+    top = top[np.argsort(-scores[top])]
+    rows = ids[top] if ids is not None else top
+    return [(int(r), float(scores[t])) for r, t in zip(rows, top)]
+
+
+# ---------------------- Rapport: recall vs. latency ----------------------
+def _synthetic(n: int, dim: int, clusters: int = 200, seed: int = 0) -> np.ndarray:
+    # Klyngede data ligner mer på ekte embeddings enn uniform støy
+    rng = np.random.default_rng(seed)
+    centers = _normalize(rng.standard_normal((clusters, dim)).astype(np.float32))
+    x = centers[rng.integers(0, clusters, n)] + rng.standard_normal((n, dim)).astype(np.float32) / np.sqrt(dim)
+    return _normalize(x).astype(np.float32)
+
+
+def recall_report(vectors: np.ndarray, index, queries: np.ndarray, k: int, settings: list[dict]) -> list[dict]:
+    """
+    Sammenligner index.search(...) med eksakt søk. `settings` er en liste kwargs til search
+    (f.eks. [{"nprobe": 1}, {"nprobe": 8}]). Returnerer én rad per innstilling.
+    """
+    t0 = time.perf_counter()
+    exact = [{i for i, _ in topk_exact(vectors, q, k)} for q in queries]
+    exact_ms = (time.perf_counter() - t0) * 1000.0 / len(queries)
+
+    rows = [{"setting": "exact", "recall": 1.0, "ms_per_query": exact_ms}]
+    for kw in settings:
+        t0 = time.perf_counter()
+        found = [{i for i, _ in index.search(vectors, q, k, **kw)} for q in queries]
+        ms = (time.perf_counter() - t0) * 1000.0 / len(queries)
+        recall = float(np.mean([len(f & e) / len(e) for f, e in zip(found, exact) if e]))
+        rows.append({"setting": " ".join(f"{a}={b}" for a, b in kw.items()), "recall": recall, "ms_per_query": ms})
+    return rows
+
+
+def _print_report(rows: list[dict], k: int):
+    print(f"\n{'innstilling':<24}{'recall@' + str(k):>12}{'ms/spørring':>14}{'speedup':>10}")
+    base = rows[0]["ms_per_query"]
+    for r in rows:
+        print(f"{r['setting']:<24}{r['recall']:>12.3f}{r['ms_per_query']:>14.3f}{base / r['ms_per_query']:>9.1f}x")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Bygg IVF-indeks og rapporter recall/latency mot eksakt søk")
+    src = ap.add_mutually_exclusive_group(required=True)
+    src.add_argument("--snapshot", metavar="DIR", help="Snapshot fra generate_product_vectors.py --snapshot")
+    src.add_argument("--synthetic", type=int, metavar="N", help="Bruk N syntetiske vektorer (skalatest)")
+    ap.add_argument("--dim", type=int, default=512, help="Dimensjon for --synthetic")
+    ap.add_argument("--mode", choices=["ivf", "pq", "ivfpq"], default="ivf", help="Indekstype som måles")
+    ap.add_argument("--nlist", type=int, default=None, help="Antall klynger (standard ~4*sqrt(N))")
+    ap.add_argument("--nprobe", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    ap.add_argument("--pq-m", type=int, default=64, help="PQ: byte per vektor (delrom)")
+    ap.add_argument("--rerank", type=int, nargs="+", default=[0, 50, 200], help="PQ: antall kandidater som re-rankes eksakt")
+    ap.add_argument("--queries", type=int, default=200)
+    ap.add_argument("--k", type=int, default=10)
+    ap.add_argument("--save", metavar="PATH", help="Lagre indeksen (.npz)")
+    args = ap.parse_args()
+
+    if args.snapshot:
+        from vector_store import VectorStore
+        vectors = VectorStore.from_snapshot(args.snapshot).matrix
+    else:
+        vectors = _synthetic(args.synthetic, args.dim)
+
+    ivf = IVFIndex.build(vectors, nlist=args.nlist) if args.mode in ("ivf", "ivfpq") else None
+    if args.mode == "ivf":
+        index = ivf
+        settings = [{"nprobe": p} for p in args.nprobe if p <= ivf.nlist]
+    else:
+        index = PQIndex.build(vectors, m=args.pq_m, ivf=ivf)
+        nprobes = [p for p in args.nprobe if p <= ivf.nlist] if ivf is not None else [None]
+        settings = [{"rerank": r, **({"nprobe": p} if p else {})} for p in nprobes for r in args.rerank]
+        full_mb = vectors.shape[0] * vectors.shape[1] * 4 / 1e6
+        code_mb = index.nbytes / 1e6
+        print(f"[PQ] Minne: {full_mb:.1f} MB float32 -> {code_mb:.1f} MB koder ({full_mb / code_mb:.0f}x mindre)")
+    if args.save:
+        index.save(args.save)
+    rng = np.random.default_rng(1)
+    queries = np.asarray(vectors[rng.choice(vectors.shape[0], size=min(args.queries, vectors.shape[0]), replace=False)])
+    rows = recall_report(vectors, index, queries, args.k, settings)
+    _print_report(rows, args.k)
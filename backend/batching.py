@@ -0,0 +1,160 @@
+# backend/batching.py
+import asyncio
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+
+
+class QueueFullError(Exception):
+    """Kastes av submit() når antall forespørsler i flyt har nådd taket (backpressure)."""
+
+
+class MicroBatcher:
+    """
+    Slår sammen samtidige forespørsler til én batch før modellkall.
+
+    submit(item) legger elementet i en kø og venter på sin egen future. En worker
+    tømmer køen: den tar opptil max_batch_size elementer, eller venter maks
+    max_wait_ms etter første element, og sender batch_fn(items) til executor
+    (tråd- eller prosess-pool). Opptil `concurrency` batcher kan kjøre samtidig,
+    så event-løkka aldri blokkeres av modellkoden.
+
+    Når max_inflight forespørsler allerede er i kø eller under kjøring, kaster
+    submit() QueueFullError i stedet for å stable opp ventetid. Har kallet dyr
+    forbehandling (f.eks. dekoding), tas plassen først med `with reserve():` og
+    elementet sendes med enqueue(), så avviste forespørsler aldri blir dekodet.
+
+    batch_fn får en liste og må returnere en liste av samme lengde. Et element som
+    er en Exception blir kastet hos den aktuelle forespørselen.
+    """
+
+    def __init__(self, batch_fn, max_batch_size: int = 8, max_wait_ms: float = 10.0,
+                 executor=None, concurrency: int = 1, max_inflight: int = 0):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.executor = executor  # None = asyncio sin standard tråd-pool
+        self.concurrency = max(1, int(concurrency))
+        self.max_inflight = max(0, int(max_inflight))  # 0 = ubegrenset
+        self._queue: asyncio.Queue | None = None
+        self._worker: asyncio.Task | None = None
+        self._slots: asyncio.Semaphore | None = None
+        self._loop = None
+        self._inflight = 0
+        self._rejected = 0
+
+        # Statistikk
+        self._batches = 0
+        self._items = 0
+        self._size_hist: Counter = Counter()
+        self._waits_ms: deque = deque(maxlen=1000)  # siste køventetider
+        self._run_ms: deque = deque(maxlen=1000)    # siste batch-kjøretider
+
+    def _ensure_worker(self):
+        # Startes lazy slik at køen/tasken havner på den løkka uvicorn faktisk kjører
+        loop = asyncio.get_running_loop()
+        if self._worker is None or self._worker.done() or self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._slots = asyncio.Semaphore(self.concurrency)
+            self._worker = loop.create_task(self._run())
+
+    @contextmanager
+    def reserve(self):
+        """Holder én inflight-plass i blokken; kaster QueueFullError med en gang hvis taket er nådd."""
+        if self.max_inflight and self._inflight >= self.max_inflight:
+            self._rejected += 1
+            raise QueueFullError(f"{self._inflight} forespørsler i flyt (maks {self.max_inflight})")
+        self._inflight += 1
+        try:
+            yield
+        finally:
+            self._inflight -= 1
+
+    async def enqueue(self, item):
+        """Som submit(), men innenfor en plass som allerede er tatt med reserve()."""
+        self._ensure_worker()
+        fut = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((item, fut, time.perf_counter()))
+        return await fut
+
+    async def submit(self, item):
+        with self.reserve():
+            return await self.enqueue(item)
+
+    async def _collect(self) -> list:
+        first = await self._queue.get()
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                # Ta med det som allerede ligger i køen, men ikke vent mer
+                try:
+                    batch.append(self._queue.get_nowait())
+                    continue
+                except asyncio.QueueEmpty:
+                    break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            await self._slots.acquire()  # ikke samle ny batch før det finnes en ledig executor-plass
+            batch = await self._collect()
+            self._loop.create_task(self._execute(batch))
+
+    async def _execute(self, batch: list):
+        try:
+            started = time.perf_counter()
+            for _, _, enqueued in batch:
+                self._waits_ms.append((started - enqueued) * 1000.0)
+
+            items = [item for item, _, _ in batch]
+            try:
+                results = await self._loop.run_in_executor(self.executor, self.batch_fn, items)
+                if len(results) != len(items):
+                    raise RuntimeError("batch_fn returnerte feil antall resultater")
+            except Exception as e:
+                results = [e] * len(items)
+
+            self._run_ms.append((time.perf_counter() - started) * 1000.0)
+            self._batches += 1
+            self._items += len(items)
+            self._size_hist[len(items)] += 1
+
+            for (_, fut, _), res in zip(batch, results):
+                if fut.done():  # klienten har gitt opp (avbrutt)
+                    continue
+                if isinstance(res, BaseException):
+                    fut.set_exception(res)
+                else:
+                    fut.set_result(res)
+        finally:
+            self._slots.release()
+
+    def stats(self) -> dict:
+        waits = sorted(self._waits_ms)
+        runs = list(self._run_ms)
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "batches": self._batches,
+            "items": self._items,
+            "concurrency": self.concurrency,
+            "max_inflight": self.max_inflight,
+            "inflight": self._inflight,
+            "rejected": self._rejected,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "avg_batch_size": (self._items / self._batches) if self._batches else 0.0,
+            "batch_size_hist": dict(sorted(self._size_hist.items())),
+            "queue_wait_ms": {
+                "avg": (sum(waits) / len(waits)) if waits else 0.0,
+                "p95": waits[int(0.95 * (len(waits) - 1))] if waits else 0.0,
+                "max": waits[-1] if waits else 0.0,
+            },
+            "batch_run_ms_avg": (sum(runs) / len(runs)) if runs else 0.0,
+        }
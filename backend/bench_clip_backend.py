@@ -0,0 +1,112 @@
+# backend/bench_clip_backend.py
+import os, glob, time, argparse
+
+import numpy as np
+import torch
+
+from clip_backend import BACKENDS, load_backend
+from preprocess import pixel_batch, prepare_clip_input
+from bench_decode import synthetic_jpegs
+
+# Paritet og fart for CLIP-backendene (clip_backend.py) på CPU, målt mot fp32 (torch):
+#   - cosinus mellom backendens og fp32-vektoren for samme bilde (snitt / 1-persentil / min)
+#   - nabo-overlapp@k: andel av fp32 sine k nærmeste naboer (innen bildesettet) som backenden også finner
+#   - ms per batch og bilder/s for hver batchstørrelse (etter oppvarming)
+#   python bench_clip_backend.py --dir bilder/                    # egne produktbilder (anbefalt for paritet)
+#   python bench_clip_backend.py --synthetic 64 --batch 1 8 32 --threads 4
+# Syntetiske bilder holder for fart, men paritet bør sjekkes på ekte produktbilder.
+
+
+def load_pixels(args) -> torch.Tensor:
+    if args.dir:
+        paths = sorted(p for ext in ("jpg", "jpeg", "png", "webp") for p in glob.glob(os.path.join(args.dir, f"*.{ext}")))
+        blobs = [open(p, "rb").read() for p in paths[: args.limit or None]]
+    else:
+        blobs = synthetic_jpegs(args.synthetic, size=(600, 800))
+    arrays = [a for a in (prepare_clip_input(b) for b in blobs) if a is not None]
+    return pixel_batch(arrays) if arrays else torch.empty((0, 3, 224, 224))
+
+
+def embed_all(backend, pixels: torch.Tensor, batch_size: int = 32) -> np.ndarray:
+    return torch.cat([backend.image_features(pixels[i:i + batch_size])
+                      for i in range(0, len(pixels), batch_size)]).numpy()
+
+
+def timing(backend, pixels: torch.Tensor, batch_size: int, repeat: int) -> tuple[float, float]:
+    """(median ms per batch, bilder/s) for én batchstørrelse."""
+    batch = pixels[:batch_size]
+    if len(batch) < batch_size:
+        batch = batch.repeat((batch_size + len(batch) - 1) // len(batch), 1, 1, 1)[:batch_size]
+    backend.image_features(batch)  # oppvarming (ORT allokerer, oneDNN velger kjerner)
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        backend.image_features(batch)
+        times.append(time.perf_counter() - t0)
+    ms = float(np.median(times)) * 1e3
+    return ms, batch_size / (ms / 1e3)
+
+
+def neighbour_overlap(ref: np.ndarray, emb: np.ndarray, k: int) -> float:
+    """Snitt over bildene av |topk_ref ∩ topk_emb| / k (bildet selv er ikke med)."""
+    k = min(k, len(ref) - 1)
+    if k <= 0:
+        return float("nan")
+    def topk(x):
+        sims = x @ x.T
+        np.fill_diagonal(sims, -np.inf)
+        return np.argpartition(-sims, k - 1, axis=1)[:, :k]
+    a, b = topk(ref), topk(emb)
+    return float(np.mean([len(set(ra) & set(rb)) / k for ra, rb in zip(a, b)]))
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark: CLIP-backends (torch fp32 / int8 / onnx) – paritet og fart")
+    ap.add_argument("--dir", help="Mappe med bilder (jpg/png/webp)")
+    ap.add_argument("--limit", type=int, default=0, help="Maks antall bilder fra --dir (0 = alle)")
+    ap.add_argument("--synthetic", type=int, default=64, help="Antall syntetiske bilder hvis --dir ikke er gitt")
+    ap.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=BACKENDS)
+    ap.add_argument("--batch", nargs="+", type=int, default=[1, 8, 32], help="Batchstørrelser som måles")
+    ap.add_argument("--repeat", type=int, default=10, help="Målinger per batchstørrelse")
+    ap.add_argument("--topk", type=int, default=10, help="k for nabo-overlapp")
+    ap.add_argument("--threads", type=int, default=0, help="torch/ORT intra-op-tråder (0 = standard)")
+    ap.add_argument("--model", default="openai/clip-vit-base-patch32")
+    args = ap.parse_args()
+
+    if args.threads > 0:
+        torch.set_num_threads(args.threads)
+    pixels = load_pixels(args)
+    if len(pixels) == 0:
+        ap.error("Ingen bilder funnet")
+    cpu = torch.device("cpu")
+    print(f"[BENCH] {len(pixels)} bilder, {torch.get_num_threads()} tråder, modell {args.model}")
+
+    # fp32 er fasiten for pariteten, også når den ikke selv skal måles
+    reference = load_backend("torch", args.model, cpu)
+    ref = embed_all(reference, pixels)
+    rows = []
+    for name in args.backends:
+        t0 = time.perf_counter()
+        backend = reference if name == "torch" else load_backend(name, args.model, cpu)
+        load_s = time.perf_counter() - t0
+        emb = ref if name == "torch" else embed_all(backend, pixels)
+        cos = np.sum(ref * emb, axis=1)
+        speed = {bs: timing(backend, pixels, bs, args.repeat) for bs in args.batch}
+        rows.append((name, load_s, cos, neighbour_overlap(ref, emb, args.topk), speed))
+        if backend is not reference:
+            del backend
+
+    base = dict((bs, ms) for bs, (ms, _) in rows[0][4].items()) if rows[0][0] == "torch" else None
+    print(f"{'backend':<7} {'last s':>7} {'cos snitt':>10} {'p1':>7} {'min':>7} {f'nabo@{args.topk}':>8}  "
+          + "  ".join(f"{f'b={bs} ms':>9} {'bilder/s':>9}" for bs in args.batch))
+    for name, load_s, cos, overlap, speed in rows:
+        print(f"{name:<7} {load_s:7.1f} {cos.mean():10.5f} {np.percentile(cos, 1):7.4f} {cos.min():7.4f} {overlap:8.3f}  "
+              + "  ".join(f"{ms:9.1f} {ips:9.1f}" for ms, ips in speed.values()))
+    if base:
+        for name, _, _, _, speed in rows[1:]:
+            ratios = ", ".join(f"b={bs}: {base[bs]/ms:.2f}x" for bs, (ms, _) in speed.items())
+            print(f"[BENCH] {name} vs torch fp32: {ratios}")
+
+
+if __name__ == "__main__":
+    main()
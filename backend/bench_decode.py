@@ -0,0 +1,109 @@
+# backend/bench_decode.py
+import os, io, gc, glob, time, argparse
+import multiprocessing as mp
+
+import numpy as np
+from PIL import Image
+
+from preprocess import CLIP_SIZE, decode_image, clip_pixels
+
+# Sammenligner full dekoding (Image.open(...).convert("RGB"), slik jobben gjorde før) med
+# rask dekoding (draft()/reduce() ned mot modelloppløsning) – tid per bilde og minne brukt av dekodingen.
+#   python bench_decode.py --synthetic 200                # 1536x2048 JPEG, som H&M med imwidth=1536
+#   python bench_decode.py --dir bilder/ --hold 64        # egne bilder, 64 dekodede bilder i minnet samtidig
+# Hver modus kjøres i egen prosess. Minnet måles som RSS over nivået rett før dekodingen (etter importene –
+# torch alene er flere hundre MB, så ru_maxrss for prosessen sier ingenting om dekodingen).
+
+MODES = {
+    "full": lambda data, min_side: Image.open(io.BytesIO(data)).convert("RGB"),
+    "rask": lambda data, min_side: decode_image(data, min_side),
+}
+
+
+def synthetic_jpegs(n: int, size=(1536, 2048), seed: int = 0) -> list[bytes]:
+    # Glatte gradienter + litt støy: komprimeres omtrent som ekte produktbilder
+    rng = np.random.default_rng(seed)
+    w, h = size
+    yy, xx = np.mgrid[0:h, 0:w].astype(np.float32)
+    out = []
+    for _ in range(n):
+        base = rng.uniform(0, 255, size=3)
+        fx, fy = rng.uniform(0.001, 0.01, size=2)
+        img = np.stack([base[c] + 60 * np.sin(xx * fx * (c + 1)) * np.cos(yy * fy) for c in range(3)], axis=-1)
+        img += rng.normal(0, 4, size=img.shape)
+        buf = io.BytesIO()
+        Image.fromarray(np.clip(img, 0, 255).astype(np.uint8)).save(buf, "JPEG", quality=90)
+        out.append(buf.getvalue())
+    return out
+
+
+def _rss_mb() -> float:
+    # Nåværende RSS (Linux): andre felt i /proc/self/statm er residente sider
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+
+
+def _run_mode(mode: str, blobs: list[bytes], min_side: int, hold: int, conn):
+    decode = MODES[mode]
+    gc.collect()
+    base_rss = _rss_mb()
+    peak_rss = base_rss
+    held, pixels, times = [], [], []
+    for data in blobs:
+        t0 = time.perf_counter()
+        img = decode(data, min_side)
+        times.append(time.perf_counter() - t0)
+        peak_rss = max(peak_rss, _rss_mb())  # rett etter dekoding, før bildet evt. slippes
+        pixels.append(clip_pixels(img))  # det modellen faktisk får se
+        held.append(img)
+        if len(held) > hold:  # simulerer en batch/kø med dekodede bilder i minnet
+            held.pop(0)
+    t = np.asarray(times) * 1e3
+    conn.send({
+        "ms_avg": float(t.mean()), "ms_p95": float(np.percentile(t, 95)),
+        "peak_delta_mb": peak_rss - base_rss, "held_delta_mb": _rss_mb() - base_rss,
+        "size": held[-1].size if held else None, "pixels": np.stack(pixels),
+    })
+    conn.close()
+
+
+def run_mode(mode: str, blobs: list[bytes], min_side: int, hold: int) -> dict:
+    ctx = mp.get_context("spawn")
+    parent, child = ctx.Pipe(duplex=False)
+    proc = ctx.Process(target=_run_mode, args=(mode, blobs, min_side, hold, child))
+    proc.start()
+    result = parent.recv()
+    proc.join()
+    return result
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark: full vs. rask bildedekoding (tid + minne)")
+    ap.add_argument("--dir", help="Mappe med bilder (jpg/png/webp)")
+    ap.add_argument("--synthetic", type=int, default=0, help="Lag N syntetiske 1536x2048 JPEG-er")
+    ap.add_argument("--min-side", type=int, default=CLIP_SIZE, help="Mål for korteste side (224 = CLIP, 800 = Mask R-CNN)")
+    ap.add_argument("--hold", type=int, default=64, help="Antall dekodede bilder som holdes i minnet samtidig")
+    args = ap.parse_args()
+
+    if args.dir:
+        paths = sorted(p for ext in ("jpg", "jpeg", "png", "webp") for p in glob.glob(os.path.join(args.dir, f"*.{ext}")))
+        blobs = [open(p, "rb").read() for p in paths]
+    else:
+        blobs = synthetic_jpegs(args.synthetic or 100)
+    if not blobs:
+        ap.error("Ingen bilder funnet")
+    print(f"[BENCH] {len(blobs)} bilder, {sum(map(len, blobs))/1e6:.1f} MB, min_side={args.min_side}, hold={args.hold}")
+
+    results = {mode: run_mode(mode, blobs, args.min_side, args.hold) for mode in MODES}
+    full = results["full"]
+    print(f"{'modus':<6} {'ms/bilde':>9} {'p95':>7} {'Δ RSS maks':>11} {'Δ RSS slutt':>12}  dekodet størrelse")
+    for mode, r in results.items():
+        print(f"{mode:<6} {r['ms_avg']:9.2f} {r['ms_p95']:7.2f} {r['peak_delta_mb']:9.0f}MB {r['held_delta_mb']:10.0f}MB  {r['size']}")
+    fast = results["rask"]
+    diff = np.abs(fast["pixels"].astype(np.int16) - full["pixels"].astype(np.int16))
+    print(f"[BENCH] {full['ms_avg']/fast['ms_avg']:.1f}x raskere; CLIP-input avviker i snitt {diff.mean():.2f}/255 "
+          f"(maks {diff.max()}) fra full dekoding")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+# backend/bench_detect.py
+import os, glob, json, time, argparse
+
+import numpy as np
+import torch
+
+from clip_backend import CLIP_BACKEND, load_backend
+from detection import DETECTORS, Detector, decode_min_side
+from preprocess import clip_pixels, pixel_batch, decode_image
+from vector_store import VectorStore
+from bench_decode import synthetic_jpegs
+
+# Latency og søkekvalitet for detektorsteget (detection.py) på spørrebilder, én modus om gangen:
+#   - ms per bilde for dekoding + deteksjon, og totalt med CLIP (batch = 1, som /search)
+#   - andel bilder uten funn ("Ingen klær funnet" i API-et)
+#   - cosinus mellom spørrevektoren og referansemodusens (første modus, standard maskrcnn)
+#   - med --snapshot: overlapp i topp-k søketreff mot referansen; med --labels også treff@k mot fasit
+# Moduser skrives "navn" eller "navn@størrelse" (nedskalert input, boksene skaleres tilbake):
+#   python bench_detect.py --dir spørringer/ --snapshot snapshots
+#   python bench_detect.py --dir spørringer/ --modes maskrcnn maskrcnn@400 fasterrcnn_mobilenet ssdlite none
+#   python bench_detect.py --dir spørringer/ --snapshot snapshots --labels fasit.json   # {"fil.jpg": "hm_products:123"}
+
+
+def parse_mode(text: str) -> tuple[str, int]:
+    name, _, size = text.partition("@")
+    if name not in DETECTORS:
+        raise argparse.ArgumentTypeError(f"ukjent detektor {name!r} (gyldige: {', '.join(DETECTORS)})")
+    return name, int(size or 0)
+
+
+def best_crop(img, out: dict, score_thresh: float):
+    # Samme valg som inference.crop_best_boxes: høyest score over terskel
+    keep = out["scores"] > score_thresh
+    if not bool(keep.any()):
+        return None
+    i = int(torch.argmax(torch.where(keep, out["scores"], torch.tensor(-1.0))))
+    x1, y1, x2, y2 = [int(v) for v in out["boxes"][i].tolist()]
+    return img.crop((x1, y1, x2, y2))
+
+
+def run_mode(mode: str, size: int, blobs: list[bytes], clip) -> dict:
+    detector = Detector(mode, size)
+    min_side = decode_min_side(mode, size)
+    detect_ms, total_ms, embs = [], [], []
+    for data in blobs:
+        t0 = time.perf_counter()
+        img = decode_image(data, min_side)
+        if img is None:
+            embs.append(None)
+            continue
+        crop = img if detector.model is None else best_crop(img, detector.detect([img])[0], detector.score_thresh)
+        t1 = time.perf_counter()
+        emb = clip.image_features(pixel_batch([clip_pixels(crop)]))[0].numpy() if crop is not None else None
+        t2 = time.perf_counter()
+        detect_ms.append((t1 - t0) * 1e3)
+        total_ms.append((t2 - t0) * 1e3)
+        embs.append(emb)
+    return {"id": detector.id, "detect_ms": np.asarray(detect_ms), "total_ms": np.asarray(total_ms), "embs": embs}
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark: detektormoduser før CLIP – latency og søkekvalitet")
+    ap.add_argument("--dir", help="Mappe med spørrebilder (jpg/png/webp)")
+    ap.add_argument("--synthetic", type=int, default=20, help="Syntetiske bilder hvis --dir mangler (bare latency)")
+    ap.add_argument("--modes", nargs="+", type=parse_mode, default=[(m, 0) for m in DETECTORS],
+                    help="Første modus er referansen for kvalitet")
+    ap.add_argument("--snapshot", help="Vektorsnapshot (generate_product_vectors.py --snapshot) for søkekvalitet")
+    ap.add_argument("--labels", help="JSON {filnavn: \"tabell:id\"} med riktig produkt per spørrebilde")
+    ap.add_argument("--k", type=int, default=9, help="Antall søketreff (som SEARCH_TOP_K)")
+    ap.add_argument("--threads", type=int, default=0, help="torch intra-op-tråder (0 = standard)")
+    args = ap.parse_args()
+
+    if args.threads > 0:
+        torch.set_num_threads(args.threads)
+    if args.dir:
+        paths = sorted(p for ext in ("jpg", "jpeg", "png", "webp") for p in glob.glob(os.path.join(args.dir, f"*.{ext}")))
+        names = [os.path.basename(p) for p in paths]
+        blobs = [open(p, "rb").read() for p in paths]
+    else:
+        blobs = synthetic_jpegs(args.synthetic, size=(900, 1200))
+        names = [f"syntetisk-{i}" for i in range(len(blobs))]
+    if not blobs:
+        ap.error("Ingen bilder funnet")
+    labels = json.load(open(args.labels, encoding="utf-8")) if args.labels else {}
+    store = VectorStore.from_snapshot(args.snapshot) if args.snapshot else None
+    clip = load_backend(CLIP_BACKEND, "openai/clip-vit-base-patch32", torch.device("cpu"))
+    print(f"[BENCH] {len(blobs)} spørrebilder, {torch.get_num_threads()} tråder"
+          + (f", katalog {store.size} produkter" if store is not None else ""))
+
+    results = [run_mode(mode, size, blobs, clip) for mode, size in args.modes]
+    ref = results[0]
+
+    def top(emb):
+        return [(store.meta[i]["table"], store.meta[i]["id"]) for i, _ in store.search(emb, args.k)]
+
+    ref_top = [top(e) if e is not None else None for e in ref["embs"]] if store is not None else None
+    header = f"{'modus':<26} {'detekt ms':>9} {'p95':>7} {'totalt ms':>9} {'uten funn':>9} {'cos ref':>8}"
+    if store is not None:
+        header += f" {f'overlapp@{args.k}':>11}"
+        if labels:
+            header += f" {f'treff@{args.k}':>8}"
+    print(header)
+    for r in results:
+        both = [(a, b) for a, b in zip(ref["embs"], r["embs"]) if a is not None and b is not None]
+        cos = np.mean([float(a @ b) for a, b in both]) if both else float("nan")
+        missing = sum(e is None for e in r["embs"]) / len(blobs)
+        line = (f"{r['id']:<26} {r['detect_ms'].mean():9.1f} {np.percentile(r['detect_ms'], 95):7.1f} "
+                f"{r['total_ms'].mean():9.1f} {missing:9.1%} {cos:8.4f}")
+        if store is not None:
+            tops = [top(e) if e is not None else None for e in r["embs"]]
+            pairs = [(a, b) for a, b in zip(ref_top, tops) if a and b]
+            overlap = np.mean([len(set(a) & set(b)) / len(a) for a, b in pairs]) if pairs else float("nan")
+            line += f" {overlap:11.3f}"
+            if labels:
+                judged = [(n, t) for n, t in zip(names, tops) if n in labels]
+                hits = [t is not None and tuple(labels[n].split(":", 1)) in {(a, str(b)) for a, b in t} for n, t in judged]
+                line += f" {np.mean(hits) if hits else float('nan'):8.3f}"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
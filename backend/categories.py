@@ -0,0 +1,101 @@
+# backend/categories.py
+import numpy as np
+
+# Samme taksonomi som mapCategoryToMain i server.js: hovedkategori -> alias som matches
+# med "category LIKE %alias%" i /products. Hold de to i synk.
+CATEGORY_MAPPING = {
+    "T-skjorte": ["Tshirt", "Tshirtstanks", "Tskjorte", "Tee", "Top"],
+    "Bukse": ["Bukser", "Bukse", "Trousers", "Trouser", "Pants", "Sweatpants"],
+    "Jakke": ["Jacket", "Jakker", "Jakke", "Jacketscoats", "Coat", "Jacker"],
+    "Genser": ["Sweater", "Genser", "Gensere", "Cardigan"],
+    "Skjorte": ["Skjorte", "Shirt", "Shirts", "Sleeve"],
+    "Shorts": ["Shorts"],
+    "Jeans": ["Jeans"],
+    "Blazer": ["Blazer", "Blazerssuits"],
+    "Hoodie": ["Hoodie", "Hoodiessweatshirts"],
+}
+
+# Engelske tekster til zero-shot-klassifisering med CLIP sin teksttower (CLIP er trent på engelsk).
+CATEGORY_PROMPT_NAMES = {
+    "T-skjorte": ["t-shirt", "tee"],
+    "Bukse": ["trousers", "pants"],
+    "Jakke": ["jacket", "coat"],
+    "Genser": ["sweater", "cardigan"],
+    "Skjorte": ["shirt", "button-up shirt"],
+    "Shorts": ["shorts"],
+    "Jeans": ["jeans"],
+    "Blazer": ["blazer", "suit jacket"],
+    "Hoodie": ["hoodie", "hooded sweatshirt"],
+}
+PROMPT_TEMPLATES = ["a photo of a {}.", "a product photo of {}, a piece of clothing."]
+
+_ALIASES = {main: [a.lower() for a in aliases] for main, aliases in CATEGORY_MAPPING.items()}
+_MAIN_BY_LOWER = {main.lower(): main for main in CATEGORY_MAPPING}
+
+
+def main_categories(raw: str | None) -> list[str]:
+    """
+    Hovedkategoriene en butikk-kategori hører til, med samme regel som SQL-en i server.js
+    (delstreng, uten hensyn til store/små bokstaver). Et produkt kan havne i flere,
+    f.eks. "Hoodiessweatshirts" -> Skjorte og Hoodie, akkurat som på kategorisidene.
+    """
+    if not raw:
+        return []
+    low = raw.lower()
+    return [main for main, aliases in _ALIASES.items() if any(a in low for a in aliases)]
+
+
+def resolve_category(name: str | None) -> str | None:
+    """Hovedkategori for et filter fra klienten: tar både "Jeans"/"jeans" og rå alias som "Trousers"."""
+    if not name:
+        return None
+    main = _MAIN_BY_LOWER.get(name.strip().lower())
+    if main:
+        return main
+    found = main_categories(name)
+    return found[0] if found else None
+
+
+def category_prompts() -> tuple[list[str], list[str]]:
+    """Alle tekstprompter + hvilken hovedkategori hver prompt tilhører (samme rekkefølge)."""
+    texts, owners = [], []
+    for main in CATEGORY_MAPPING:
+        for name in CATEGORY_PROMPT_NAMES.get(main, [main]):
+            for template in PROMPT_TEMPLATES:
+                texts.append(template.format(name))
+                owners.append(main)
+    return texts, owners
+
+
+class ZeroShotCategories:
+    """
+    Klassifiserer et bilde-embedding mot forhåndsberegnede tekst-embeddings (én rad per
+    hovedkategori, snitt av promptene). Koster én liten (C, D) @ (D,) per spørring.
+    """
+
+    LOGIT_SCALE = 100.0  # CLIP sin innlærte temperatur (exp(logit_scale) ≈ 100)
+
+    def __init__(self, labels: list[str], text_emb: np.ndarray):
+        self.labels = labels
+        self.text_emb = np.ascontiguousarray(text_emb, dtype=np.float32)
+
+    @classmethod
+    def from_prompt_embeddings(cls, owners: list[str], prompt_emb: np.ndarray) -> "ZeroShotCategories":
+        labels = list(dict.fromkeys(owners))
+        owners_arr = np.asarray(owners)
+        rows = []
+        for label in labels:
+            mean = prompt_emb[owners_arr == label].mean(axis=0)
+            rows.append(mean / np.linalg.norm(mean))
+        return cls(labels, np.stack(rows))
+
+    def probabilities(self, emb: np.ndarray) -> np.ndarray:
+        logits = self.LOGIT_SCALE * (self.text_emb @ np.asarray(emb, dtype=np.float32))
+        logits -= logits.max()
+        p = np.exp(logits)
+        return p / p.sum()
+
+    def predict(self, emb: np.ndarray) -> tuple[str, float]:
+        p = self.probabilities(emb)
+        i = int(np.argmax(p))
+        return self.labels[i], float(p[i])
@@ -0,0 +1,163 @@
+# backend/clip_backend.py
+import os
+import inspect
+import tempfile
+
+import numpy as np
+import torch
+
+# Utbyttbar inferens-backend for CLIP-bildevektorer (clip_server via inference.py og generate_product_vectors.py):
+#   torch : HF CLIPModel i fp32, som før
+#   int8  : samme modell med dynamisk INT8-kvantisering av alle nn.Linear (vekter int8, aktiveringer kvantiseres
+#           per kall) – attention/MLP er nesten all regnetiden i ViT-B/32, patch-conv og LayerNorm forblir fp32
+#   onnx  : bildetårn + projeksjon + L2-normalisering eksportert til ONNX én gang (caches på disk) og kjørt
+#           i ONNX Runtime med alle grafoptimaliseringer (operator-fusjon, konstant-folding)
+# Alle tar ferdige pixel_values (B, 3, 224, 224) og gir L2-normaliserte (B, D) float32-vektorer på CPU.
+# int8 og onnx er for CPU-noder; onnx krever onnxruntime og onnx: `pip install -r requirements-onnx.txt`.
+# Paritet mot fp32 (cosinus, nabo-overlapp) og fart måles med: python bench_clip_backend.py
+
+BACKENDS = ("torch", "int8", "onnx")
+CLIP_BACKEND = os.getenv("CLIP_BACKEND", "torch").lower()
+ONNX_DIR = os.getenv("CLIP_ONNX_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "onnx"))
+ONNX_OPSET = 17
+
+
+def model_id(model_name: str, backend: str = CLIP_BACKEND) -> str:
+    """Id for vektorer fra modell + backend (cache-namespace, embedding_model). fp32 beholder bare modellnavnet."""
+    return model_name if backend == "torch" else f"{model_name}|{backend}"
+
+
+def load_hf_model(model_name: str, device: torch.device):
+    from transformers import CLIPModel
+    return CLIPModel.from_pretrained(model_name).to(device).eval()
+
+
+def _normalize(feats: torch.Tensor) -> torch.Tensor:
+    return feats / feats.norm(p=2, dim=-1, keepdim=True)
+
+
+# ---------- PyTorch (fp32 / dynamisk INT8) ----------
+class TorchClipBackend:
+    def __init__(self, model, device: torch.device, name: str = "torch", autocast: bool = False):
+        self.model = model
+        self.device = device
+        self.name = name
+        self.dim = model.config.projection_dim
+        self.autocast = autocast and device.type == "cuda"  # fp16 på GPU (vektorjobben)
+
+    @torch.inference_mode()
+    def image_features(self, pixel_values: torch.Tensor) -> torch.Tensor:
+        if len(pixel_values) == 0:
+            return torch.empty((0, self.dim))
+        with torch.autocast(device_type=self.device.type, enabled=self.autocast):
+            feats = self.model.get_image_features(pixel_values=pixel_values.to(self.device, non_blocking=True))
+            feats = _normalize(feats)
+        return feats.detach().float().cpu()
+
+    @torch.inference_mode()
+    def text_features(self, inputs) -> torch.Tensor:
+        feats = self.model.get_text_features(**inputs.to(self.device))
+        return _normalize(feats).float().cpu()
+
+
+def quantize_int8(model):
+    """Dynamisk INT8 for alle nn.Linear (bare CPU). Tar ~4x mindre plass for vektene i lineærlagene."""
+    from torch.ao.quantization import quantize_dynamic
+    return quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+# ---------- ONNX Runtime ----------
+class _ImageTower(torch.nn.Module):
+    # Det som eksporteres: pixel_values -> normalisert bildevektor (tekstdelen blir ikke med i grafen)
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, pixel_values):
+        return _normalize(self.model.get_image_features(pixel_values=pixel_values))
+
+
+def onnx_path(model_name: str) -> str:
+    return os.path.join(ONNX_DIR, f"{model_name.replace('/', '__')}-image-opset{ONNX_OPSET}.onnx")
+
+
+def export_onnx(model, path: str):
+    """Eksporterer bildetårnet med dynamisk batch-dimensjon. Skrives til temp-fil og flyttes på plass til slutt."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".onnx.tmp")
+    os.close(fd)
+    kwargs = {}
+    if "dynamo" in inspect.signature(torch.onnx.export).parameters:
+        kwargs["dynamo"] = False  # TorchScript-eksporten: stabil for HF CLIP og trenger ikke onnxscript
+    try:
+        with torch.inference_mode(False), torch.no_grad():
+            torch.onnx.export(
+                _ImageTower(model).eval(),
+                (torch.zeros(1, 3, 224, 224),),
+                tmp,
+                input_names=["pixel_values"],
+                output_names=["image_embeds"],
+                dynamic_axes={"pixel_values": {0: "batch"}, "image_embeds": {0: "batch"}},
+                opset_version=ONNX_OPSET,
+                do_constant_folding=True,
+                **kwargs,
+            )
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+
+
+class OnnxClipBackend:
+    name = "onnx"
+
+    def __init__(self, model_name: str, threads: int = 0):
+        import onnxruntime as ort  # valgfri avhengighet (requirements-onnx.txt), se load_backend()
+        self.model_name = model_name
+        path = onnx_path(model_name)
+        if not os.path.exists(path):
+            print(f"[CLIP] Eksporterer {model_name} til ONNX: {path}")
+            export_onnx(load_hf_model(model_name, torch.device("cpu")), path)
+        opts = ort.SessionOptions()
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        opts.intra_op_num_threads = threads or torch.get_num_threads()  # samme trådbudsjett som torch-backendene
+        self.session = ort.InferenceSession(path, sess_options=opts, providers=["CPUExecutionProvider"])
+        self.dim = int(self.session.get_outputs()[0].shape[-1])
+
+    def image_features(self, pixel_values: torch.Tensor) -> torch.Tensor:
+        if len(pixel_values) == 0:
+            return torch.empty((0, self.dim))
+        x = np.ascontiguousarray(pixel_values.detach().cpu().numpy(), dtype=np.float32)
+        (feats,) = self.session.run(None, {"pixel_values": x})
+        return torch.from_numpy(feats)
+
+    @torch.inference_mode()
+    def text_features(self, inputs) -> torch.Tensor:
+        # Tekstvektorer trengs bare ved oppstart (zero-shot-kategorier): HF-modellen lastes for kallet og slippes igjen
+        model = load_hf_model(self.model_name, torch.device("cpu"))
+        return _normalize(model.get_text_features(**inputs.to("cpu"))).float()
+
+
+# ---------- Valg av backend ----------
+def load_backend(name: str, model_name: str, device: torch.device, autocast: bool = False):
+    name = name.lower()
+    if name not in BACKENDS:
+        raise ValueError(f"Ukjent CLIP-backend {name!r} (gyldige: {', '.join(BACKENDS)})")
+    if name != "torch" and device.type != "cpu":
+        print(f"[CLIP] Backend {name} er laget for CPU – kjører CLIP på CPU i stedet for {device}")
+        device = torch.device("cpu")
+    print(f"[CLIP] Backend: {name} ({model_name})")
+    if name == "onnx":
+        try:
+            return OnnxClipBackend(model_name)
+        except ImportError as e:  # onnxruntime, eller onnx for eksporten
+            print(f"[CLIP] CLIP_BACKEND=onnx krever onnxruntime og onnx ({e.name or e} mangler): "
+                  f"pip install -r requirements-onnx.txt, eller bruk CLIP_BACKEND=torch/int8")
+            raise SystemExit(1) from e
+    model = load_hf_model(model_name, device)
+    if name == "int8":
+        model = quantize_int8(model)
+    return TorchClipBackend(model, device, name=name, autocast=autocast)
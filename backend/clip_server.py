@@ -1,72 +1,296 @@
 # app/main.py
-from fastapi import FastAPI, UploadFile, File, HTTPException
+import os
+import time
+import asyncio
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from fastapi import FastAPI, UploadFile, File, HTTPException, Query
 from fastapi.responses import JSONResponse
 from pydantic import BaseModel
-import torch
-from PIL import Image
-import torchvision.transforms as T
-from torchvision.models.detection import maskrcnn_resnet50_fpn
-from transformers import CLIPProcessor, CLIPModel
+import numpy as np
+import mysql.connector
+from dotenv import load_dotenv
+
+import inference
+import preprocess
+from vector_store import VectorStore, snapshot_version
+from categories import CATEGORY_MAPPING, resolve_category, category_prompts, ZeroShotCategories
+from batching import MicroBatcher, QueueFullError
+from embedding_cache import EmbeddingCache
+
+load_dotenv()
 
 app = FastAPI()
 
-# ---------- Oppstart: last modeller én gang ----------
-DEVICE = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+DB_CONFIG = {
+    "host": os.getenv("DB_HOST", "127.0.0.1"),
+    "port": int(os.getenv("DB_PORT", "3306")),
+    "user": os.getenv("DB_USER", "root"),
+    "password": os.getenv("DB_PASSWORD", "root"),
+    "database": os.getenv("DB_NAME", "clothing_data"),
+}
 
-MASKRCNN_SCORE_THRESH = 0.7
-mask_model = maskrcnn_resnet50_fpn(weights="DEFAULT").to(DEVICE).eval()
-to_tensor = T.ToTensor()
+TABLES = ["hm_products", "weekday_products", "zara_products", "follestad_products"]
+SEARCH_TOP_K = 9
 
-clip_model = CLIPModel.from_pretrained("openai/clip-vit-base-patch32").to(DEVICE).eval()
-clip_processor = CLIPProcessor.from_pretrained("openai/clip-vit-base-patch32")
+# Hvis satt: les vektorer fra et memory-mappet snapshot (generate_product_vectors.py --snapshot DIR)
+# i stedet for fra MySQL, og bytt til ny versjon når CURRENT endres.
+VECTOR_SNAPSHOT_DIR = os.getenv("VECTOR_SNAPSHOT_DIR", "")
+SNAPSHOT_CHECK_S = float(os.getenv("SNAPSHOT_CHECK_S", "10"))
 
-# ---------- Hjelpefunksjoner ----------
-def crop_best_box(image_pil: Image.Image):
-    with torch.inference_mode():
-        img = to_tensor(image_pil).unsqueeze(0).to(DEVICE)
-        out = mask_model(img)[0]
-    boxes = out.get("boxes", [])
-    scores = out.get("scores", [])
-    if boxes is None or len(boxes) == 0:
-        return None
-    # velg beste boks over terskel
-    best = None
-    best_score = -1.0
-    for b, s in zip(boxes, scores):
-        s = float(s.item())
-        if s > MASKRCNN_SCORE_THRESH and s > best_score:
-            best = b
-            best_score = s
-    if best is None:
+# Søkeindeks: "exact" (brute force, standard), "ivf" (approksimativ, sub-lineær),
+# "pq" (komprimerte koder + eksakt re-rank, lite minne) eller "ivfpq" (begge)
+SEARCH_INDEX = os.getenv("SEARCH_INDEX", "exact").lower()
+IVF_NLIST = int(os.getenv("IVF_NLIST", "0"))   # 0 = ~4*sqrt(N)
+IVF_NPROBE = int(os.getenv("IVF_NPROBE", "8"))
+PQ_M = int(os.getenv("PQ_M", "64"))            # byte per vektor
+PQ_RERANK = int(os.getenv("PQ_RERANK", "100"))
+
+# Zero-shot kategori: category=auto på /search søker bare i predikert kategori hvis sikker nok
+CATEGORY_MIN_CONFIDENCE = float(os.getenv("CATEGORY_MIN_CONFIDENCE", "0.5"))
+
+# Mikro-batching: samle opptil N bilder, eller vent maks M ms, før modellkall
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "8"))
+BATCH_MAX_WAIT_MS = float(os.getenv("BATCH_MAX_WAIT_MS", "10"))
+
+# Inferens kjøres utenfor event-løkka: "thread" (standard) eller "process"
+INFERENCE_EXECUTOR = os.getenv("INFERENCE_EXECUTOR", "thread").lower()
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "1"))
+INFERENCE_THREADS = int(os.getenv("INFERENCE_THREADS", "0"))            # torch-tråder per worker (0 = standard)
+INFERENCE_MAX_INFLIGHT = int(os.getenv("INFERENCE_MAX_INFLIGHT", "32"))  # over dette -> 503
+RETRY_AFTER_S = int(os.getenv("RETRY_AFTER_S", "2"))
+
+# Dekoding av opplastinger i egne tråder (PIL slipper GIL under decode), så inferens-workeren bare kjører modellene.
+# Gjelder thread-modus; i process-modus sendes rå bytes (et dekodet bilde er mye dyrere å pickle).
+PREPROCESS_WORKERS = int(os.getenv("PREPROCESS_WORKERS", str(preprocess.default_workers())))
+
+# Embedding-cache for like opplastinger (nøkkel = hash av bildebytes). Tom EMBED_CACHE_DIR = kun minne.
+EMBED_CACHE_ITEMS = int(os.getenv("EMBED_CACHE_ITEMS", "2048"))
+EMBED_CACHE_DIR = os.getenv("EMBED_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "embeddings"))
+EMBED_CACHE_MAX_MB = int(os.getenv("EMBED_CACHE_MAX_MB", "256"))
+
+# ---------- Oppstart ----------
+if INFERENCE_EXECUTOR == "process":
+    # Hver prosess laster sine egne modeller (inference.init_worker); hovedprosessen trenger dem ikke
+    executor = ProcessPoolExecutor(
+        max_workers=INFERENCE_WORKERS,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=inference.init_worker,
+        initargs=(INFERENCE_THREADS,),
+    )
+else:
+    inference.init_worker(INFERENCE_THREADS)  # last modeller én gang
+    executor = ThreadPoolExecutor(max_workers=INFERENCE_WORKERS, thread_name_prefix="inference")
+
+preprocess_executor = (
+    ThreadPoolExecutor(max_workers=PREPROCESS_WORKERS, thread_name_prefix="preprocess")
+    if INFERENCE_EXECUTOR != "process" and PREPROCESS_WORKERS > 0 else None
+)
+
+# Tekst-embeddings for kategoriene beregnes én gang (i executor, så det virker også i prosess-modus)
+def load_category_classifier() -> ZeroShotCategories | None:
+    texts, owners = category_prompts()
+    try:
+        prompt_emb = executor.submit(inference.clip_text_embeddings, texts).result()
+    except Exception as e:
+        print(f"[KATEGORI] Kunne ikke beregne tekst-embeddings: {e}")
         return None
-    x1, y1, x2, y2 = [int(v) for v in best.to("cpu").tolist()]
-    return image_pil.crop((x1, y1, x2, y2))
+    return ZeroShotCategories.from_prompt_embeddings(owners, prompt_emb)
+
+category_classifier = load_category_classifier()
+
+def predict_category(emb: np.ndarray) -> tuple[str | None, float | None]:
+    if category_classifier is None:
+        return None, None
+    return category_classifier.predict(emb)
+
+# Alle produktvektorer lastes én gang til en resident matrise (brukes av /search)
+def prepare_vector_store(store: VectorStore) -> VectorStore:
+    store.partitions  # bygg kategori-partisjonene nå, ikke ved første søk
+    cache_dir = VECTOR_SNAPSHOT_DIR or None
+    if SEARCH_INDEX == "ivf":
+        store.attach_ivf(nlist=IVF_NLIST or None, nprobe=IVF_NPROBE, cache_dir=cache_dir)
+    elif SEARCH_INDEX in ("pq", "ivfpq"):
+        store.attach_pq(m=PQ_M, rerank=PQ_RERANK, cache_dir=cache_dir,
+                        ivf=SEARCH_INDEX == "ivfpq", nlist=IVF_NLIST or None, nprobe=IVF_NPROBE)
+    return store
+
+def load_vector_store() -> VectorStore:
+    if VECTOR_SNAPSHOT_DIR:
+        try:
+            return prepare_vector_store(VectorStore.from_snapshot(VECTOR_SNAPSHOT_DIR))
+        except (OSError, ValueError) as e:
+            print(f"[VEKTOR] Kunne ikke åpne snapshot i {VECTOR_SNAPSHOT_DIR}: {e}")
+            return VectorStore.empty()
+    try:
+        return prepare_vector_store(VectorStore.from_db(DB_CONFIG, TABLES))
+    except (mysql.connector.Error, ValueError) as e:  # ValueError: f.eks. PQ_M som ikke deler D
+        print(f"[DB] Kunne ikke laste produktvektorer: {e}")
+        return VectorStore.empty()
+
+vector_store = load_vector_store()
 
-def clip_image_embedding(image_pil: Image.Image):
-    with torch.inference_mode():
-        inputs = clip_processor(images=image_pil, return_tensors="pt").to(DEVICE)
-        feats = clip_model.get_image_features(**inputs)
-        feats = feats / feats.norm(p=2, dim=-1, keepdim=True)  # L2-normaliser
-    return feats.squeeze(0).to("cpu")  # (D,)
+# Nye snapshot-versjoner lastes (meta, partisjoner, evt. indeks) i en egen tråd av snapshot_watcher(),
+# og den globale referansen byttes først når den nye store-en er klar. /search leser bare referansen.
+# Én tråd = aldri to bygg samtidig; bare watcheren skriver vector_store, så ingen lås trengs.
+snapshot_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="snapshot")
+
+def load_snapshot_version(version: str) -> VectorStore:
+    return prepare_vector_store(VectorStore.from_snapshot(VECTOR_SNAPSHOT_DIR, version))
+
+async def snapshot_watcher():
+    global vector_store
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(SNAPSHOT_CHECK_S)
+        latest = await loop.run_in_executor(snapshot_executor, snapshot_version, VECTOR_SNAPSHOT_DIR)
+        if not latest or latest == vector_store.version:
+            continue
+        t0 = time.perf_counter()
+        try:
+            store = await loop.run_in_executor(snapshot_executor, load_snapshot_version, latest)
+        except (OSError, ValueError) as e:
+            print(f"[VEKTOR] Beholder {vector_store.version}, kunne ikke bytte til {latest}: {e}")
+            continue
+        vector_store = store
+        print(f"[VEKTOR] Byttet til snapshot {latest} ({store.size} vektorer, lastet på {time.perf_counter() - t0:.1f}s)")
+
+@app.on_event("startup")
+async def start_snapshot_watcher():
+    if VECTOR_SNAPSHOT_DIR:
+        app.state.snapshot_watcher = asyncio.create_task(snapshot_watcher())
+
+embedding_cache = EmbeddingCache(
+    max_items=EMBED_CACHE_ITEMS,
+    disk_dir=EMBED_CACHE_DIR or None,
+    max_disk_bytes=EMBED_CACHE_MAX_MB * 1024 * 1024,
+    namespace=f"{inference.CLIP_MODEL_ID}|{inference.DETECTION_ID}",  # annen modell/backend/crop = annen vektor
+)
+
+batcher = MicroBatcher(
+    inference.analyze_batch,
+    max_batch_size=BATCH_MAX_SIZE,
+    max_wait_ms=BATCH_MAX_WAIT_MS,
+    executor=executor,
+    concurrency=INFERENCE_WORKERS,
+    max_inflight=INFERENCE_MAX_INFLIGHT,
+)
+
+# ---------- Hjelpefunksjoner ----------
+async def embed_upload(file: UploadFile) -> np.ndarray:
+    """
+    Felles løype for opplastede bilder: les bytes -> cache-oppslag -> plass i batcheren -> dekoding (og uten
+    detektor også resize til CLIP-input) i preprocess-poolen -> (batchet) crop og CLIP i executor.
+    Kaster HTTPException ved feil, og 503 med Retry-After når køen er full – før bildet dekodes, så en topp
+    aldri fyller minnet med dekodede bilder som uansett ville blitt avvist.
+    """
+    data = await file.read()
+    cache_key = embedding_cache.key(data)
+    cached = embedding_cache.get(cache_key)
+    if cached is not None:
+        return cached  # samme bilde sett før: hopper over begge modellene
+
+    try:
+        with batcher.reserve():
+            item = data
+            if preprocess_executor is not None:
+                item = await asyncio.get_running_loop().run_in_executor(preprocess_executor, inference.prepare_upload, data)
+                if item is None:
+                    raise HTTPException(status_code=400, detail="Ugyldig bildefil.")
+            result = await batcher.enqueue(item)
+    except QueueFullError:
+        raise HTTPException(
+            status_code=503,
+            detail="Tjenesten er opptatt, prøv igjen straks.",
+            headers={"Retry-After": str(RETRY_AFTER_S)},
+        )
+
+    if isinstance(result, str):
+        if result == inference.INVALID_IMAGE:
+            raise HTTPException(status_code=400, detail="Ugyldig bildefil.")
+        raise HTTPException(status_code=400, detail="Ingen klær funnet i bildet.")
+    embedding_cache.put(cache_key, result)
+    return result  # np.ndarray (D,)
 
 # ---------- Responsmodeller ----------
 class AnalyzeResponse(BaseModel):
     features: list[float]
+    category: str | None = None             # zero-shot predikert hovedkategori
+    category_confidence: float | None = None
+
+class SearchHit(BaseModel):
+    id: int
+    table: str
+    name: str | None = None
+    price: float | None = None
+    image_url: str | None = None
+    product_link: str | None = None
+    category: str | None = None
+    similarity: float
+
+class SearchResponse(BaseModel):
+    category: str | None = None  # partisjonen som ble søkt i (None = hele katalogen)
+    predicted_category: str | None = None
+    category_confidence: float | None = None
+    results: list[SearchHit]
 
 class ErrorResponse(BaseModel):
     error: str
 
 # ---------- Endepunkt ----------
-@app.post("/analyze", response_model=AnalyzeResponse, responses={400: {"model": ErrorResponse}, 500: {"model": ErrorResponse}})
+@app.post("/analyze", response_model=AnalyzeResponse, responses={400: {"model": ErrorResponse}, 500: {"model": ErrorResponse}, 503: {"model": ErrorResponse}})
 async def analyze(file: UploadFile = File(...)):
-    try:
-        image = Image.open(file.file).convert("RGB")
-    except Exception:
-        raise HTTPException(status_code=400, detail="Ugyldig bildefil.")
+    emb = await embed_upload(file)
+    category, confidence = predict_category(emb)
+    return AnalyzeResponse(features=emb.tolist(), category=category, category_confidence=confidence)
 
-    cropped = crop_best_box(image)
-    if cropped is None:
-        raise HTTPException(status_code=400, detail="Ingen klær funnet i bildet.")
+@app.post("/search", response_model=SearchResponse, responses={400: {"model": ErrorResponse}, 503: {"model": ErrorResponse}})
+async def search(
+    file: UploadFile = File(...),
+    k: int = Query(SEARCH_TOP_K, ge=1, le=100),
+    category: str | None = Query(
+        None,
+        description=f"Søk bare i én hovedkategori ({', '.join(CATEGORY_MAPPING)}), eller 'auto' for predikert kategori",
+    ),
+):
+    store = vector_store  # én referanse for hele forespørselen, selv om watcheren bytter underveis
+    if store.size == 0:
+        raise HTTPException(status_code=503, detail="Ingen produktvektorer lastet.")
+    auto = (category or "").strip().lower() == "auto"
+    main = None if auto else resolve_category(category)
+    if category and not auto and main is None:
+        raise HTTPException(status_code=400, detail=f"Ukjent kategori: {category}")
+
+    emb = await embed_upload(file)
+    predicted, confidence = predict_category(emb)
+    if auto and predicted is not None and confidence >= CATEGORY_MIN_CONFIDENCE:
+        main = predicted
+    # ANN-søket er CPU-arbeid (numpy) – i standard-executoren, så event-loopen svarer på /health imens
+    hits = await asyncio.get_running_loop().run_in_executor(None, store.hits, emb, k, main)
+    return SearchResponse(
+        category=main,
+        predicted_category=predicted,
+        category_confidence=confidence,
+        results=hits,
+    )
+
+@app.get("/health")
+async def health():
+    return {"status": "ok"}
+
+@app.on_event("shutdown")
+def shutdown_executor():
+    executor.shutdown(wait=False, cancel_futures=True)
+    snapshot_executor.shutdown(wait=False, cancel_futures=True)
+    if preprocess_executor is not None:
+        preprocess_executor.shutdown(wait=False, cancel_futures=True)
 
-    emb = clip_image_embedding(cropped)  # torch.Tensor (D,)
-    return AnalyzeResponse(features=emb.tolist())
+@app.get("/stats")
+async def stats():
+    return {
+        "batching": batcher.stats(),
+        "cache": embedding_cache.stats(),
+        "vectors": vector_store.size,
+        "snapshot": vector_store.version,
+        "partitions": {c: len(ids) for c, ids in vector_store.partitions.items()},
+    }
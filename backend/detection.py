@@ -0,0 +1,98 @@
+# backend/detection.py
+import os
+
+import torch
+from PIL import Image
+
+from preprocess import CLIP_SIZE
+
+# Detektorsteget før CLIP: finn plagget/personen i bildet og crop til beste boks. Valgt med DETECTOR:
+#   maskrcnn             : maskrcnn_resnet50_fpn – som før (beregner masker som aldri brukes)
+#   fasterrcnn_mobilenet : fasterrcnn_mobilenet_v3_large_fpn – bare bokser, MobileNetV3-backbone
+#   ssdlite              : ssdlite320_mobilenet_v3_large – én-stegs detektor på 320x320, raskest
+#   none                 : ingen deteksjon, CLIP på hele bildet (gir aldri "ingen klær funnet")
+# DETECT_SIZE > 0: bildet nedskaleres (korteste side) før detektoren og boksene skaleres tilbake, så cropen
+# fortsatt tas fra bildet i dekodet oppløsning. 0 = detektorens egen størrelse (800 for R-CNN, 320 for SSDlite).
+# Latency og søkekvalitet per modus: python bench_detect.py
+
+DETECTORS = {
+    # navn: (torchvision-konstruktør, standard korteste side inn i modellen, score-terskel)
+    "maskrcnn": ("maskrcnn_resnet50_fpn", 800, 0.7),
+    "fasterrcnn_mobilenet": ("fasterrcnn_mobilenet_v3_large_fpn", 800, 0.7),
+    "ssdlite": ("ssdlite320_mobilenet_v3_large", 320, 0.5),
+    "none": (None, 0, 0.0),
+}
+DETECTOR = os.getenv("DETECTOR", "maskrcnn").lower()
+DETECT_SIZE = int(os.getenv("DETECT_SIZE", "0"))
+DETECT_SCORE_THRESH = float(os.getenv("DETECT_SCORE_THRESH", "0"))  # 0 = detektorens standard over
+# Opplastinger dekodes ned mot denne siden når det skal croppes, så en crop av en del av bildet
+# fortsatt har nok piksler til CLIP (224)
+CROP_MIN_SIDE = 800
+
+
+def _check(mode: str) -> str:
+    mode = mode.lower()
+    if mode not in DETECTORS:
+        raise ValueError(f"Ukjent detektor {mode!r} (gyldige: {', '.join(DETECTORS)})")
+    return mode
+
+
+def detect_size(mode: str = DETECTOR, size: int = DETECT_SIZE) -> int:
+    return size or DETECTORS[_check(mode)][1]
+
+
+def mode_id(mode: str = DETECTOR, size: int = DETECT_SIZE) -> str:
+    """Id for deteksjonsoppsettet (cache-namespace og embedding_model), f.eks. "maskrcnn@800" eller "none"."""
+    mode = _check(mode)
+    return "none" if mode == "none" else f"{mode}@{detect_size(mode, size)}"
+
+
+def decode_min_side(mode: str = DETECTOR, size: int = DETECT_SIZE) -> int:
+    """Hvor stort en opplasting må dekodes: bare CLIP-størrelse uten deteksjon, ellers nok til en skarp crop."""
+    mode = _check(mode)
+    return CLIP_SIZE if mode == "none" else max(CROP_MIN_SIDE, detect_size(mode, size))
+
+
+class Detector:
+    def __init__(self, mode: str = DETECTOR, size: int = DETECT_SIZE, score_thresh: float = DETECT_SCORE_THRESH,
+                 device: torch.device = torch.device("cpu")):
+        self.mode = _check(mode)
+        builder, _, default_thresh = DETECTORS[self.mode]
+        self.size = detect_size(self.mode, size)
+        self.score_thresh = score_thresh or default_thresh
+        self.device = device
+        self.model = None
+        if builder is not None:
+            import torchvision.models.detection as det
+            import torchvision.transforms as T
+            kwargs = {}
+            if "rcnn" in builder:
+                # R-CNN-transformen skalerer ellers opp igjen til 800 – la den jobbe på størrelsen vi gir den
+                kwargs = {"min_size": self.size, "max_size": int(self.size * 1333 / 800)}
+            self.model = getattr(det, builder)(weights="DEFAULT", **kwargs).to(device).eval()
+            self.to_tensor = T.ToTensor()
+
+    @property
+    def id(self) -> str:
+        return mode_id(self.mode, self.size)
+
+    def _downscale(self, img: Image.Image) -> tuple[Image.Image, float]:
+        # Mindre input til detektoren; boksene ganges med scale for å komme tilbake til img sine koordinater
+        scale = min(img.size) / self.size
+        if scale <= 1.0:
+            return img, 1.0
+        w, h = img.size
+        return img.resize((max(1, round(w / scale)), max(1, round(h / scale))), Image.BILINEAR, reducing_gap=2.0), scale
+
+    def detect(self, images: list[Image.Image]) -> list[dict]:
+        """
+        Hele batchen i ett kall (bildene kan ha ulik størrelse). Per bilde {"boxes": (N, 4), "scores": (N,)}
+        på CPU, i koordinatene til bildet som ble sendt inn. Uten detektor: ingen bokser.
+        """
+        if self.model is None or not images:
+            return [{"boxes": torch.empty((0, 4)), "scores": torch.empty(0)} for _ in images]
+        small = [self._downscale(im) for im in images]
+        with torch.inference_mode():
+            outs = self.model([self.to_tensor(im).to(self.device) for im, _ in small])
+        return [{"boxes": out["boxes"].to("cpu") * scale, "scores": out["scores"].to("cpu")}
+                for out, (_, scale) in zip(outs, small)]
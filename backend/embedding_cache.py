@@ -0,0 +1,145 @@
+# backend/embedding_cache.py
+import hashlib
+import os
+from collections import OrderedDict
+
+import numpy as np
+
+from fileio import atomic_write
+
+
+class EmbeddingCache:
+    """
+    Innholdsadressert cache for bilde-embeddings: nøkkel = hash av rå opplastede bytes.
+
+    To nivåer:
+      - LRU i minnet (OrderedDict, maks `max_items` vektorer)
+      - valgfritt på disk (`disk_dir/ab/abcdef....npy`), begrenset til `max_disk_bytes`;
+        eldst brukte filer slettes først.
+
+    `namespace` blandes inn i nøkkelen, så vektorer fra en annen modell/oppsett aldri gjenbrukes.
+    """
+
+    def __init__(self, max_items: int = 1024, disk_dir: str | None = None,
+                 max_disk_bytes: int = 256 * 1024 * 1024, namespace: str = ""):
+        self.max_items = max(0, int(max_items))
+        self.disk_dir = disk_dir
+        self.max_disk_bytes = max(0, int(max_disk_bytes))
+        self.namespace = namespace.encode("utf-8")
+        self._mem: OrderedDict[str, np.ndarray] = OrderedDict()
+        self._disk: OrderedDict[str, int] = OrderedDict()  # nøkkel -> filstørrelse, eldst brukt først
+        self._disk_bytes = 0
+        self.hits_mem = 0
+        self.hits_disk = 0
+        self.misses = 0
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+            self._scan_disk()
+
+    # ---------- Nøkler og filstier ----------
+    def key(self, data: bytes) -> str:
+        h = hashlib.blake2b(digest_size=20)
+        h.update(self.namespace)
+        h.update(b"\0")
+        h.update(data)
+        return h.hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, key[:2], key + ".npy")
+
+    def _scan_disk(self):
+        # Gjenoppbygg indeksen ved oppstart, sortert på sist brukt (mtime)
+        found = []
+        for shard in os.listdir(self.disk_dir):
+            shard_dir = os.path.join(self.disk_dir, shard)
+            if not os.path.isdir(shard_dir):
+                continue
+            for name in os.listdir(shard_dir):
+                if not name.endswith(".npy"):
+                    continue
+                st = os.stat(os.path.join(shard_dir, name))
+                found.append((st.st_mtime, name[:-4], st.st_size))
+        for _, key, size in sorted(found):
+            self._disk[key] = size
+            self._disk_bytes += size
+        self._evict_disk()
+
+    # ---------- Oppslag ----------
+    def get(self, key: str) -> np.ndarray | None:
+        vec = self._mem.get(key)
+        if vec is not None:
+            self._mem.move_to_end(key)
+            self.hits_mem += 1
+            return vec
+
+        if self.disk_dir and key in self._disk:
+            path = self._path(key)
+            try:
+                vec = np.load(path)
+                os.utime(path)  # marker som nylig brukt
+            except (OSError, ValueError):
+                self._drop_disk(key)
+            else:
+                self._disk.move_to_end(key)
+                self._remember(key, vec)
+                self.hits_disk += 1
+                return vec
+
+        self.misses += 1
+        return None
+
+    def put(self, key: str, vec: np.ndarray):
+        vec = np.asarray(vec, dtype=np.float32)
+        self._remember(key, vec)
+        if self.disk_dir and self.max_disk_bytes and key not in self._disk:
+            self._write_disk(key, vec)
+
+    # ---------- Intern lagring ----------
+    def _remember(self, key: str, vec: np.ndarray):
+        if not self.max_items:
+            return
+        self._mem[key] = vec
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.max_items:
+            self._mem.popitem(last=False)
+
+    def _write_disk(self, key: str, vec: np.ndarray):
+        path = self._path(key)
+        try:
+            # temp-fil + rename: en annen worker ser aldri en halvskrevet fil (temp-filen slettes ved feil)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            atomic_write(path, lambda f: np.save(f, vec), fsync=False)
+            size = os.path.getsize(path)
+        except OSError as e:
+            print(f"[CACHE] Kunne ikke skrive {path}: {e}")
+            return
+        self._disk[key] = size
+        self._disk_bytes += size
+        self._evict_disk()
+
+    def _drop_disk(self, key: str):
+        size = self._disk.pop(key, 0)
+        self._disk_bytes -= size
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def _evict_disk(self):
+        while self._disk and self._disk_bytes > self.max_disk_bytes:
+            oldest = next(iter(self._disk))
+            self._drop_disk(oldest)
+
+    def stats(self) -> dict:
+        lookups = self.hits_mem + self.hits_disk + self.misses
+        return {
+            "hits_mem": self.hits_mem,
+            "hits_disk": self.hits_disk,
+            "misses": self.misses,
+            "hit_rate": ((self.hits_mem + self.hits_disk) / lookups) if lookups else 0.0,
+            "mem_items": len(self._mem),
+            "mem_max_items": self.max_items,
+            "disk_items": len(self._disk),
+            "disk_bytes": self._disk_bytes,
+            "disk_max_bytes": self.max_disk_bytes if self.disk_dir else 0,
+        }
@@ -0,0 +1,25 @@
+# backend/fileio.py
+import os
+import tempfile
+
+
+def atomic_write(path: str, write_fn, mode: str = "wb", fsync: bool = True):
+    """
+    Skriver via write_fn(f) til en temp-fil i samme mappe og renamer den til `path`:
+    lesere ser enten gammel eller ny fil, aldri en halvskrevet. Temp-filen slettes hvis noe feiler.
+    fsync=False for cache-filer der det er greit å miste siste skriving ved strømbrudd.
+    """
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), prefix=".tmp-")
+    try:
+        with os.fdopen(fd, mode, **({} if "b" in mode else {"encoding": "utf-8"})) as f:
+            write_fn(f)
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
@@ -1,14 +1,23 @@
 # backend/generate_product_vectors.py
-import os, io, json, re, argparse, time
-import requests
+import os, sys, signal, argparse, time, threading, hashlib, subprocess
+import numpy as np
 import mysql.connector
-from PIL import Image, UnidentifiedImageError
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from PIL import Image
 
 import torch
-from transformers import CLIPProcessor, CLIPModel
 from dotenv import load_dotenv
 
+from vector_codec import encode_vector, ensure_blob_column, ensure_embedding_columns, DTYPE_CODES
+from vector_store import VectorStore, write_snapshot
+from pipeline import Pipeline, SKIP
+from image_fetcher import ImageFetcher, FetchReport
+from image_cache import ImageCache
+from embedding_cache import EmbeddingCache
+from job_state import JobCheckpoint, TableProgress
+from clip_backend import CLIP_BACKEND, load_backend, model_id
+from detection import Detector, decode_min_side, mode_id as detection_id
+from preprocess import clip_pixels, pixel_batch, decode_image, prepare_clip_input, make_preprocess_pool, default_workers
+
 # ---------------------- Konfig ------------------------------------
 load_dotenv()
 
@@ -22,69 +31,119 @@ DB_CONFIG = {
 
 TABLES = ["hm_products", "weekday_products", "zara_products", "follestad_products"]
 
-# FART: slå AV segmentering for produkter (Mask R-CNN er flaskehals)
-USE_SEGMENT = False  # sett True hvis du vil croppe klær før CLIP
+# FART: slå AV segmentering for produkter (detektoren er flaskehals)
+USE_SEGMENT = False  # sett True hvis du vil croppe klær før CLIP (detektor fra DETECTOR, se detection.py)
+SEGMENT_MIN_SIDE = decode_min_side()  # dekod ikke større enn detektor/crop trenger
 BATCH_SIZE = 64      # øk/lav avh. av VRAM (16–128 typisk)
 NUM_WORKERS = 16     # samtidige nedlastinger
+FETCH_PER_HOST = int(os.getenv("FETCH_PER_HOST", "8"))  # maks samtidige mot samme vert/CDN
+FETCH_RETRIES = int(os.getenv("FETCH_RETRIES", "3"))    # retries med backoff ved tidsavbrudd/429/5xx
+PREPROCESS_WORKERS = int(os.getenv("PREPROCESS_WORKERS", str(default_workers())))  # prosesser for dekoding/resize
 COMMIT_EVERY = 800   # bulk-commit hver N rader
+QUEUE_SIZE = BATCH_SIZE * 4  # maks ventende elementer mellom stegene (holder minnet flatt)
+VECTOR_DTYPE = os.getenv("VECTOR_DTYPE", "float32")  # lagringsformat i BLOB: float32 | float16
+CLIP_MODEL_NAME = "openai/clip-vit-base-patch32"
+# Lagres i embedding_model per rad: endres modell, backend (CLIP_BACKEND=int8/onnx) eller crop-oppsett (DETECTOR),
+# blir alle rader beregnet på nytt
+_CROP_ID = "full" if not USE_SEGMENT else ("segment" if detection_id() == "maskrcnn@800" else f"segment-{detection_id()}")
+EMBEDDING_MODEL_ID = f"{model_id(CLIP_MODEL_NAME, CLIP_BACKEND)}|{_CROP_ID}"
+# Vektorer fra før embedding_model fantes (fp32, hele bildet) – se ensure_schema()
+LEGACY_EMBEDDING_MODEL_ID = f"{model_id(CLIP_MODEL_NAME, 'torch')}|full"
+
+# Cacher for --all / ny kjøring: bilder med ETag/Last-Modified (betinget GET) og vektorer per bildeinnhold.
+# Uendret bilde -> 304 -> bytes fra disk -> kjent vektor -> verken nedlasting eller CLIP. Tom verdi = av.
+_CACHE_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache")
+IMAGE_CACHE_DIR = os.getenv("IMAGE_CACHE_DIR", os.path.join(_CACHE_ROOT, "images"))
+IMAGE_CACHE_MAX_MB = int(os.getenv("IMAGE_CACHE_MAX_MB", "10240"))
+JOB_EMBED_CACHE_DIR = os.getenv("JOB_EMBED_CACHE_DIR", os.path.join(_CACHE_ROOT, "job-embeddings"))
+JOB_EMBED_CACHE_MAX_MB = int(os.getenv("JOB_EMBED_CACHE_MAX_MB", "512"))
+# Søkeindeks som bygges sammen med --snapshot (samme variabler som clip_server, så filnavnene stemmer),
+# slik at serveren bare laster ivf-/pq-<versjon>-*.npz i stedet for å trene k-means/kodebøker selv
+SEARCH_INDEX = os.getenv("SEARCH_INDEX", "exact").lower()
+IVF_NLIST = int(os.getenv("IVF_NLIST", "0"))   # 0 = ~4*sqrt(N)
+PQ_M = int(os.getenv("PQ_M", "64"))
+# Sjekkpunkt for --resume (skrives etter hver commit)
+JOB_STATE_FILE = os.getenv("JOB_STATE_FILE", os.path.join(_CACHE_ROOT, "vector_job_state.json"))
 
 device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 print(f"[INFO] Device: {device}")
 
-# Last CLIP én gang
-clip_model = CLIPModel.from_pretrained("openai/clip-vit-base-patch32").to(device)
-clip_model.eval()
-clip_processor = CLIPProcessor.from_pretrained("openai/clip-vit-base-patch32")
+# Last CLIP én gang – lazy, siden preprocess-prosessene (spawn) importerer denne modulen på nytt.
+# Backend (torch fp32 / int8 / onnx) velges med CLIP_BACKEND, se clip_backend.py
+_clip_backend = None
+def get_clip_backend():
+    global _clip_backend
+    if _clip_backend is None:
+        _clip_backend = load_backend(CLIP_BACKEND, CLIP_MODEL_NAME, device, autocast=True)
+    return _clip_backend
+# Forbehandling gjøres i preprocess.py (samme steg som CLIPProcessor, men parallelt i egne prosesser)
+
+# Vektorcache for jobben: nøkkel = hash av bildebytes + modell/oppsett, så en modellendring aldri gjenbruker gamle
+# vektorer. Bare disk (max_items=0), så minnet holdes flatt; deles mellom nedlastingstrådene og CLIP-steget.
+_vector_cache = None
+_vector_cache_lock = threading.Lock()
+def get_vector_cache() -> EmbeddingCache | None:
+    global _vector_cache
+    if _vector_cache is None and JOB_EMBED_CACHE_DIR:
+        _vector_cache = EmbeddingCache(
+            max_items=0,
+            disk_dir=JOB_EMBED_CACHE_DIR,
+            max_disk_bytes=JOB_EMBED_CACHE_MAX_MB * 1024 * 1024,
+            namespace=EMBEDDING_MODEL_ID,
+        )
+    return _vector_cache
+
+def image_digest(data: bytes) -> str:
+    """Innholdshash for et bilde (lagres i image_hash, og er nøkkel i vektorcachen)."""
+    return hashlib.blake2b(data, digest_size=20).hexdigest()
 
-# Segmenter-lazy (kun hvis brukt)
+def cached_vector(digest: str) -> np.ndarray | None:
+    cache = get_vector_cache()
+    if cache is None:
+        return None
+    with _vector_cache_lock:
+        return cache.get(cache.key(digest.encode("ascii")))
+
+def remember_vector(digest: str, vec: np.ndarray):
+    cache = get_vector_cache()
+    if cache is not None:
+        with _vector_cache_lock:
+            cache.put(cache.key(digest.encode("ascii")), vec)
+
+# Segmenter-lazy (kun hvis brukt) – samme detektor som ML-tjenesten, så katalog- og søkebilder croppes likt
 _segmenter = None
-def get_segmenter():
+def get_segmenter() -> Detector:
     global _segmenter
     if _segmenter is None:
-        import torchvision.transforms as T
-        from torchvision.models.detection import maskrcnn_resnet50_fpn
-        _segmenter = {
-            "model": maskrcnn_resnet50_fpn(weights="DEFAULT").to(device).eval(),
-            "to_tensor": T.Compose([T.ToTensor()])
-        }
+        _segmenter = Detector(device=device)
     return _segmenter
 
 # ---------------------- Hjelpere -----------------------------------
-def download_image(session: requests.Session, url: str) -> Image.Image | None:
-    try:
-        r = session.get(url, stream=True, timeout=20)
-        r.raise_for_status()
-        return Image.open(io.BytesIO(r.content)).convert("RGB")
-    except Exception as e:
-        return None
+def make_fetcher() -> ImageFetcher:
+    cache = ImageCache(IMAGE_CACHE_DIR, IMAGE_CACHE_MAX_MB * 1024 * 1024) if IMAGE_CACHE_DIR else None
+    return ImageFetcher(workers=NUM_WORKERS, per_host=FETCH_PER_HOST, retries=FETCH_RETRIES, cache=cache)
+
+def pixels_to_clip_vectors(pixel_values: torch.Tensor) -> torch.Tensor:
+    """
+    Bare forward pass: ferdige pixel_values (B, 3, 224, 224) -> (B, D) normaliserte CLIP-vektorer (på CPU).
+    """
+    return get_clip_backend().image_features(pixel_values)
 
-@torch.inference_mode()
 def images_to_clip_vectors(pil_images: list[Image.Image]) -> torch.Tensor:
     """
     Tar en liste PIL-bilder -> (B, D) normaliserte CLIP-vektorer (på CPU).
     """
     if len(pil_images) == 0:
-        return torch.empty((0, clip_model.config.projection_dim))
-    with torch.cuda.amp.autocast(enabled=(device.type == "cuda")):
-        inputs = clip_processor(images=pil_images, return_tensors="pt", padding=True)
-        inputs = {k: v.to(device) for k, v in inputs.items()}
-        feats = clip_model.get_image_features(**inputs)
-        feats = feats / feats.norm(p=2, dim=-1, keepdim=True)
-    return feats.detach().cpu()
+        return torch.empty((0, get_clip_backend().dim))
+    return pixels_to_clip_vectors(pixel_batch([clip_pixels(im) for im in pil_images]))
 
 def segment_crop(img: Image.Image) -> Image.Image:
     """
-    Enkelt crop med Mask R-CNN (tar største boks). Brukes bare hvis USE_SEGMENT = True.
-    """
-    seg = get_segmenter()
-    model, to_tensor = seg["model"], seg["to_tensor"]
-    with torch.inference_mode():
-        t = to_tensor(img).unsqueeze(0).to(device)
-        preds = model(t)
-    boxes = preds[0].get("boxes")
-    if boxes is None or len(boxes) == 0:
-        return img  # fallback: fullbilde
-    boxes_cpu = boxes.detach().cpu()
+    Enkelt crop med detektoren (tar største boks). Brukes bare hvis USE_SEGMENT = True.
+    """
+    boxes_cpu = get_segmenter().detect([img])[0]["boxes"]
+    if len(boxes_cpu) == 0:
+        return img  # fallback: fullbilde (også med DETECTOR=none)
     areas = (boxes_cpu[:, 2]-boxes_cpu[:, 0]) * (boxes_cpu[:, 3]-boxes_cpu[:, 1])
     i = int(torch.argmax(areas))
     x1, y1, x2, y2 = boxes_cpu[i].int().tolist()
@@ -93,97 +152,371 @@ def segment_crop(img: Image.Image) -> Image.Image:
     x2 = min(x2 + pad, img.width); y2 = min(y2 + pad, img.height)
     return img.crop((x1, y1, x2, y2))
 
-def prepare_images_parallel(rows: list[tuple[int, str]]) -> list[tuple[int, Image.Image]]:
+# Radene inn i pipelinen er (id, image_url, image_hash, embedding_model, har_vektor) fra DB.
+# Elementene videre er (id, payload, bildehash). payload er bytes/PIL-bilde/uint8-pixler på vei
+# gjennom stegene, eller en ferdig (D,)-vektor fra vektorcachen – den slipper da forbehandling og CLIP.
+def _is_vector(payload) -> bool:
+    return isinstance(payload, np.ndarray) and payload.ndim == 1
+
+def fetch_item(row: tuple, fetcher: ImageFetcher, report: FetchReport, force: bool = False):
     """
-    Paralleliser kun NEDLASTING (lett). Segmentering gjøres sekvensielt (tung).
-    rows: [(id, image_url), ...]
-    return: [(id, pil_img), ...] (filtrert for None)
+    Nedlasting for ett produkt (kjøres i NUM_WORKERS tråder). Dekodes her bare hvis det skal segmenteres.
+    SKIP hvis bildet har samme hash som sist og vektoren er laget med samme modell (force: aldri, og ingen vektorcache).
     """
-    out: list[tuple[int, Image.Image]] = []
-    session = requests.Session()
-    with ThreadPoolExecutor(max_workers=NUM_WORKERS) as pool:
-        futs = {pool.submit(download_image, session, url): (pid, url) for pid, url in rows}
-        for fut in as_completed(futs):
-            pid, url = futs[fut]
-            img = fut.result()
-            if img is None:
-                continue
-            out.append((pid, img))
-    # valgfri segmentering (sekvensielt for stabilitet)
+    pid, url, old_hash, old_model, has_vector = row
+    data = fetcher.fetch(url, report)
+    if data is None:
+        return None
+    digest = image_digest(data)
+    if not force and has_vector and old_hash == digest and old_model == EMBEDDING_MODEL_ID:
+        return SKIP
+    vec = cached_vector(digest) if not force else None
+    if vec is not None:
+        return pid, vec, digest
+    if USE_SEGMENT:
+        img = decode_image(data, SEGMENT_MIN_SIDE)
+        return (pid, img, digest) if img is not None else None
+    return pid, data, digest
+
+def preprocess_item(item: tuple[int, object, str], pool) -> tuple[int, np.ndarray, str] | None:
+    """Dekoding + resize/crop til CLIP-input, i preprocess-poolen (eller i tråden hvis pool=None)."""
+    pid, source, digest = item
+    if _is_vector(source):
+        return item
+    pixels = pool.submit(prepare_clip_input, source).result() if pool is not None else prepare_clip_input(source)
+    return (pid, pixels, digest) if pixels is not None else None
+
+def segment_item(item: tuple[int, object, str]) -> tuple[int, object, str]:
+    pid, img, digest = item
+    if _is_vector(img):
+        return item
+    try:
+        return pid, segment_crop(img), digest
+    except Exception:
+        return item  # fallback: fullbilde
+
+def embed_table(conn, table: str, rows: list[tuple], vector_dtype: str, pool=None,
+                fetcher: ImageFetcher | None = None, force: bool = False,
+                progress: TableProgress | None = None, checkpoint: JobCheckpoint | None = None) -> int:
+    """
+    Strømmer rader gjennom nedlasting -> (segmentering) -> forbehandling i prosess-pool
+    -> CLIP i batcher (bare forward pass) -> bulk-UPDATE, med begrensede køer mellom stegene.
+    Bare ~QUEUE_SIZE bilder ligger i minnet om gangen.
+    Returnerer antall oppdaterte rader. Nedlastingsfeil oppsummeres per årsak etterpå.
+    Rader med uendret bilde og modell hoppes over (force=True beregner alt på nytt).
+    progress/checkpoint: ferdige og feilede id-er registreres, og sjekkpunktet lagres etter hver commit.
+    """
+    update_sql = f"UPDATE {table} SET feature_vector = %s, image_hash = %s, embedding_model = %s WHERE id = %s"
+    own_fetcher = fetcher is None
+    fetcher = fetcher or make_fetcher()
+    report = FetchReport(table)
+    progress = progress or TableProgress()
+    written = 0
+
+    # Et steg som kaster, dropper raden i Pipeline.map – registrer årsaken så den prøves igjen ved --resume
+    def fetch(row):
+        try:
+            result = fetch_item(row, fetcher, report, force)
+        except Exception as e:
+            progress.fail(row[0], f"nedlasting: {type(e).__name__}: {e}")
+            return None
+        if result is SKIP:
+            progress.mark([row[0]])  # uendret – ferdig uten å skrive
+        elif result is None:
+            progress.fail(row[0], report.reason(row[1]) or "nedlasting")
+        return result
+
+    def prepare(item):
+        try:
+            result = preprocess_item(item, pool)
+        except Exception as e:  # f.eks. BrokenProcessPool
+            progress.fail(item[0], f"forbehandling: {type(e).__name__}: {e}")
+            return None
+        if result is None:
+            progress.fail(item[0], "ugyldig bilde")
+        return result
+
+    def embed_batch(batch: list[tuple[int, np.ndarray, str]]) -> list[tuple[bytes, str, str, int]]:
+        known = [(pid, vec, digest) for pid, vec, digest in batch if _is_vector(vec)]
+        todo = [item for item in batch if not _is_vector(item[1])]
+        computed = []
+        if todo:
+            vecs = pixels_to_clip_vectors(pixel_batch([pixels for _, pixels, _ in todo])).numpy()  # (B, D)
+            for (pid, _, digest), vec in zip(todo, vecs):
+                remember_vector(digest, vec)
+                computed.append((pid, vec, digest))
+        return [(encode_vector(vec, vector_dtype), digest, EMBEDDING_MODEL_ID, pid)
+                for pid, vec, digest in known + computed]
+
+    def write_chunk(updates: list[tuple[bytes, str, str, int]]) -> list[int]:
+        # Bare denne tråden bruker conn mens pipelinen går
+        nonlocal written
+        cursor = conn.cursor()
+        cursor.executemany(update_sql, updates)
+        conn.commit()
+        cursor.close()
+        written += len(updates)
+        pids = [u[-1] for u in updates]
+        progress.mark(pids)  # først etter commit, så sjekkpunktet aldri er foran databasen
+        if checkpoint is not None:
+            checkpoint.save()
+        print(f"  [OK] {written}/{len(rows)} i {table}")
+        return pids
+
+    p = Pipeline(queue_size=QUEUE_SIZE)
+    q = p.source("rader", rows)
+    q = p.map("nedlasting", fetch, q, workers=NUM_WORKERS)
     if USE_SEGMENT:
-        segged: list[tuple[int, Image.Image]] = []
-        for pid, img in out:
-            try:
-                segged.append((pid, segment_crop(img)))
-            except Exception:
-                segged.append((pid, img))
-        return segged
-    return out
+        q = p.map("segmenter", segment_item, q)  # sekvensielt (tung, deler GPU med CLIP)
+    # Én tråd per prosess som venter på resultatet; selve arbeidet skjer i prosessene (ingen GIL)
+    q = p.map("forbehandle", prepare, q, workers=max(1, PREPROCESS_WORKERS))
+    q = p.batch("clip", embed_batch, q, batch_size=BATCH_SIZE)
+    q = p.batch("db", write_chunk, q, batch_size=COMMIT_EVERY, max_wait_s=None)
+    try:
+        for _ in p.run(q):
+            pass
+        lost = progress.settle()  # rader som forsvant uten mark/fail (skal ikke skje, men da er tabellen ikke ferdig)
+        if lost:
+            print(f"[ADVARSEL] {lost} rader i {table} ble verken skrevet eller registrert som feilet – prøves ved --resume")
+        progress.done = not progress.failed  # med feil: --resume prøver de feilede radene igjen
+        if checkpoint is not None:
+            checkpoint.save()
+    finally:
+        if own_fetcher:
+            fetcher.close()
+        p.report(table)
+        report.print()
+        if get_vector_cache() is not None:
+            st = get_vector_cache().stats()
+            print(f"[VEKTORCACHE] {st['hits_disk']} kjente vektorer gjenbrukt, {st['misses']} beregnet (totalt i jobben)")
+    return written
+
+def parse_shard(value: str) -> tuple[int, int]:
+    """ "i/N" -> (i, N), 0 <= i < N."""
+    try:
+        i, n = (int(x) for x in value.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Ugyldig shard: {value} (bruk i/N, f.eks. 0/4)")
+    if n < 1 or not 0 <= i < n:
+        raise argparse.ArgumentTypeError(f"Ugyldig shard: {value} (krever 0 <= i < N)")
+    return i, n
+
+def shard_state_file(state_file: str, shard: tuple[int, int] | None) -> str:
+    """Egen sjekkpunktfil per shard, så shards (også på ulike maskiner med delt disk) ikke overskriver hverandre."""
+    if shard is None:
+        return state_file
+    root, ext = os.path.splitext(state_file)
+    return f"{root}.shard-{shard[0]}-of-{shard[1]}{ext}"
 
-def regenerate_feature_vectors(process_all: bool = False):
+def ensure_schema(conn, cursor, table: str):
     """
-    process_all=False: bare rows der feature_vector IS NULL (raskest)
-    process_all=True : full refresh
+    BLOB + image_hash/embedding_model, og embedding_model for vektorer laget før kolonnen fantes.
+    De ble alltid laget med fp32-CLIP på hele bildet; uten backfill ville alle blitt valgt og beregnet på nytt
+    første gang jobben kjører etter deploy. Bare rader uten image_hash berøres (jobben setter alltid begge),
+    så dette er trygt å kjøre hver gang, også etter en avbrutt backfill.
+    """
+    if ensure_blob_column(cursor, table):
+        print(f"[INFO] {table}.feature_vector endret til BLOB")
+    for column in ensure_embedding_columns(cursor, table):
+        print(f"[INFO] {table}.{column} lagt til")
+    cursor.execute(
+        f"UPDATE {table} SET embedding_model = %s "
+        f"WHERE feature_vector IS NOT NULL AND embedding_model IS NULL AND image_hash IS NULL",
+        (LEGACY_EMBEDDING_MODEL_ID,),
+    )
+    if cursor.rowcount:
+        print(f"[INFO] {table}: embedding_model satt til {LEGACY_EMBEDDING_MODEL_ID} for {cursor.rowcount} eldre vektorer")
+    conn.commit()
+
+def prepare_schema():
+    """ensure_schema på alle tabeller – kjøres én gang før shards startes."""
+    conn = mysql.connector.connect(**DB_CONFIG)
+    try:
+        cursor = conn.cursor(dictionary=True)
+        for table in TABLES:
+            ensure_schema(conn, cursor, table)
+        cursor.close()
+    finally:
+        conn.close()
+
+def regenerate_feature_vectors(process_all: bool = False, vector_dtype: str = VECTOR_DTYPE, force: bool = False,
+                               resume: bool = False, state_file: str = JOB_STATE_FILE,
+                               shard: tuple[int, int] | None = None) -> bool:
+    """
+    process_all=False: rader uten vektor, eller med vektor fra en annen modell (embedding_model) (raskest)
+    process_all=True : sjekk alle rader – bilder hentes (betinget GET), men bare rader der bildehash
+                       eller modell er endret beregnes og skrives
+    force=True       : full refresh, beregn alt på nytt
+    Vektorene lagres binært (vector_codec.encode_vector) i en BLOB-kolonne, sammen med image_hash og embedding_model.
+    Scraperne nuller feature_vector når image_url endres, så nye bilder fanges opp av standardmodusen.
+    Fremdriften lagres i state_file; resume=True hopper over tabeller og id-intervaller som allerede er ferdige.
+    shard=(i, N): bare rader med id % N == i (i hver tabell), så N prosesser/maskiner kan dele jobben.
+    Hver shard skriver sine egne rader via samme bulk-UPDATE, så resultatene trenger ingen egen fletting.
+    Returnerer True hvis alle tabeller ble gjennomgått (launcheren bruker dette som exit-kode).
     """
     conn = None
+    ok = False
     total_updated = 0
     started = time.time()
+    pool = make_preprocess_pool(PREPROCESS_WORKERS)  # startes én gang, gjenbrukes for alle tabeller
+    fetcher = make_fetcher()                          # samme tilkoblingspool (keep-alive) for alle tabeller
+    params = {"all": process_all, "force": force, "dtype": vector_dtype, "model": EMBEDDING_MODEL_ID, "tables": TABLES,
+              "shard": f"{shard[0]}/{shard[1]}" if shard else None}
+    state_file = shard_state_file(state_file, shard)
+    checkpoint = JobCheckpoint.open(state_file, params, resume)
     try:
         conn = mysql.connector.connect(**DB_CONFIG)
         cursor = conn.cursor(dictionary=True)
 
         for table in TABLES:
             print(f"\n[INFO] Tabell: {table}")
+            progress = checkpoint.table(table)
+            if progress.done:
+                print("[RESUME] Allerede ferdig – hopper over")
+                continue
+            ensure_schema(conn, cursor, table)
+            sel = (f"SELECT id, image_url, image_hash, embedding_model, feature_vector IS NOT NULL AS has_vector "
+                   f"FROM {table} WHERE image_url IS NOT NULL AND image_url <> ''")
+            sql_params: tuple = ()
             # plukk bare de som trenger embedding – raskest i praksis
-            if not process_all:
-                sel = f"SELECT id, image_url FROM {table} WHERE feature_vector IS NULL AND image_url IS NOT NULL AND image_url <> ''"
-            else:
-                sel = f"SELECT id, image_url FROM {table} WHERE image_url IS NOT NULL AND image_url <> ''"
-            cursor.execute(sel)
-            rows = cursor.fetchall()
+            if not (process_all or force):
+                sel += " AND (feature_vector IS NULL OR embedding_model IS NULL OR embedding_model <> %s)"
+                sql_params += (EMBEDDING_MODEL_ID,)
+            if shard:
+                sel += " AND MOD(id, %s) = %s"
+                sql_params += (shard[1], shard[0])
+            cursor.execute(sel, sql_params)
+            rows = [(r["id"], r["image_url"], r["image_hash"], r["embedding_model"], bool(r["has_vector"]))
+                    for r in cursor.fetchall()]
+            todo = set(progress.start([r[0] for r in rows]))
+            if len(todo) < len(rows):
+                print(f"[RESUME] {len(rows) - len(todo)} rader allerede ferdige")
+                rows = [r for r in rows if r[0] in todo]
             print(f"[INFO] Rader å prosessere: {len(rows)}")
             if not rows:
+                progress.done = True
+                checkpoint.save()
                 continue
-
-            # 1) Parallell nedlasting (rask)
-            id_url = [(r["id"], r["image_url"]) for r in rows]
-            prepared = prepare_images_parallel(id_url)
-            print(f"[INFO] Nedlastet: {len(prepared)}")
-
-            # 2) CLIP i batcher + bulk-commit
-            update_sql = f"UPDATE {table} SET feature_vector = %s WHERE id = %s"
-            buffer = []
-            done = 0
-            for i in range(0, len(prepared), BATCH_SIZE):
-                batch = prepared[i:i+BATCH_SIZE]
-                pids, imgs = zip(*batch)
-                vecs = images_to_clip_vectors(list(imgs))  # (B, D)
-                for pid, vec in zip(pids, vecs):
-                    buffer.append((json.dumps(vec.tolist()), pid))
-                    done += 1
-                if len(buffer) >= COMMIT_EVERY:
-                    cursor.executemany(update_sql, buffer)
-                    conn.commit()
-                    total_updated += len(buffer)
-                    buffer.clear()
-                    print(f"  [OK] {done}/{len(prepared)} i {table}")
-
-            if buffer:
-                cursor.executemany(update_sql, buffer)
-                conn.commit()
-                total_updated += len(buffer)
-                print(f"  [OK] {done}/{len(prepared)} i {table}")
+            total_updated += embed_table(conn, table, rows, vector_dtype, pool, fetcher, force, progress, checkpoint)
+        checkpoint.finished = True
+        checkpoint.save()
+        ok = True
 
     except mysql.connector.Error as e:
         print(f"[DB] Feil: {e}")
     finally:
+        fetcher.close()
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
         if conn and conn.is_connected():
             conn.close()
-    print(f"\n[FULLFØRT] Oppdatert {total_updated} rader på {time.time()-started:.1f}s")
+    failures = checkpoint.failures()
+    print(f"\n[FULLFØRT] Oppdatert {total_updated} rader på {time.time()-started:.1f}s"
+          + (f", {failures} feilet (se {state_file})" if failures else ""))
+    return ok
+
+def build_snapshot_index(store: VectorStore, snapshot_dir: str):
+    """Bygger SEARCH_INDEX-filene for den nye versjonen før CURRENT byttes (exact: ingenting å bygge)."""
+    if SEARCH_INDEX == "ivf":
+        store.attach_ivf(nlist=IVF_NLIST or None, cache_dir=snapshot_dir)
+    elif SEARCH_INDEX in ("pq", "ivfpq"):
+        store.attach_pq(m=PQ_M, cache_dir=snapshot_dir, ivf=SEARCH_INDEX == "ivfpq", nlist=IVF_NLIST or None)
+
+def export_snapshot(snapshot_dir: str) -> str | None:
+    """
+    Leser alle vektorer fra MySQL og skriver et versjonert snapshot (.npy + metadata)
+    som clip_server kan memory-mappe (VECTOR_SNAPSHOT_DIR).
+    """
+    try:
+        store = VectorStore.from_db(DB_CONFIG, TABLES)
+    except mysql.connector.Error as e:
+        print(f"[DB] Feil: {e}")
+        return None
+    if store.size == 0:
+        print("[SNAPSHOT] Ingen vektorer å eksportere")
+        return None
+    version = write_snapshot(store, snapshot_dir, before_publish=lambda s: build_snapshot_index(s, snapshot_dir))
+    print(f"[SNAPSHOT] Skrev {store.size} vektorer til {snapshot_dir} (versjon {version})")
+    return version
+
+# ---------------------- Lokal launcher (--workers N) ---------------
+def launch_shards(workers: int, threads: int, child_args: list[str]) -> int:
+    """
+    Starter `workers` prosesser av dette skriptet med --shard k/N og --threads T, så en maskin med
+    mange kjerner kjører N modellinstanser med T intra-op-tråder hver i stedet for én overtegnet pool.
+    Utskriften prefikses med shard-nummeret. Returnerer 0 hvis alle shards fullførte.
+    """
+    prepare_schema()  # ALTER TABLE én gang, ikke N ganger samtidig
+    env = dict(os.environ)
+    env["OMP_NUM_THREADS"] = env["MKL_NUM_THREADS"] = str(threads)
+    env.setdefault("PREPROCESS_WORKERS", "0")  # kjernene er allerede fordelt på shardene
+    env["PYTHONUNBUFFERED"] = "1"
+    procs = []
+    for k in range(workers):
+        cmd = [sys.executable, os.path.abspath(__file__), "--shard", f"{k}/{workers}", "--threads", str(threads), *child_args]
+        procs.append(subprocess.Popen(cmd, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                      text=True, encoding="utf-8", errors="replace"))
+
+    def pump(k, proc):
+        for line in proc.stdout:
+            print(f"[shard {k}/{workers}] {line}", end="", flush=True)
+    pumps = [threading.Thread(target=pump, args=(k, proc), daemon=True) for k, proc in enumerate(procs)]
+    for t in pumps:
+        t.start()
+
+    def stop(*_):
+        for proc in procs:
+            if proc.poll() is None:
+                proc.terminate()  # shardene lagrer sjekkpunkt og avslutter pent (SIGTERM)
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    codes = [proc.wait() for proc in procs]
+    for t in pumps:
+        t.join()
+    failed = [f"{k}/{workers}" for k, code in enumerate(codes) if code != 0]
+    if failed:
+        print(f"[LAUNCHER] Shards som feilet: {', '.join(failed)} – kjør på nytt med --resume")
+        return 1
+    print(f"[LAUNCHER] Alle {workers} shards fullført")
+    return 0
 
 # ---------------------- CLI ---------------------------------------
 if __name__ == "__main__":
     ap = argparse.ArgumentParser(description="Regenerer CLIP-vektorer for produkter")
-    ap.add_argument("--all", action="store_true", help="Prosesser ALLE rader (ikke bare NULL)")
+    ap.add_argument("--all", action="store_true", help="Sjekk ALLE rader, men beregn bare der bilde/modell er endret")
+    ap.add_argument("--force", action="store_true", help="Beregn alle vektorer på nytt uansett")
+    ap.add_argument("--resume", action="store_true", help="Fortsett en avbrutt jobb fra sjekkpunktet")
+    ap.add_argument("--state", default=JOB_STATE_FILE, metavar="FIL", help="Sjekkpunktfil (standard cache/vector_job_state.json)")
+    ap.add_argument("--dtype", choices=sorted(DTYPE_CODES), default=VECTOR_DTYPE, help="Lagringstype for vektorene")
+    ap.add_argument("--shard", type=parse_shard, metavar="i/N", help="Bare rader med id %% N == i (del jobben på N prosesser/maskiner)")
+    ap.add_argument("--workers", type=int, default=0, metavar="N", help="Start N lokale shard-prosesser (--shard 0/N .. N-1/N)")
+    ap.add_argument("--threads", type=int, default=0, metavar="T",
+                    help="torch-tråder per prosess (standard: alle kjerner, med --workers: kjerner/N)")
+    ap.add_argument("--snapshot", metavar="DIR", help="Eksporter et memory-map-snapshot til DIR etterpå")
+    ap.add_argument("--snapshot-only", action="store_true", help="Bare eksporter snapshot (ingen ny embedding)")
     args = ap.parse_args()
-    regenerate_feature_vectors(process_all=args.all)
+    if args.snapshot_only and not args.snapshot:
+        ap.error("--snapshot-only krever --snapshot DIR")
+    if args.workers and args.shard:
+        ap.error("--workers og --shard kan ikke kombineres (launcheren velger shards selv)")
+    if args.workers > 1 and not args.snapshot_only:
+        threads = args.threads or max(1, (os.cpu_count() or 1) // args.workers)
+        child_args = [flag for flag, on in (("--all", args.all), ("--force", args.force), ("--resume", args.resume)) if on]
+        child_args += ["--dtype", args.dtype, "--state", args.state]
+        code = launch_shards(args.workers, threads, child_args)
+        if code == 0 and args.snapshot:
+            export_snapshot(args.snapshot)  # først når alle shards har skrevet sine rader
+        sys.exit(code)
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    # SIGTERM (preemptible node / docker stop) -> vanlig avslutning, så tilkoblinger lukkes; sjekkpunktet er
+    # allerede lagret etter siste commit
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(143))
+    if not args.snapshot_only:
+        ok = regenerate_feature_vectors(process_all=args.all, vector_dtype=args.dtype, force=args.force,
+                                        resume=args.resume, state_file=args.state, shard=args.shard)
+        if not ok:
+            sys.exit(1)
+    if args.snapshot:
+        export_snapshot(args.snapshot)
@@ -0,0 +1,138 @@
+# backend/image_cache.py
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from fileio import atomic_write
+
+
+class ImageCache:
+    """
+    Disk-cache for produktbilder, nøkkel = hash av URL.
+
+    Per bilde: `cache_dir/ab/<nøkkel>.img` (rå bytes) + `<nøkkel>.json` med url, ETag og Last-Modified.
+    ImageFetcher bruker validatorene til betingede GET-er (If-None-Match / If-Modified-Since):
+    304 Not Modified -> bytes leses fra disk, ingen ny nedlasting. Bare svar med validatorer lagres
+    (uten dem kan vi uansett ikke vite om bildet er uendret).
+    Begrenset til `max_bytes`; eldst brukte slettes først. Trådsikker (brukes fra alle nedlastingstrådene).
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int = 10 * 1024**3):
+        self.cache_dir = cache_dir
+        self.max_bytes = max(0, int(max_bytes))
+        self._index: OrderedDict[str, int] = OrderedDict()  # nøkkel -> bytes på disk, eldst brukt først
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.not_modified = 0
+        self.stored = 0
+        os.makedirs(cache_dir, exist_ok=True)
+        self._scan()
+
+    # ---------- Nøkler og filstier ----------
+    @staticmethod
+    def key(url: str) -> str:
+        return hashlib.blake2b(url.encode("utf-8"), digest_size=20).hexdigest()
+
+    def _path(self, key: str, ext: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.{ext}")
+
+    def _scan(self):
+        # Gjenoppbygg indeksen ved oppstart, sortert på sist brukt (mtime på metafilen)
+        found = []
+        for shard in os.listdir(self.cache_dir):
+            shard_dir = os.path.join(self.cache_dir, shard)
+            if not os.path.isdir(shard_dir):
+                continue
+            for name in os.listdir(shard_dir):
+                if not name.endswith(".json"):
+                    continue
+                key = name[:-5]
+                try:
+                    meta_st = os.stat(os.path.join(shard_dir, name))
+                    size = os.path.getsize(self._path(key, "img")) + meta_st.st_size
+                except OSError:
+                    continue  # halvveis slettet
+                found.append((meta_st.st_mtime, key, size))
+        for _, key, size in sorted(found):
+            self._index[key] = size
+            self._bytes += size
+        self._evict()
+
+    # ---------- Oppslag ----------
+    def validators(self, url: str) -> dict | None:
+        """Lagrede {etag, last_modified} for URL-en, eller None hvis den ikke er cachet."""
+        key = self.key(url)
+        with self._lock:
+            if key not in self._index:
+                return None
+        try:
+            with open(self._path(key, "json"), encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            self._drop(key)
+            return None
+        return meta if meta.get("url") == url else None
+
+    def read(self, url: str) -> bytes | None:
+        """Bytes fra disk (etter 304). Markerer oppføringen som nylig brukt."""
+        key = self.key(url)
+        try:
+            with open(self._path(key, "img"), "rb") as f:
+                data = f.read()
+            os.utime(self._path(key, "json"))
+        except OSError:
+            self._drop(key)
+            return None
+        with self._lock:
+            if key in self._index:
+                self._index.move_to_end(key)
+            self.not_modified += 1
+        return data
+
+    def store(self, url: str, data: bytes, etag: str | None, last_modified: str | None):
+        if not self.max_bytes or not (etag or last_modified):
+            return
+        key = self.key(url)
+        meta = json.dumps({"url": url, "etag": etag, "last_modified": last_modified}).encode("utf-8")
+        try:
+            # Bytes først, metadata sist: finnes .json, er .img komplett
+            os.makedirs(os.path.dirname(self._path(key, "img")), exist_ok=True)
+            atomic_write(self._path(key, "img"), lambda f: f.write(data), fsync=False)
+            atomic_write(self._path(key, "json"), lambda f: f.write(meta), fsync=False)
+        except OSError as e:
+            print(f"[BILDECACHE] Kunne ikke skrive {url}: {e}")
+            return
+        with self._lock:
+            self._bytes += len(data) + len(meta) - self._index.pop(key, 0)
+            self._index[key] = len(data) + len(meta)
+            self.stored += 1
+            self._evict()
+
+    # ---------- Intern lagring ----------
+    def _drop(self, key: str):
+        with self._lock:
+            self._bytes -= self._index.pop(key, 0)
+        for ext in ("json", "img"):
+            try:
+                os.remove(self._path(key, ext))
+            except OSError:
+                pass
+
+    def _evict(self):
+        # Kalles med låsen holdt
+        while self._index and self._bytes > self.max_bytes:
+            key, size = self._index.popitem(last=False)
+            self._bytes -= size
+            for ext in ("json", "img"):
+                try:
+                    os.remove(self._path(key, ext))
+                except OSError:
+                    pass
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"items": len(self._index), "bytes": self._bytes, "max_bytes": self.max_bytes,
+                    "not_modified": self.not_modified, "stored": self.stored}
+
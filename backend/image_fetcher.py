@@ -0,0 +1,139 @@
+# backend/image_fetcher.py
+import threading
+from collections import Counter
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from image_cache import ImageCache
+
+# Henter produktbilder for vektorjobben fra mange tråder samtidig:
+#   - én Session med HTTPAdapter-pool stor nok til alle trådene (keep-alive, ingen "pool is full"-kast)
+#   - retry med eksponentiell backoff på tidsavbrudd/tilkoblingsfeil og 429/5xx (respekterer Retry-After)
+#   - maks per_host samtidige forespørsler mot samme vert, så én CDN ikke hamres av alle trådene
+#   - valgfri ImageCache: betingede GET-er, 304 -> bytes fra disk
+#   - FetchReport per tabell: hvor mange som feilet, og hvorfor
+
+RETRY_STATUS = (429, 500, 502, 503, 504)
+
+
+class FetchReport:
+    """Trådsikker oppsummering av nedlastinger for én tabell."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.ok = 0
+        self.bytes = 0          # lastet ned over nettet
+        self.not_modified = 0   # 304 – servert fra bildecachen
+        self.reasons: Counter = Counter()
+        self.failed: list[tuple[str, str]] = []  # (url, årsak)
+        self._reason_by_url: dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def success(self, nbytes: int, cached: bool = False):
+        with self._lock:
+            self.ok += 1
+            if cached:
+                self.not_modified += 1
+            else:
+                self.bytes += nbytes
+
+    def failure(self, url: str, reason: str):
+        with self._lock:
+            self.reasons[reason] += 1
+            self.failed.append((url, reason))
+            self._reason_by_url[url] = reason
+
+    def reason(self, url: str) -> str | None:
+        with self._lock:
+            return self._reason_by_url.get(url)
+
+    def print(self, examples: int = 3):
+        total = self.ok + len(self.failed)
+        print(f"[HENTING] {self.name}: {self.ok}/{total} ok ({self.not_modified} uendret fra cache), "
+              f"{self.bytes/1e6:.1f} MB lastet ned, {len(self.failed)} feilet")
+        for reason, n in self.reasons.most_common():
+            urls = [u for u, r in self.failed if r == reason][:examples]
+            print(f"  {n:>6} x {reason}   f.eks. {', '.join(urls)}")
+
+
+def _reason(e: Exception) -> str:
+    if isinstance(e, requests.HTTPError) and e.response is not None:
+        return f"HTTP {e.response.status_code}"
+    if isinstance(e, requests.exceptions.RetryError):
+        return "for mange retries"
+    if isinstance(e, requests.Timeout):
+        return "tidsavbrudd"
+    if isinstance(e, requests.ConnectionError):
+        return "tilkoblingsfeil"
+    return type(e).__name__
+
+
+class ImageFetcher:
+    def __init__(self, workers: int = 16, per_host: int = 8, retries: int = 3,
+                 backoff: float = 0.5, timeout: float = 20.0, cache: ImageCache | None = None):
+        self.per_host = per_host
+        self.cache = cache
+        self.timeout = timeout
+        retry = Retry(
+            total=retries, connect=retries, read=retries, status=retries,
+            backoff_factor=backoff,            # 0.5s, 1s, 2s, ...
+            status_forcelist=RETRY_STATUS,
+            allowed_methods=frozenset(["GET", "HEAD"]),
+            respect_retry_after_header=True,
+            raise_on_status=False,             # siste svar returneres, så raise_for_status gir riktig årsak
+        )
+        # pool_maxsize >= antall tråder som kan snakke med samme vert; ellers kastes tilkoblinger etter bruk
+        adapter = HTTPAdapter(pool_connections=32, pool_maxsize=max(workers, per_host), max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._hosts: dict[str, threading.BoundedSemaphore] = {}
+        self._hosts_lock = threading.Lock()
+
+    def _host_slot(self, url: str) -> threading.BoundedSemaphore:
+        host = urlsplit(url).netloc.lower()
+        with self._hosts_lock:
+            sem = self._hosts.get(host)
+            if sem is None:
+                sem = self._hosts[host] = threading.BoundedSemaphore(self.per_host)
+            return sem
+
+    def fetch(self, url: str, report: FetchReport | None = None) -> bytes | None:
+        """Bildebytes, eller None etter retries (årsaken havner i report)."""
+        cached = self.cache.validators(url) if self.cache is not None else None
+        try:
+            with self._host_slot(url):
+                result = self._get(url, cached)
+                if result is None:  # 304, men cachefilen forsvant – hent på nytt uten betingelser
+                    result = self._get(url, None)
+        except Exception as e:
+            if report is not None:
+                report.failure(url, _reason(e))
+            return None
+        data, from_cache = result
+        if report is not None:
+            report.success(len(data), cached=from_cache)
+        return data
+
+    def _get(self, url: str, cached: dict | None) -> tuple[bytes, bool] | None:
+        """(bytes, fra_cache). None hvis serveren svarte 304 men bytes ikke kunne leses fra disk."""
+        headers = {}
+        if cached:
+            if cached.get("etag"):
+                headers["If-None-Match"] = cached["etag"]
+            if cached.get("last_modified"):
+                headers["If-Modified-Since"] = cached["last_modified"]
+        r = self.session.get(url, timeout=self.timeout, headers=headers)
+        if r.status_code == 304 and cached:
+            data = self.cache.read(url)
+            return (data, True) if data is not None else None
+        r.raise_for_status()
+        if self.cache is not None:
+            self.cache.store(url, r.content, r.headers.get("ETag"), r.headers.get("Last-Modified"))
+        return r.content, False
+
+    def close(self):
+        self.session.close()
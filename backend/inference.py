@@ -0,0 +1,138 @@
+# backend/inference.py
+import numpy as np
+import torch
+from PIL import Image
+
+from preprocess import clip_pixels, pixel_batch, decode_image
+import clip_backend
+import detection
+
+# Modellkoden ligger i egen modul slik at den kan kjøres både i en tråd i
+# clip_server og i en egen prosess (ProcessPoolExecutor) uten å dra med seg
+# FastAPI-appen og vektorlasting fra DB.
+
+DEVICE = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+CLIP_MODEL_NAME = "openai/clip-vit-base-patch32"
+# torch (fp32) | int8 | onnx – se clip_backend.py. Med i cache-namespace, så vektorer fra ulike backends ikke blandes
+CLIP_BACKEND = clip_backend.CLIP_BACKEND
+CLIP_MODEL_ID = clip_backend.model_id(CLIP_MODEL_NAME, CLIP_BACKEND)
+# maskrcnn | fasterrcnn_mobilenet | ssdlite | none (+ DETECT_SIZE) – se detection.py
+DETECTION_ID = detection.mode_id()
+# Opplastinger dekodes bare ned hit: nok til en skarp crop (800 px), eller CLIP-størrelse uten deteksjon
+DETECT_MIN_SIDE = detection.decode_min_side()
+
+# Resultatkoder for bilder som ikke gir en vektor
+INVALID_IMAGE = "invalid_image"
+NO_CLOTHES = "no_clothes"
+
+# ---------- Modeller (lazy, én gang per prosess) ----------
+_models = None
+def get_models() -> dict:
+    global _models
+    if _models is None:
+        from transformers import CLIPProcessor
+        _models = {
+            "detector": detection.Detector(device=DEVICE),
+            "clip": clip_backend.load_backend(CLIP_BACKEND, CLIP_MODEL_NAME, DEVICE),
+            "processor": CLIPProcessor.from_pretrained(CLIP_MODEL_NAME),
+        }
+    return _models
+
+def init_worker(num_threads: int = 0):
+    """Initializer for prosess-pool: begrens intra-op-tråder og last modellene før første kall."""
+    if num_threads > 0:
+        torch.set_num_threads(num_threads)
+    get_models()
+
+# ---------- Hjelpefunksjoner ----------
+def _best_box(out: dict, score_thresh: float):
+    # velg beste boks over terskel
+    best = None
+    best_score = -1.0
+    for b, s in zip(out.get("boxes", []), out.get("scores", [])):
+        s = float(s.item())
+        if s > score_thresh and s > best_score:
+            best = b
+            best_score = s
+    return best
+
+def crop_best_boxes(images: list[Image.Image]) -> list[Image.Image | None]:
+    """
+    Kjører detektoren på hele batchen i ett kall (bildene kan ha ulik størrelse).
+    Uten detektor (DETECTOR=none) brukes hele bildet.
+    """
+    if not images:
+        return []
+    detector = get_models()["detector"]
+    if detector.model is None:
+        return list(images)
+    crops = []
+    for image_pil, out in zip(images, detector.detect(images)):
+        best = _best_box(out, detector.score_thresh)
+        if best is None:
+            crops.append(None)
+            continue
+        x1, y1, x2, y2 = [int(v) for v in best.tolist()]
+        crops.append(image_pil.crop((x1, y1, x2, y2)))
+    return crops
+
+def crop_best_box(image_pil: Image.Image):
+    return crop_best_boxes([image_pil])[0]
+
+def clip_pixel_embeddings(pixel_values: torch.Tensor) -> torch.Tensor:
+    """Bare forward pass: ferdig forbehandlede pixel_values (B, 3, 224, 224) -> (B, D) L2-normalisert på CPU."""
+    return get_models()["clip"].image_features(pixel_values)
+
+def clip_image_embeddings(images: list[Image.Image]) -> torch.Tensor:
+    """(B, D) L2-normaliserte CLIP-vektorer på CPU (forbehandling via preprocess.clip_pixels)."""
+    return clip_pixel_embeddings(pixel_batch([clip_pixels(im) for im in images]))
+
+def clip_image_embedding(image_pil: Image.Image):
+    return clip_image_embeddings([image_pil])[0]  # (D,)
+
+def clip_text_embeddings(texts: list[str]) -> np.ndarray:
+    """(T, D) L2-normaliserte CLIP-tekstvektorer – brukes til zero-shot-kategorier ved oppstart."""
+    m = get_models()
+    inputs = m["processor"](text=texts, return_tensors="pt", padding=True)
+    return m["clip"].text_features(inputs).numpy().astype(np.float32)
+
+def decode_upload(data: bytes) -> Image.Image | None:
+    return decode_image(data, min_side=DETECT_MIN_SIDE)
+
+def prepare_upload(data: bytes) -> Image.Image | np.ndarray | None:
+    """
+    Kjøres i preprocess-poolen: dekoder opplastingen, og uten detektor (DETECTOR=none) også resize/crop til
+    CLIP-input (uint8), så inference-tråden bare kjører forward pass. Med detektor avhenger CLIP-inputen av
+    boksen, så da returneres bildet og clip_pixels kjøres på cropen i analyze_batch.
+    """
+    img = decode_upload(data)
+    if img is None or DETECTION_ID != "none":
+        return img
+    return clip_pixels(img)
+
+def analyze_batch(uploads: list) -> list:
+    """
+    Kjøres av batcheren (i tråd eller prosess): detektor og CLIP på hele batchen.
+    Elementene er ferdige CLIP-pixler (uint8, fra prepare_upload uten detektor), dekodede PIL-bilder
+    (prepare_upload med detektor) eller rå bytes, som da dekodes her.
+    Returnerer per bilde enten en float32-vektor (D,) eller en resultatkode (INVALID_IMAGE / NO_CLOTHES).
+    """
+    results: list = [INVALID_IMAGE] * len(uploads)
+    pixels = {i: u for i, u in enumerate(uploads) if isinstance(u, np.ndarray)}
+    images = [None if i in pixels else u if isinstance(u, Image.Image) else decode_upload(u)
+              for i, u in enumerate(uploads)]
+    valid = [i for i, im in enumerate(images) if im is not None]
+
+    crops = crop_best_boxes([images[i] for i in valid])
+    for i, crop in zip(valid, crops):
+        if crop is None:
+            results[i] = NO_CLOTHES
+        else:
+            pixels[i] = clip_pixels(crop)
+
+    if pixels:
+        order = sorted(pixels)
+        embs = clip_pixel_embeddings(pixel_batch([pixels[i] for i in order])).numpy().astype(np.float32)
+        for i, emb in zip(order, embs):
+            results[i] = emb
+    return results
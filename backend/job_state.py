@@ -0,0 +1,157 @@
+# backend/job_state.py
+import bisect
+import json
+import os
+import threading
+import time
+
+from fileio import atomic_write
+
+# Sjekkpunkt for lange vektorjobber, så en avbrutt kjøring (preemptible node, Ctrl+C, krasj) kan fortsette
+# med --resume i stedet for å starte på nytt. Lagres som JSON (atomisk) etter hver DB-commit:
+#   {"params": {...}, "finished": false, "tables": {"hm_products": {
+#       "done": false, "cursor": 1234, "ranges": [[1, 1234], [1300, 1410]], "failed": {"1250": "HTTP 404"}}}}
+# ranges = id-intervaller der alle valgte rader er ferdige (skrevet eller uendret); cursor = slutten på
+# første sammenhengende intervall. Feilede rader prøves på nytt ved --resume (tabellen er ikke "done" før de er ok).
+
+
+class TableProgress:
+    def __init__(self, ranges: list | None = None, failed: dict | None = None, done: bool = False):
+        self.prior = sorted([int(lo), int(hi)] for lo, hi in (ranges or []))  # fra forrige kjøring
+        self.failed: dict[int, str] = {int(k): v for k, v in (failed or {}).items()}
+        self.done = done
+        self._ids: list[int] = []        # rekkefølgen radene er valgt i (sortert på id)
+        self._pos: dict[int, int] = {}
+        self._finished: set[int] = set()  # posisjoner ferdige i denne kjøringen
+        self._lock = threading.RLock()  # to_dict() holder den rundt ranges()
+
+    def is_done(self, pid: int) -> bool:
+        i = bisect.bisect_right(self.prior, [pid, float("inf")]) - 1
+        return i >= 0 and self.prior[i][0] <= pid <= self.prior[i][1]
+
+    def start(self, ids: list[int]) -> list[int]:
+        """
+        Registrerer radene for denne kjøringen og returnerer de som ikke allerede er ferdige.
+        Feilede id-er som ikke lenger er valgt (slettet, eller ikke lenger i utvalget) glemmes,
+        ellers ville tabellen aldri bli "done".
+        """
+        selected = set(ids)
+        with self._lock:
+            self.failed = {pid: reason for pid, reason in self.failed.items() if pid in selected}
+        todo = sorted(pid for pid in ids if not self.is_done(pid))
+        self._ids = todo
+        self._pos = {pid: i for i, pid in enumerate(todo)}
+        return todo
+
+    def mark(self, pids):
+        with self._lock:
+            for pid in pids:
+                pos = self._pos.get(pid)
+                if pos is not None:
+                    self._finished.add(pos)
+                self.failed.pop(pid, None)
+
+    def fail(self, pid: int, reason: str):
+        with self._lock:
+            self.failed[pid] = reason
+            pos = self._pos.get(pid)
+            if pos is not None:
+                self._finished.add(pos)  # ferdig for denne kjøringen, men ikke med i ranges
+
+    def settle(self, reason: str = "falt ut av pipelinen") -> int:
+        """
+        Etter kjøringen: rader som ble startet, men verken markert eller feilet (f.eks. et steg som kastet),
+        registreres som feilet, så tabellen ikke blir "done" og --resume prøver dem igjen. Returnerer antallet.
+        """
+        with self._lock:
+            lost = [i for i in range(len(self._ids)) if i not in self._finished]
+            for i in lost:
+                self.failed[self._ids[i]] = reason
+                self._finished.add(i)
+        return len(lost)
+
+    def ranges(self) -> list[list[int]]:
+        with self._lock:
+            finished = {p for p in self._finished if self._ids[p] not in self.failed}
+        runs, start = [], None
+        for i in range(len(self._ids) + 1):
+            if i < len(self._ids) and i in finished:
+                if start is None:
+                    start = i
+            elif start is not None:
+                runs.append([self._ids[start], self._ids[i - 1]])
+                start = None
+        merged: list[list[int]] = []
+        for lo, hi in sorted(self.prior + runs):
+            if merged and lo <= merged[-1][1] + 1:  # [1, 5] + [6, 8] -> [1, 8]
+                merged[-1][1] = max(merged[-1][1], hi)
+            else:
+                merged.append([lo, hi])
+        return merged
+
+    def to_dict(self) -> dict:
+        # Under låsen: pipeline-trådene endrer failed/_finished mens sjekkpunktet lagres
+        with self._lock:
+            ranges = self.ranges()
+            return {
+                "done": self.done,
+                "cursor": ranges[0][1] if ranges else None,
+                "ranges": ranges,
+                "failed": {str(k): v for k, v in sorted(self.failed.items())},
+            }
+
+
+class JobCheckpoint:
+    def __init__(self, path: str, params: dict):
+        self.path = path
+        self.params = params
+        self.tables: dict[str, TableProgress] = {}
+        self.started = time.time()
+        self.finished = False
+        self._save_lock = threading.Lock()
+
+    @classmethod
+    def open(cls, path: str, params: dict, resume: bool) -> "JobCheckpoint":
+        """Ny tilstand, eller (resume=True) fortsettelse av en uferdig jobb med samme parametere."""
+        state = cls(path, params)
+        if not resume:
+            return state
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            print(f"[RESUME] Fant ikke {path} – starter fra begynnelsen")
+            return state
+        if data.get("params") != params:
+            print(f"[RESUME] {path} er fra en jobb med andre parametere ({data.get('params')}) – starter fra begynnelsen")
+            return state
+        if data.get("finished"):
+            print("[RESUME] Forrige jobb ble fullført – starter en ny")
+            return state
+        state.started = data.get("started", state.started)
+        for name, t in data.get("tables", {}).items():
+            state.tables[name] = TableProgress(t.get("ranges"), t.get("failed"), t.get("done", False))
+        tables_done = sum(t.done for t in state.tables.values())
+        print(f"[RESUME] Fortsetter jobben fra {path} ({tables_done} tabeller ferdige, "
+              f"{sum(len(t.prior) for t in state.tables.values())} ferdige id-intervaller)")
+        return state
+
+    def table(self, name: str) -> TableProgress:
+        if name not in self.tables:
+            self.tables[name] = TableProgress()
+        return self.tables[name]
+
+    def save(self):
+        data = {
+            "params": self.params,
+            "started": self.started,
+            "updated": time.time(),
+            "finished": self.finished,
+            "tables": {name: t.to_dict() for name, t in self.tables.items()},
+        }
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with self._save_lock:
+            atomic_write(self.path, lambda f: json.dump(data, f, indent=1), mode="w")
+
+    def failures(self) -> int:
+        return sum(len(t.failed) for t in self.tables.values())
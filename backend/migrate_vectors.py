@@ -0,0 +1,99 @@
+# backend/migrate_vectors.py
+import os, argparse, time
+import mysql.connector
+from dotenv import load_dotenv
+
+from vector_codec import encode_vector, decode_vector, is_binary, ensure_blob_column, DTYPE_CODES
+
+# Engangsmigrering: feature_vector fra JSON-tekst -> binær BLOB (se vector_codec.py)
+#   python migrate_vectors.py                 # float32
+#   python migrate_vectors.py --dtype float16 # halv størrelse
+
+load_dotenv()
+
+DB_CONFIG = {
+    "host": os.getenv("DB_HOST", "127.0.0.1"),
+    "port": int(os.getenv("DB_PORT", "3306")),
+    "user": os.getenv("DB_USER", "root"),
+    "password": os.getenv("DB_PASSWORD", "root"),
+    "database": os.getenv("DB_NAME", "clothing_data"),
+}
+
+TABLES = ["hm_products", "weekday_products", "zara_products", "follestad_products"]
+FETCH_SIZE = 1000  # rader per runde (holder minnet flatt)
+
+
+def migrate_table(conn, table: str, dtype: str, dry_run: bool = False) -> tuple[int, int, int]:
+    """Returnerer (konvertert, allerede_binær, ugyldig) for tabellen."""
+    cursor = conn.cursor(dictionary=True)
+    if not dry_run and ensure_blob_column(cursor, table):
+        print(f"[INFO] {table}.feature_vector endret til BLOB")
+
+    converted = already = invalid = 0
+    bytes_before = bytes_after = 0
+    last_id = 0
+    update_sql = f"UPDATE {table} SET feature_vector = %s WHERE id = %s"
+    while True:
+        cursor.execute(
+            f"SELECT id, feature_vector FROM {table} "
+            f"WHERE id > %s AND feature_vector IS NOT NULL ORDER BY id LIMIT %s",
+            (last_id, FETCH_SIZE),
+        )
+        rows = cursor.fetchall()
+        if not rows:
+            break
+        last_id = rows[-1]["id"]
+
+        updates = []
+        for r in rows:
+            raw = r["feature_vector"]
+            if is_binary(raw):
+                already += 1
+                continue
+            try:
+                vec = decode_vector(raw)
+            except ValueError:
+                invalid += 1
+                continue
+            blob = encode_vector(vec, dtype)
+            bytes_before += len(raw)
+            bytes_after += len(blob)
+            updates.append((blob, r["id"]))
+
+        if updates and not dry_run:
+            cursor.executemany(update_sql, updates)
+            conn.commit()
+        converted += len(updates)
+
+    cursor.close()
+    if bytes_after:
+        print(f"  {bytes_before/1e6:.1f} MB JSON -> {bytes_after/1e6:.1f} MB binært "
+              f"({bytes_before/bytes_after:.1f}x mindre)")
+    return converted, already, invalid
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Konverter feature_vector fra JSON-tekst til binær BLOB")
+    ap.add_argument("--dtype", choices=sorted(DTYPE_CODES), default="float32", help="Lagringstype (standard float32)")
+    ap.add_argument("--tables", nargs="+", default=TABLES, help="Tabeller som skal migreres")
+    ap.add_argument("--dry-run", action="store_true", help="Bare tell og estimer, ikke skriv")
+    args = ap.parse_args()
+
+    started = time.time()
+    conn = None
+    try:
+        conn = mysql.connector.connect(**DB_CONFIG)
+        for table in args.tables:
+            print(f"\n[INFO] Tabell: {table}")
+            converted, already, invalid = migrate_table(conn, table, args.dtype, args.dry_run)
+            print(f"  [OK] konvertert={converted} allerede_binær={already} ugyldig={invalid}")
+    except mysql.connector.Error as e:
+        print(f"[DB] Feil: {e}")
+    finally:
+        if conn and conn.is_connected():
+            conn.close()
+    print(f"\n[FULLFØRT] på {time.time()-started:.1f}s" + (" (dry-run)" if args.dry_run else ""))
+
+
+if __name__ == "__main__":
+    main()
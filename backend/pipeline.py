@@ -0,0 +1,220 @@
+# backend/pipeline.py
+import time
+import queue
+import threading
+
+# Liten tråd-basert strømme-pipeline: kilde -> steg -> steg -> ... med begrensede køer mellom.
+# Fulle køer gir mottrykk bakover, så minnebruken er flat uansett hvor mange rader som prosesseres,
+# og nettverk (nedlasting) overlapper med inferens og DB-skriving.
+#
+#   p = Pipeline(queue_size=256)
+#   q = p.source("rader", rows)
+#   q = p.map("nedlasting", download, q, workers=16)
+#   q = p.batch("clip", embed_batch, q, batch_size=64)
+#   for item in p.run(q): ...
+#   p.report()
+
+END = object()   # markerer at et steg er ferdig
+SKIP = object()  # map-fn returnerer SKIP: elementet er bevisst hoppet over (telles, men ikke som feil)
+
+
+class StageStats:
+    """Teller for ett steg: antall inn/ut/feil, tid brukt i fn (busy) og veggklokke."""
+
+    def __init__(self, name: str, workers: int = 1):
+        self.name = name
+        self.workers = workers
+        self.items = 0    # ut av steget
+        self.failed = 0   # fn returnerte None eller kastet
+        self.skipped = 0  # fn returnerte SKIP
+        self.busy_s = 0.0
+        self.started = time.perf_counter()  # alle steg startes samtidig, så ratene er sammenlignbare
+        self.finished: float | None = None
+        self._lock = threading.Lock()
+
+    def add(self, items: int, failed: int, busy_s: float, skipped: int = 0):
+        with self._lock:
+            self.items += items
+            self.failed += failed
+            self.skipped += skipped
+            self.busy_s += busy_s
+
+    @property
+    def wall_s(self) -> float:
+        return (self.finished or time.perf_counter()) - self.started
+
+    def line(self) -> str:
+        wall = self.wall_s
+        rate = self.items / wall if wall > 0 else 0.0
+        # utnyttelse = andel av workernes tid brukt i fn; nær 100% på ett steg = flaskehalsen
+        util = self.busy_s / (wall * self.workers) if wall > 0 else 0.0
+        return (f"{self.name:<12} {self.items:>7} ut  {self.failed:>5} feil  "
+                f"{rate:8.1f}/s  utnyttelse {util:4.0%}  ({self.workers} worker{'e' if self.workers > 1 else ''})"
+                + (f"  {self.skipped} hoppet over" if self.skipped else ""))
+
+
+class Pipeline:
+    def __init__(self, queue_size: int = 256):
+        self.queue_size = queue_size
+        self.stages: list[StageStats] = []
+        self._threads: list[threading.Thread] = []
+        self._abort = threading.Event()
+        self._error: BaseException | None = None
+
+    # ---------- Køhjelpere (avbrytbare, så en feil i ett steg ikke henger resten) ----------
+    def _queue(self) -> queue.Queue:
+        return queue.Queue(maxsize=self.queue_size)
+
+    def _put(self, q: queue.Queue, item) -> bool:
+        while not self._abort.is_set():
+            try:
+                q.put(item, timeout=0.2)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, q: queue.Queue):
+        while not self._abort.is_set():
+            try:
+                return q.get(timeout=0.2)
+            except queue.Empty:
+                continue
+        return END
+
+    def _start(self, name: str, target, *args):
+        def guarded():
+            try:
+                target(*args)
+            except BaseException as e:
+                if self._error is None:
+                    self._error = e
+                self._abort.set()
+        t = threading.Thread(target=guarded, name=f"pipeline-{name}", daemon=True)
+        self._threads.append(t)
+        t.start()
+
+    def _finish(self, stats: StageStats, out: queue.Queue):
+        stats.finished = time.perf_counter()
+        self._put(out, END)
+
+    # ---------- Steg ----------
+    def source(self, name: str, items) -> queue.Queue:
+        """Mater en iterator inn i pipelinen (blokkerer når neste steg ligger etter)."""
+        stats = StageStats(name)
+        self.stages.append(stats)
+        out = self._queue()
+
+        def run():
+            for item in items:
+                if not self._put(out, item):
+                    return
+                stats.items += 1
+            self._finish(stats, out)
+        self._start(name, run)
+        return out
+
+    def map(self, name: str, fn, inq: queue.Queue, workers: int = 1) -> queue.Queue:
+        """
+        fn(item) -> resultat, kjørt av `workers` tråder. None (eller unntak) = feilet element,
+        SKIP = bevisst hoppet over; begge telles, men sendes ikke videre. Rekkefølgen bevares ikke.
+        """
+        stats = StageStats(name, workers)
+        self.stages.append(stats)
+        out = self._queue()
+        remaining = [workers]
+        lock = threading.Lock()
+
+        def run():
+            while True:
+                item = self._get(inq)
+                if item is END:
+                    self._put(inq, END)  # la søsken-trådene også se slutten
+                    break
+                t0 = time.perf_counter()
+                try:
+                    result = fn(item)
+                except Exception:
+                    result = None
+                skipped = result is SKIP
+                ok = result is not None and not skipped
+                stats.add(ok, result is None, time.perf_counter() - t0, skipped)
+                if ok and not self._put(out, result):
+                    return
+            with lock:
+                remaining[0] -= 1
+                last = remaining[0] == 0
+            if last:
+                self._finish(stats, out)
+        for i in range(workers):
+            self._start(f"{name}-{i}", run)
+        return out
+
+    def batch(self, name: str, fn, inq: queue.Queue, batch_size: int, max_wait_s: float | None = 0.05) -> queue.Queue:
+        """
+        Samler opptil batch_size elementer og kaller fn(liste) -> liste med resultater
+        (én tråd, f.eks. modellen eller DB-skriveren). Er køen tom ventes det maks max_wait_s
+        på en full batch (None = vent alltid på full batch). Unntak fra fn stopper hele pipelinen.
+        """
+        stats = StageStats(name)
+        self.stages.append(stats)
+        out = self._queue()
+
+        def run():
+            ended = False
+            while not ended:
+                item = self._get(inq)
+                if item is END:
+                    break
+                buf = [item]
+                ended = self._fill(inq, buf, batch_size, max_wait_s)
+                t0 = time.perf_counter()
+                results = fn(buf)
+                stats.add(len(results), len(buf) - len(results), time.perf_counter() - t0)
+                for r in results:
+                    if not self._put(out, r):
+                        return
+            if not self._abort.is_set():
+                self._finish(stats, out)
+        self._start(name, run)
+        return out
+
+    def _fill(self, inq: queue.Queue, buf: list, batch_size: int, max_wait_s: float | None) -> bool:
+        """Fyller buf fra køen. Returnerer True hvis forrige steg er ferdig (END lest)."""
+        deadline = None if max_wait_s is None else time.perf_counter() + max_wait_s
+        while len(buf) < batch_size and not self._abort.is_set():
+            timeout = 0.2 if deadline is None else deadline - time.perf_counter()
+            if timeout <= 0:
+                break
+            try:
+                item = inq.get(timeout=timeout)
+            except queue.Empty:
+                continue
+            if item is END:
+                return True
+            buf.append(item)
+        return False
+
+    # ---------- Kjøring ----------
+    def run(self, outq: queue.Queue):
+        """Tømmer siste kø (generator) og venter til alle tråder er ferdige. Re-raiser første feil."""
+        completed = False
+        try:
+            while True:
+                item = self._get(outq)
+                if item is END:
+                    completed = True
+                    break
+                yield item
+        finally:
+            if not completed:
+                self._abort.set()  # forbrukeren stoppet tidlig (eller feil): stopp alle steg
+            for t in self._threads:
+                t.join()
+        if self._error is not None:
+            raise self._error
+
+    def report(self, title: str = ""):
+        print(f"[PIPELINE] {title}".rstrip())
+        for s in self.stages:
+            print(f"  {s.line()}")
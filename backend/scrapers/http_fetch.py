@@ -0,0 +1,105 @@
+# backend/scrapers/http_fetch.py
+import os
+import re
+import threading
+from functools import partial
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+from urllib.parse import urljoin, urlsplit
+
+import requests
+from bs4 import BeautifulSoup
+
+# Nettleserfri henting for butikker som leverer produktlisten ferdig i HTML-en (requests + BeautifulSoup):
+# ingen Chrome, ingen ChromeDriverManager, ingen JS. Adaptere som støtter det setter `http = True` og
+# card_http(); scraper_runtime faller tilbake til Selenium hvis HTML-en ikke har produktene (SCRAPER_MODE=auto).
+#
+# Fixtures: record_fixtures(dir) lagrer hver hentet side som dir/<host><sti>, use_fixtures(dir) starter en lokal
+# http.server over samme mappe og sender alle forespørsler dit – samme parsing, uten nett og uten å plage butikken.
+
+USER_AGENT = ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+              "(KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36")
+HTTP_TIMEOUT = float(os.getenv("SCRAPER_HTTP_TIMEOUT", "20"))
+
+_fixture_base = None   # http://127.0.0.1:<port> når use_fixtures() er aktiv
+_record_dir = None     # mappe som hentede sider lagres i (record_fixtures)
+
+
+def make_session() -> requests.Session:
+    session = requests.Session()
+    session.headers.update({
+        "User-Agent": USER_AGENT,
+        "Accept": "text/html,application/xhtml+xml,application/json;q=0.9,*/*;q=0.8",
+        "Accept-Language": "nb-NO,nb;q=0.9,no;q=0.8,en;q=0.5",
+    })
+    return session
+
+
+# ---------- Fixtures ----------
+def fixture_path(url: str) -> str:
+    """https://www.zalando.no/herreklaer-x/?p=2 -> www.zalando.no/herreklaer-x/index__p=2.html"""
+    parts = urlsplit(url)
+    path = parts.path or "/"
+    if path.endswith("/"):
+        path += "index.html"
+    if parts.query:
+        root, ext = os.path.splitext(path)
+        path = f"{root}__{re.sub(r'[^A-Za-z0-9=_-]+', '_', parts.query)}{ext or '.html'}"
+    return parts.netloc + path
+
+def use_fixtures(directory: str) -> str:
+    """Serverer `directory` på en ledig lokal port og sender alle fetch()-kall dit. Returnerer base-URL-en."""
+    global _fixture_base
+    handler = partial(_QuietHandler, directory=os.path.abspath(directory))
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, name="fixture-server", daemon=True).start()
+    _fixture_base = f"http://127.0.0.1:{server.server_address[1]}"
+    print(f"[HTTP] Fixtures fra {directory} på {_fixture_base}")
+    return _fixture_base
+
+def record_fixtures(directory: str):
+    global _record_dir
+    _record_dir = directory
+
+class _QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+# ---------- Henting ----------
+def fetch(session: requests.Session, url: str) -> bytes:
+    target = f"{_fixture_base}/{fixture_path(url)}" if _fixture_base else url
+    resp = session.get(target, timeout=HTTP_TIMEOUT)
+    resp.raise_for_status()
+    if _record_dir:
+        path = os.path.join(_record_dir, fixture_path(url))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(resp.content)
+    return resp.content
+
+def fetch_soup(session: requests.Session, url: str) -> BeautifulSoup:
+    # bytes inn, så BeautifulSoup leser tegnsettet fra <meta charset>
+    return BeautifulSoup(fetch(session, url), "html.parser")
+
+
+# ---------- Felt fra et kort (samme rolle som text()/attr() i SNAPSHOT_JS) ----------
+def text(tag):
+    return tag.get_text(" ", strip=True) if tag is not None else None
+
+def attr(tag, name):
+    return tag.get(name) if tag is not None else None
+
+def href(tag, base_url):
+    return urljoin(base_url, tag["href"]) if tag is not None and tag.get("href") else None
+
+def img_src(tag, base_url):
+    """Ekte bilde-URL også for lazy-bilder (src er ofte en data:-placeholder før JS har kjørt)."""
+    if tag is None:
+        return None
+    for name in ("src", "data-src", "data-lazy-src"):
+        value = tag.get(name) or ""
+        if value and not value.startswith("data:"):
+            return urljoin(base_url, value)
+    srcset = tag.get("srcset") or tag.get("data-srcset") or ""
+    first = srcset.split(",")[0].split()
+    return urljoin(base_url, first[0]) if first else None
@@ -0,0 +1,48 @@
+# backend/scrapers/run_scrapers.py
+import sys
+import argparse
+
+from scraper_runtime import SCRAPER_WORKERS, SCRAPER_PER_SITE, SCRAPER_MODE, SCRAPER_MODES, run_sites
+from http_fetch import use_fixtures, record_fixtures
+from HM_scraper import HMAdapter
+from zara_scraper import ZaraAdapter
+from weekday_scraper import WeekdayAdapter
+from follestad_scraper import FollestadAdapter
+from zalando_scraper import ZalandoAdapter
+
+# Full katalog-crawl: alle (eller valgte) butikker i én nettleser-pool, så kategoriene kjøres parallelt.
+#   python run_scrapers.py                              # alle butikkene, SCRAPER_WORKERS nettlesere
+#   python run_scrapers.py --sites hm zara --workers 6 --per-site 3
+#   python run_scrapers.py --sites zalando --mode http --record-fixtures fixtures/   # lagre HTML-en som hentes
+#   python run_scrapers.py --sites zalando --mode http --fixtures fixtures/ --dry-run  # parse lagret HTML lokalt
+
+ADAPTERS = {a.name: a for a in (HMAdapter, ZaraAdapter, WeekdayAdapter, FollestadAdapter, ZalandoAdapter)}
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Scraper butikkene parallelt i en pool av headless Chrome")
+    ap.add_argument("--sites", nargs="+", choices=list(ADAPTERS), default=list(ADAPTERS))
+    ap.add_argument("--workers", type=int, default=SCRAPER_WORKERS, help="Antall nettlesere totalt")
+    ap.add_argument("--per-site", type=int, default=SCRAPER_PER_SITE, help="Maks samtidige sider per butikk")
+    ap.add_argument("--mode", choices=SCRAPER_MODES, default=SCRAPER_MODE,
+                    help="auto: HTTP først der butikken støtter det; http: aldri nettleser; browser: alltid Selenium")
+    ap.add_argument("--fixtures", help="Hent HTTP-sider fra lagrede fixtures i denne mappen (lokal server)")
+    ap.add_argument("--record-fixtures", help="Lagre hver HTTP-side som hentes i denne mappen")
+    ap.add_argument("--dry-run", action="store_true", help="Ikke skriv til databasen")
+    args = ap.parse_args()
+
+    if args.fixtures:
+        use_fixtures(args.fixtures)
+    if args.record_fixtures:
+        record_fixtures(args.record_fixtures)
+
+    adapters = []
+    for name in args.sites:
+        adapter = ADAPTERS[name]()
+        adapter.max_concurrency = args.per_site
+        adapters.append(adapter)
+    sys.exit(0 if run_sites(adapters, workers=args.workers, mode=args.mode, save=not args.dry_run) else 1)
+
+
+if __name__ == "__main__":
+    main()
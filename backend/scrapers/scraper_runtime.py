@@ -0,0 +1,437 @@
+# backend/scrapers/scraper_runtime.py
+import os
+import time
+import threading
+from collections import Counter
+
+import mysql.connector
+from mysql.connector.constants import ClientFlag
+from dotenv import load_dotenv
+from selenium import webdriver
+from selenium.webdriver.common.by import By
+from selenium.webdriver.chrome.service import Service
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+from webdriver_manager.chrome import ChromeDriverManager
+
+from waits import install_network_hook
+from http_fetch import USER_AGENT, make_session, fetch_soup
+
+# Felles kjøremiljø for scraperne:
+#   - SiteAdapter: én klasse per butikk (URL-er, tabell, scrape() for én URL) – resten er felles
+#   - BrowserPool: N headless Chrome-workere som deler kategori-URL-ene fra alle butikkene mellom seg,
+#     med maks `max_concurrency` samtidige sider per butikk (så én butikk ikke får alle nettleserne)
+#   - ProductWriter: samme upsert for alle tabeller, strømmet i biter (flere rader per INSERT, commit per bit)
+#     mens crawlet pågår – produktene holdes ikke i minnet, og et krasj mister bare biten som ikke er skrevet
+#   - SCRAPER_MODE: auto = butikker med `http = True` hentes med requests først (http_fetch.py) og faller tilbake
+#     til nettleser per URL hvis HTML-en ikke har produktene; http = aldri nettleser; browser = alltid Selenium.
+#     Chrome startes først når en URL faktisk trenger den.
+# Hver X_scraper.py kan fortsatt kjøres alene; run_scrapers.py kjører flere butikker i samme pool.
+
+load_dotenv()
+
+SCRAPER_WORKERS = int(os.getenv("SCRAPER_WORKERS", "4"))    # nettlesere totalt
+SCRAPER_PER_SITE = int(os.getenv("SCRAPER_PER_SITE", "2"))  # maks samtidige sider mot samme butikk
+SCRAPER_WRITE_CHUNK = int(os.getenv("SCRAPER_WRITE_CHUNK", "500"))  # rader per INSERT/commit
+SCRAPER_MODES = ("auto", "http", "browser")
+SCRAPER_MODE = os.getenv("SCRAPER_MODE", "auto")
+if SCRAPER_MODE not in SCRAPER_MODES:
+    raise ValueError(f"SCRAPER_MODE må være en av {SCRAPER_MODES}, fikk {SCRAPER_MODE!r}")
+
+DB_CONFIG = {
+    "host": os.getenv("DB_HOST", "127.0.0.1"),
+    "port": int(os.getenv("DB_PORT", "3306")),
+    "user": os.getenv("DB_USER", "root"),
+    "password": os.getenv("DB_PASSWORD", "root"),
+    "database": os.getenv("DB_NAME", "clothing_data"),
+}
+
+
+# ---------- Nettleser ----------
+_driver_path = None
+_driver_path_lock = threading.Lock()
+
+def chromedriver_path() -> str:
+    # ChromeDriverManager().install() sjekker versjon over nett – gjøres én gang per kjøring, ikke per nettleser
+    global _driver_path
+    with _driver_path_lock:
+        if _driver_path is None:
+            _driver_path = ChromeDriverManager().install()
+        return _driver_path
+
+def make_driver() -> webdriver.Chrome:
+    options = Options()
+    options.add_argument("--headless")
+    options.add_argument("--disable-gpu")
+    options.add_argument(f"user-agent={USER_AGENT}")
+    driver = webdriver.Chrome(service=Service(chromedriver_path()), options=options)
+    install_network_hook(driver)  # teller fetch/XHR for Waits.network_idle()
+    return driver
+
+
+# ---------- DOM-snapshot ----------
+# Henter alle produktkort på siden i ÉTT execute_script-kall: adapterens card_js er en JS-funksjon (card) => {...}
+# som leser feltene for ett kort; resultatet kommer tilbake som en liste av dicts. Erstatter find_element/get_attribute
+# per felt per produkt (én WebDriver-rundtur hver). Hjelpere tilgjengelig i card_js:
+#   x(card, xpath)  -> første element for en relativ XPath (samme uttrykk som scraperne brukte med By.XPATH)
+#   text(el)        -> synlig tekst (som WebElement.text), null hvis el mangler
+#   attr(el, name)  -> attributt, null hvis el mangler
+SNAPSHOT_JS = """
+const x = (root, xpath) => document.evaluate(xpath, root, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+const text = (el) => el ? (el.innerText || el.textContent || "").trim() : null;
+const attr = (el, name) => el ? el.getAttribute(name) : null;
+const fields = (%s);
+return Array.from(document.querySelectorAll(arguments[0])).map((card) => {
+  try { return fields(card); } catch (e) { return {error: String(e)}; }
+});
+"""
+
+def snapshot_cards(driver, card_css: str, card_js: str) -> list[dict]:
+    return driver.execute_script(SNAPSHOT_JS % card_js, card_css) or []
+
+
+# ---------- Butikk-adapter ----------
+class SiteAdapter:
+    """
+    Én butikk. Underklasser setter name/table/urls og implementerer scrape(driver, url),
+    som returnerer produktene fra én kategori-URL som dicts med
+    product_id, name, category, price, image_url, product_link.
+    """
+    name = "site"
+    table = ""
+    urls: list[str] = []
+    max_concurrency = SCRAPER_PER_SITE
+    resets_vectors = True  # tabellen har feature_vector, som nulles når bildet endres
+    card_css = ""          # ett element per produktkort
+    card_js = ""           # JS-funksjon (card) => {felter}, se SNAPSHOT_JS
+    http = False           # produktlisten ligger ferdig i HTML-en: card_http() + products_from_cards()
+
+    def tasks(self) -> list[str]:
+        return list(self.urls)
+
+    def scrape(self, driver, url: str) -> list[dict]:
+        raise NotImplementedError
+
+    def snapshot(self, driver) -> list[dict]:
+        """Alle produktkort på siden som rå felter (én WebDriver-rundtur)."""
+        cards = snapshot_cards(driver, self.card_css, self.card_js)
+        for card in cards:
+            if "error" in card:
+                print(f"[{self.name.upper()}] JS-feil for et kort: {card['error']}")
+        return [c for c in cards if "error" not in c]
+
+    # ---------- Uten nettleser (http = True) ----------
+    def card_http(self, tag, url: str) -> dict:
+        """Samme rå felter som card_js, men fra et BeautifulSoup-kort (se http_fetch.text/attr/href/img_src)."""
+        raise NotImplementedError
+
+    def next_page_http(self, soup, url: str):
+        """URL til neste side i listen, eller None."""
+        return None
+
+    def products_from_cards(self, cards: list[dict], url: str) -> list[dict]:
+        """Rå kort -> produkt-dicts; deles av scrape() og scrape_http() så prisvask o.l. er likt."""
+        raise NotImplementedError
+
+    def scrape_http(self, session, url: str) -> list[dict]:
+        products, seen = [], set()
+        page_url = url
+        while page_url and page_url not in seen:
+            seen.add(page_url)
+            soup = fetch_soup(session, page_url)
+            cards = [self.card_http(tag, page_url) for tag in soup.select(self.card_css)]
+            print(f"[{self.name.upper()}] {len(cards)} kort i HTML fra {page_url}")
+            products += self.products_from_cards(cards, url)
+            page_url = self.next_page_http(soup, page_url)
+        return products
+
+    # Felles hjelpere for adapterne
+    def accept_cookies(self, driver, timeout: float = 10):
+        try:
+            cookie_button = WebDriverWait(driver, timeout).until(
+                EC.element_to_be_clickable((By.XPATH, "//button[contains(text(), 'Godta')]"))
+            )
+            cookie_button.click()
+            print("Cookie-banner fjernet.")
+        except Exception as e:
+            print("Ingen cookie-banner funnet:", e)
+
+
+class SiteResult:
+    def __init__(self, adapter: SiteAdapter, writer=None):
+        self.adapter = adapter
+        self.writer = writer  # ProductWriter, eller None (dry-run)
+        self.count = 0
+        self.failed: list[tuple[str, str]] = []  # (url, feil)
+        self.url_seconds: dict[str, float] = {}
+        self.via: Counter = Counter()  # URL-er hentet med "http" / "nettleser"
+        self._lock = threading.Lock()
+
+    def add(self, url: str, products: list[dict], seconds: float, via: str = "nettleser"):
+        with self._lock:
+            self.count += len(products)
+            self.url_seconds[url] = seconds
+            self.via[via] += 1
+            if self.writer is not None:
+                self.writer.add(products)  # skrives videre i biter; listen slippes etter denne URL-en
+
+    def fail(self, url: str, error: Exception, seconds: float):
+        with self._lock:
+            self.failed.append((url, f"{type(error).__name__}: {error}"))
+            self.url_seconds[url] = seconds
+
+
+# ---------- Worker-pool ----------
+class BrowserPool:
+    """
+    Fordeler (butikk, URL)-oppgaver på `workers` tråder med hver sin Chrome. En worker tar første ventende
+    oppgave for en butikk som har ledig kapasitet (max_concurrency); nettleseren gjenbrukes mellom oppgaver
+    og startes på nytt hvis en oppgave feiler (krasjet eller hengt nettleser). HTTP-adaptere prøves med
+    requests først (se SCRAPER_MODE), og nettleseren startes først når en oppgave trenger den.
+    """
+
+    def __init__(self, workers: int = SCRAPER_WORKERS, mode: str = SCRAPER_MODE):
+        if mode not in SCRAPER_MODES:
+            raise ValueError(f"Ukjent modus {mode!r}, gyldige: {SCRAPER_MODES}")
+        self.workers = max(1, workers)
+        self.mode = mode
+        self._pending: list[tuple[SiteAdapter, str]] = []
+        self._running: Counter = Counter()
+        self._cond = threading.Condition()
+
+    def _next_task(self):
+        with self._cond:
+            while True:
+                if not self._pending:
+                    return None
+                for i, (adapter, url) in enumerate(self._pending):
+                    if self._running[adapter.name] < max(1, adapter.max_concurrency):
+                        self._running[adapter.name] += 1
+                        return self._pending.pop(i)
+                self._cond.wait()
+
+    def _release(self, adapter: SiteAdapter):
+        with self._cond:
+            self._running[adapter.name] -= 1
+            self._cond.notify_all()
+
+    def _try_http(self, adapter: SiteAdapter, session, url: str):
+        # None = trenger nettleser. I auto-modus regnes tom liste som "HTML-en har ikke produktene" (JS-rendret)
+        try:
+            products = adapter.scrape_http(session, url)
+        except Exception as e:
+            if self.mode == "http":
+                raise
+            print(f"[{adapter.name.upper()}] HTTP feilet for {url} ({e}) – bruker nettleser")
+            return None
+        if not products and self.mode == "auto":
+            print(f"[{adapter.name.upper()}] Ingen produkter i HTML for {url} – bruker nettleser")
+            return None
+        return products
+
+    def _worker(self, results: dict[str, SiteResult]):
+        driver = None
+        session = None
+        try:
+            while True:
+                task = self._next_task()
+                if task is None:
+                    return
+                adapter, url = task
+                t0 = time.perf_counter()
+                try:
+                    products, via = None, "http"
+                    if adapter.http and self.mode != "browser":
+                        if session is None:
+                            session = make_session()
+                        products = self._try_http(adapter, session, url)
+                    if products is None:
+                        if self.mode == "http":
+                            raise RuntimeError("butikken trenger nettleser, men SCRAPER_MODE=http")
+                        via = "nettleser"
+                        if driver is None:
+                            driver = make_driver()
+                        products = adapter.scrape(driver, url)
+                    results[adapter.name].add(url, products, time.perf_counter() - t0, via)
+                    print(f"[{adapter.name.upper()}] {len(products)} produkter fra {url} "
+                          f"({via}, {time.perf_counter() - t0:.1f}s)")
+                except Exception as e:
+                    results[adapter.name].fail(url, e, time.perf_counter() - t0)
+                    print(f"[{adapter.name.upper()}] Feil for {url}: {e}")
+                    if driver is not None:
+                        try:
+                            driver.quit()
+                        except Exception:
+                            pass
+                        driver = None  # frisk nettleser til neste oppgave
+                finally:
+                    self._release(adapter)
+        finally:
+            if driver is not None:
+                try:
+                    driver.quit()
+                except Exception:
+                    pass
+            if session is not None:
+                session.close()
+
+    def run(self, adapters: list[SiteAdapter], writers: dict | None = None) -> dict[str, SiteResult]:
+        results = {a.name: SiteResult(a, (writers or {}).get(a.name)) for a in adapters}
+        # Fletter butikkene (round-robin), så alle kommer i gang med en gang
+        queues = [[(a, url) for url in a.tasks()] for a in adapters]
+        self._pending = [q[i] for i in range(max(map(len, queues), default=0)) for q in queues if i < len(q)]
+        threads = [threading.Thread(target=self._worker, args=(results,), name=f"scraper-{i}", daemon=True)
+                   for i in range(min(self.workers, len(self._pending)))]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return results
+
+
+# ---------- Lagring ----------
+def upsert_query(table: str, resets_vectors: bool = True, rows: int = 1) -> str:
+    updates = ["category = VALUES(category)", "price = VALUES(price)"]
+    if resets_vectors:
+        # nytt bilde -> gammel vektor er ugyldig; må stå FØR image_url oppdateres (tilordninger evalueres i rekkefølge)
+        updates.append("feature_vector = IF(image_url <=> VALUES(image_url), feature_vector, NULL)")
+    updates += ["image_url = VALUES(image_url)", "product_link = VALUES(product_link)"]
+    values = ", ".join(["(%s, %s, %s, %s, %s, %s)"] * rows)
+    return (f"INSERT INTO {table} (product_id, name, category, price, image_url, product_link) "
+            f"VALUES {values} ON DUPLICATE KEY UPDATE " + ", ".join(updates))
+
+class ProductWriter:
+    """
+    Upsert for én butikk-tabell i biter: add() buffrer, og hver `chunk_size` rad skrives med én INSERT med mange
+    VALUES-rader og committes. Teller nye/endrede/uendrede rader: et SELECT av eksisterende product_id-er i biten gir
+    antall nye, og MySQL rapporterer 1 per ny og 2 per endret rad (0 for uendret, uten FOUND_ROWS) for resten.
+    Feiler en hel bit (f.eks. én ugyldig rad), skrives den rad for rad så bare de dårlige radene mistes.
+    """
+
+    COLUMNS = ("product_id", "name", "category", "price", "image_url", "product_link")
+
+    def __init__(self, adapter: SiteAdapter, chunk_size: int = SCRAPER_WRITE_CHUNK):
+        self.adapter = adapter
+        self.table = adapter.table
+        self.chunk_size = max(1, chunk_size)
+        self._buffer: dict = {}  # product_id -> rad (samme produkt i flere kategorier: siste vinner)
+        self._db = None
+        self.inserted = self.updated = self.unchanged = self.failed = self.chunks = 0
+        self.seconds = 0.0
+
+    def _connect(self):
+        if self._db is None:
+            # Uten FOUND_ROWS er rowcount 0 for rader som ikke endres – det er det som skiller uendret fra endret
+            self._db = mysql.connector.connect(**DB_CONFIG, client_flags=[-ClientFlag.FOUND_ROWS])
+        return self._db
+
+    def add(self, products: list[dict]):
+        for product in products:
+            self._buffer[product['product_id']] = tuple(product[c] for c in self.COLUMNS)
+            if len(self._buffer) >= self.chunk_size:
+                self.flush()
+
+    def _existing(self, cursor, ids: list) -> int:
+        cursor.execute(f"SELECT COUNT(*) FROM {self.table} WHERE product_id IN ({', '.join(['%s'] * len(ids))})",
+                       ids)
+        return cursor.fetchone()[0]
+
+    @staticmethod
+    def _count(rows: int, existing: int, affected: int) -> tuple[int, int, int]:
+        """(nye, endrede, uendrede) fra antall rader, hvor mange som fantes fra før og MySQL sin rowcount."""
+        inserted = rows - existing
+        updated = (affected - inserted) // 2
+        return inserted, updated, existing - updated
+
+    def _apply(self, counts: tuple[int, int, int]):
+        # Kalles først etter en vellykket commit, så en rullet-tilbake bit aldri telles som lagret
+        self.inserted += counts[0]
+        self.updated += counts[1]
+        self.unchanged += counts[2]
+
+    def flush(self):
+        if not self._buffer:
+            return
+        rows = list(self._buffer.values())
+        self._buffer = {}
+        t0 = time.perf_counter()
+        try:
+            db = self._connect()
+            cursor = db.cursor()
+            try:
+                existing = self._existing(cursor, [r[0] for r in rows])
+                cursor.execute(upsert_query(self.table, self.adapter.resets_vectors, len(rows)),
+                               [v for r in rows for v in r])
+                counts = self._count(len(rows), existing, cursor.rowcount)
+                db.commit()
+                self._apply(counts)
+            except mysql.connector.Error as e:
+                db.rollback()
+                print(f"[{self.adapter.name.upper()}] Bit på {len(rows)} rader feilet ({e}) – skriver rad for rad")
+                self._write_rows(db, cursor, rows)
+            finally:
+                cursor.close()
+        except mysql.connector.Error as e:
+            print(f"[{self.adapter.name.upper()}] Kunne ikke lagre {len(rows)} rader: {e}")
+            self.failed += len(rows)
+        self.chunks += 1
+        self.seconds += time.perf_counter() - t0
+
+    def _write_rows(self, db, cursor, rows: list[tuple]):
+        """Rad for rad etter en feilet bit. Tellingene gjelder først når commit-en har gått gjennom;
+        feiler den, rapporteres hele biten én gang som feilet."""
+        insert_query = upsert_query(self.table, self.adapter.resets_vectors)
+        counts, failed = [0, 0, 0], 0
+        for row in rows:
+            try:
+                cursor.execute(insert_query, row)
+                for i, n in enumerate(self._count(1, int(cursor.rowcount != 1), cursor.rowcount)):
+                    counts[i] += n
+            except mysql.connector.Error as db_err:
+                print(f"Databasefeil for {row[1]}: {db_err}")
+                failed += 1
+        try:
+            db.commit()
+        except mysql.connector.Error as e:
+            print(f"[{self.adapter.name.upper()}] Commit feilet, {len(rows)} rader ikke lagret: {e}")
+            try:
+                db.rollback()
+            except mysql.connector.Error:
+                pass
+            self.failed += len(rows)
+            return
+        self._apply(tuple(counts))
+        self.failed += failed
+
+    def close(self):
+        self.flush()
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+        print(f"[{self.adapter.name.upper()}] {self.table}: {self.inserted} nye, {self.updated} endret, "
+              f"{self.unchanged} uendret{f', {self.failed} feilet' if self.failed else ''} "
+              f"({self.chunks} biter, {self.seconds:.1f}s)")
+
+
+def run_sites(adapters: list[SiteAdapter], workers: int = SCRAPER_WORKERS, mode: str = SCRAPER_MODE,
+              save: bool = True) -> bool:
+    """Scraper alle butikkene i én pool og skriver produktene fortløpende (save=False: bare tell). False hvis noe feilet."""
+    t0 = time.perf_counter()
+    writers = {a.name: ProductWriter(a) for a in adapters} if save else {}
+    try:
+        results = BrowserPool(workers, mode).run(adapters, writers)
+    finally:
+        for writer in writers.values():
+            writer.close()  # resten av bufferen – også når crawlet avbrytes
+    ok = True
+    for name, result in results.items():
+        total = len(result.url_seconds)
+        via = ", ".join(f"{n} {k}" for k, n in result.via.items())
+        print(f"[{name.upper()}] {result.count} produkter fra {total - len(result.failed)}/{total} URL-er "
+              f"({via or 'ingen'}; sum {sum(result.url_seconds.values()):.0f}s)")
+        for url, err in result.failed:
+            print(f"  feilet: {url} – {err}")
+        ok = ok and not result.failed and not (result.writer and result.writer.failed)
+    print(f"[SCRAPER] Ferdig på {time.perf_counter() - t0:.0f}s med {workers} workere ({mode})")
+    return ok
@@ -0,0 +1,174 @@
+# backend/scrapers/waits.py
+import time
+
+from selenium.common.exceptions import StaleElementReferenceException, NoSuchElementException, JavascriptException
+
+# Hendelsesstyrte, begrensede ventinger i stedet for faste sleep()-kall i scraperne:
+#   count_stable()  : antall produktkort er uendret i `settle` sekunder (lazy loading ferdig)
+#   images_ready()  : bildene i alle kortene har ekte src (ikke data:-placeholder)
+#   scroll_through(): scroller skjermhøyde for skjermhøyde så lazy loading slår til for hele listen
+#   network_idle()  : ingen fetch/XHR i gang og ingen nye ressurser i `idle` sekunder
+#   scroll_to_end() : scroll til bunnen til verken høyde eller antall kort vokser
+# Hver venting har et tak (timeout) og en "baseline" = sleep-en den erstatter; Waits.report() logger per side
+# hvor lenge vi faktisk ventet mot hva de faste sleep-ene ville kostet.
+
+# Teller fetch/XHR i gang (window.__scraperPending). Legges inn før sidens egne skript via CDP (make_driver);
+# uten den faller network_idle() tilbake til at antall ferdige ressurser (Performance API) står stille.
+NETWORK_HOOK_JS = """
+(() => {
+  if (window.__scraperPending !== undefined) return;
+  window.__scraperPending = 0;
+  const origFetch = window.fetch;
+  if (origFetch) {
+    window.fetch = function (...args) {
+      window.__scraperPending++;
+      return origFetch.apply(this, args).finally(() => { window.__scraperPending--; });
+    };
+  }
+  const origSend = XMLHttpRequest.prototype.send;
+  XMLHttpRequest.prototype.send = function (...args) {
+    window.__scraperPending++;
+    this.addEventListener("loadend", () => { window.__scraperPending--; }, { once: true });
+    return origSend.apply(this, args);
+  };
+})();
+"""
+
+_NETWORK_STATE_JS = """
+const pending = window.__scraperPending;
+return [pending === undefined ? -1 : pending, performance.getEntriesByType("resource").length];
+"""
+
+_IMAGES_MISSING_JS = """
+let missing = 0;
+for (const card of document.querySelectorAll(arguments[0])) {
+  const img = card.querySelector(arguments[1]);
+  if (!img) continue;  // kort uten bilde venter vi ikke på
+  const src = img.currentSrc || img.src || "";
+  if (!src.startsWith("http")) missing++;
+}
+return missing;
+"""
+
+
+def install_network_hook(driver):
+    """Kjør NETWORK_HOOK_JS i hvert nytt dokument (Chrome/CDP). Uten CDP brukes bare Performance API."""
+    try:
+        driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {"source": NETWORK_HOOK_JS})
+    except Exception:
+        pass
+
+
+class Waits:
+    def __init__(self, driver, site: str, poll: float = 0.1):
+        self.driver = driver
+        self.site = site
+        self.poll = poll
+        self.waited = 0.0    # faktisk ventetid siden forrige report()
+        self.baseline = 0.0  # det de faste sleep-ene ville kostet
+        self.timeouts = 0
+
+    def _account(self, t0: float, baseline: float, ok: bool):
+        self.waited += time.perf_counter() - t0
+        self.baseline += baseline
+        self.timeouts += not ok
+
+    def until(self, check, timeout: float, baseline: float = 0.0) -> bool:
+        """Poller check() til den er sann eller timeout går ut. Stale/manglende elementer teller som 'ikke ennå'."""
+        t0 = time.perf_counter()
+        while True:
+            try:
+                ok = bool(check())
+            except (StaleElementReferenceException, NoSuchElementException, JavascriptException):
+                ok = False
+            if ok or time.perf_counter() - t0 >= timeout:
+                break
+            time.sleep(self.poll)
+        self._account(t0, baseline, ok)
+        return ok
+
+    def _stable(self, sample, settle: float, timeout: float, baseline: float) -> bool:
+        # Sann når sample() har gitt samme verdi i `settle` sekunder
+        state = {"value": object(), "since": time.perf_counter()}
+
+        def check():
+            value = sample()
+            now = time.perf_counter()
+            if value != state["value"]:
+                state["value"], state["since"] = value, now
+                return False
+            return now - state["since"] >= settle
+
+        return self.until(check, timeout, baseline)
+
+    # ---------- Ventinger ----------
+    def count(self, css: str) -> int:
+        return self.driver.execute_script("return document.querySelectorAll(arguments[0]).length;", css)
+
+    def count_stable(self, css: str, settle: float = 0.75, timeout: float = 10, baseline: float = 0.0) -> int:
+        """Venter til antall elementer for `css` har stått stille i `settle` sekunder. Returnerer antallet."""
+        self._stable(lambda: self.count(css), settle, timeout, baseline)
+        return self.count(css)
+
+    def _network_sample(self):
+        pending, resources = self.driver.execute_script(_NETWORK_STATE_JS)
+        return resources if pending <= 0 else ("opptatt", time.perf_counter())  # i gang -> aldri stabil
+
+    def network_idle(self, idle: float = 0.5, timeout: float = 5, baseline: float = 0.0) -> bool:
+        """Ingen fetch/XHR i gang og ingen nye ferdige ressurser i `idle` sekunder (tracking/annonser kan holde
+        nettverket travelt for alltid – derfor alltid et tak)."""
+        return self._stable(self._network_sample, idle, timeout, baseline)
+
+    def images_ready(self, card_css: str, img_css: str, timeout: float = 10, baseline: float = 0.0) -> bool:
+        """Alle kort har ekte bilde-URL (currentSrc/src, ikke data:-placeholder)."""
+        return self.until(lambda: self.driver.execute_script(_IMAGES_MISSING_JS, card_css, img_css) == 0,
+                          timeout, baseline)
+
+    def scroll_through(self, step_timeout: float = 0.5, max_steps: int = 200):
+        """Scroller nedover én skjermhøyde om gangen (trigger lazy loading for alle kortene), så tilbake til toppen."""
+        for _ in range(max_steps):
+            at_bottom = self.driver.execute_script(
+                "window.scrollBy(0, window.innerHeight);"
+                "return window.innerHeight + window.scrollY >= document.body.scrollHeight - 2;")
+            self.network_idle(idle=0.15, timeout=step_timeout)
+            if at_bottom:
+                break
+        self.driver.execute_script("window.scrollTo(0, 0);")
+
+    def listing_signature(self, css: str, attr: str):
+        """(første id, siste id, antall) for kortene – endres når en ny side er lastet inn."""
+        return self.driver.execute_script(
+            "const els = document.querySelectorAll(arguments[0]);"
+            "return els.length ? [els[0].getAttribute(arguments[1]), els[els.length - 1].getAttribute(arguments[1]),"
+            " els.length] : null;", css, attr)
+
+    def listing_changed(self, css: str, attr: str, before, timeout: float = 10, baseline: float = 0.0) -> bool:
+        """Etter klikk på neste side: venter til kortlisten er byttet ut/utvidet og har satt seg."""
+        changed = self.until(lambda: self.listing_signature(css, attr) not in (None, before), timeout, baseline)
+        if changed:
+            self.count_stable(css, settle=0.3, timeout=3)
+        return changed
+
+    def scroll_to_end(self, item_css: str, settle: float = 0.5, step_timeout: float = 8,
+                      max_steps: int = 200, baseline_per_step: float = 0.0) -> int:
+        """Scroller til bunnen til hverken sidehøyde eller antall kort vokser. Returnerer antall kort."""
+        last = None
+        for _ in range(max_steps):
+            self.driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+            # Først la neste side med produkter komme ferdig over nettet, så la DOM-en sette seg
+            self.network_idle(idle=0.3, timeout=min(2.0, step_timeout), baseline=baseline_per_step)
+            count = self.count_stable(item_css, settle=settle, timeout=step_timeout)
+            current = (self.driver.execute_script("return document.body.scrollHeight"), count)
+            if current == last:
+                break
+            last = current
+        return self.count(item_css)
+
+    # ---------- Logg ----------
+    def report(self, url: str):
+        saved = self.baseline - self.waited
+        print(f"[VENT] {self.site}: {url} – ventet {self.waited:.1f}s, faste sleeps ville brukt {self.baseline:.1f}s "
+              f"(spart {saved:.1f}s{f', tak nådd {self.timeouts} ganger' if self.timeouts else ''})")
+        self.waited = self.baseline = 0.0
+        self.timeouts = 0
+        return saved
@@ -1,22 +1,8 @@
-from selenium import webdriver
 from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from webdriver_manager.chrome import ChromeDriverManager
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from time import sleep
-import mysql.connector
-import os
-from dotenv import load_dotenv
-
-# Sett opp WebDriver
-options = Options()
-options.add_argument("--headless")
-options.add_argument("--disable-gpu")
-options.add_argument("user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36")
-
-driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=options)
+
+from scraper_runtime import SiteAdapter, run_sites
+from waits import Waits
+from http_fetch import text, href, img_src
 
 # Liste over URL-er for scraping
 urls = [    
@@ -55,82 +41,108 @@ def extract_category_from_url(url):
         print(f"Feil ved henting av kategori fra URL: {url}, Feil: {e}")
         return "Unknown"
 
-try:
-    all_products = []
-
-    for url in urls:
+class ZalandoAdapter(SiteAdapter):
+    name = "zalando"
+    table = "zalando_products"
+    urls = urls
+    resets_vectors = False  # zalando_products brukes ikke av vektorjobben og har ikke nødvendigvis feature_vector
+    card_css = "[data-trckng-component]"
+    card_js = """(card) => {
+        const priceParent = x(card, ".//p[contains(@class, 'voFjEy _2kjxJ6 m3OCL3 HlZ_Tf _0xLoFW u9KIT8 _7ckuOK vSgP6A')]");
+        const priceEl = priceParent ? x(priceParent, ".//span[last()]") : null;
+        return {
+            product_id: card.getAttribute("data-trckng-component"),
+            name: text(x(card, ".//h3[contains(@class, 'voFjEy') and contains(@class, 'lystZ1')]")),
+            price: priceEl ? priceEl.innerText : null,
+            image_url: attr(x(card, ".//img"), "src"),
+            product_link: x(card, ".//a")?.href ?? null,
+        };
+    }"""
+    # Zalando server-rendrer listen og pagineringen – kan hentes uten nettleser
+    http = True
+    price_css = "p[class*='voFjEy _2kjxJ6 m3OCL3 HlZ_Tf _0xLoFW u9KIT8 _7ckuOK vSgP6A']"
+
+    def card_http(self, tag, url):
+        price_parent = tag.select_one(self.price_css)
+        spans = price_parent.find_all("span") if price_parent is not None else []
+        return {
+            "product_id": tag.get("data-trckng-component"),
+            "name": text(tag.select_one("h3.voFjEy.lystZ1")),
+            "price": text(spans[-1]) if spans else None,
+            "image_url": img_src(tag.find("img"), url),
+            "product_link": href(tag.find("a"), url),
+        }
+
+    def next_page_http(self, soup, url):
+        next_link = soup.select_one("a[data-testid='pagination-next']")
+        if next_link is None or "AbrXsY" in (next_link.get("class") or []):  # Klassen for deaktivert knapp
+            return None
+        return href(next_link, url)
+
+    def products_from_cards(self, cards, url):
+        #Kategori
+        category = extract_category_from_url(url)
+        products = []
+        for idx, card in enumerate(cards, start=1):
+            # Navn
+            if not card["name"]:
+                print(f"Feil ved henting av produkt #{idx}: mangler navn")
+                continue
+            product_name = card["name"].upper()
+
+            # ID
+            product_id = card["product_id"] or "Ingen ID"
+
+            # Pris
+            try:
+                raw_price = card["price"].replace("\u00a0", "").replace(" ", "").replace("kr", "").replace(",", ".").strip()
+                price = float(raw_price) if raw_price else 0.0
+            except Exception as e:
+                price = 0.0
+                print(f"Kunne ikke hente prisen: {e}")
+
+            # Bilde
+            image_url = card["image_url"] or "Ingen bilde"
+
+            # Link
+            product_link = card["product_link"] or "Ingen lenke"
+
+            products.append({
+                'product_id': product_id,
+                'name': product_name,
+                'category': category,
+                'price': price,
+                'image_url': image_url,
+                'product_link': product_link
+            })
+            print(f"Produkt #{idx}: {product_name} - Pris: {price}, Bilde: {image_url}, Kategori: {category}")
+        return products
+
+    def scrape(self, driver, url):
         print(f"Scraper produkter fra: {url}")
         driver.get(url)
+        waits = Waits(driver, self.name)
 
-        #Kategori
-        category = extract_category_from_url(url)
-        
         # Skroll gjennom siden for å laste inn alt innhold
         print("Skroller gjennom siden for å laste inn alt innhold...")
-        last_height = driver.execute_script("return document.body.scrollHeight")
-        while True:
-            driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-            sleep(2)
-            new_height = driver.execute_script("return document.body.scrollHeight")
-            if new_height == last_height:
-                break
-            last_height = new_height
+        waits.scroll_to_end(self.card_css, baseline_per_step=2)
         print("Skroll gjennomført. Starter paginering...")
+        products = []
 
         pagination_active = True
 
         while pagination_active:
-            # Hent produktene på den nåværende siden
-            articles = driver.find_elements(By.CSS_SELECTOR, "[data-trckng-component]")
-            print(f"Fant {len(articles)} produkter på denne siden.")
-
-            for idx, article in enumerate(articles, start=1):
-                try:
-                    driver.execute_script("arguments[0].scrollIntoView();", article)
-                    sleep(0.5)
-
-                    # Navn
-                    product_name_element = article.find_element(By.XPATH, ".//h3[contains(@class, 'voFjEy') and contains(@class, 'lystZ1')]")
-                    product_name = product_name_element.text
-                    product_name = product_name.upper()
-
-                    # ID
-                    product_id = article.get_attribute("data-trckng-component") or "Ingen ID"
-
-                    # Pris
-                    try:
-                        price_parent = article.find_element(By.XPATH, ".//p[contains(@class, 'voFjEy _2kjxJ6 m3OCL3 HlZ_Tf _0xLoFW u9KIT8 _7ckuOK vSgP6A')]")
-                        price_element = price_parent.find_element(By.XPATH, ".//span[last()]")
-                        raw_price = price_element.get_attribute("innerText")
-                        raw_price = raw_price.replace("\u00a0", "").replace("kr", "").replace(",", ".").strip()
-                        price = float(raw_price) if raw_price else 0.0
-                    except Exception as e:
-                        price = 0.0
-                        print(f"Kunne ikke hente prisen: {e}")
-
-                    # Bilde
-                    try:
-                        image_url = article.find_element(By.XPATH, ".//img").get_attribute("src")
-                    except Exception:
-                        image_url = "Ingen bilde"
-
-                    # Link
-                    try:
-                        product_link = article.find_element(By.XPATH, ".//a").get_attribute("href")
-                    except Exception:
-                        product_link = "Ingen lenke"
-
-                    all_products.append({
-                        'product_id': product_id,
-                        'name': product_name,
-                        'category': category,
-                        'price': price,
-                        'image_url': image_url,
-                        'product_link': product_link
-                    })
-                    print(f"Produkt #{idx}: {product_name} - Pris: {price}, Bilde: {image_url}, Kategori: {category}")
-                except Exception as e:
-                    print(f"Feil ved henting av produkt #{idx}: {e}")
+            # Lazy-bilder: én runde gjennom siden (før: scrollIntoView + 0.5 s per produkt)
+            waits.scroll_through()
+            waits.images_ready(self.card_css, "img", baseline=waits.count(self.card_css) * 0.5)
+
+            # Hent produktene på den nåværende siden – alle kortene i ett kall
+            cards = self.snapshot(driver)
+            print(f"Fant {len(cards)} produkter på denne siden.")
+
+            products += self.products_from_cards(cards, url)
+
+            waits.report(f"{url} (side)")
 
             # Sjekk om det finnes en "Neste side"-knapp
             try:
@@ -142,56 +154,17 @@ try:
                     pagination_active = False
                 else:
                     print("Klikker på 'Neste side'-knappen.")
+                    before = waits.listing_signature(self.card_css, "data-trckng-component")
                     driver.execute_script("arguments[0].click();", next_button)
-                    sleep(2)
+                    # Vent til nye kort er på plass i stedet for fast 2 s
+                    waits.listing_changed(self.card_css, "data-trckng-component", before, baseline=2)
 
             except Exception as e:
                 print(f"Feil ved forsøk på å klikke 'Neste side'-knappen: {e}")
                 pagination_active = False
 
-    print(f"Totalt antall produkter hentet: {len(all_products)}")
-
-    load_dotenv()  # Leser inn .env-fila
-
-    db = mysql.connector.connect(
-        host=os.getenv("DB_HOST"),
-        user=os.getenv("DB_USER"),
-        password=os.getenv("DB_PASSWORD"),
-        database=os.getenv("DB_NAME")
-    )
-    cursor = db.cursor()
-
-    insert_query = """
-    INSERT INTO zalando_products (product_id, name, category, price, image_url, product_link)
-    VALUES (%s, %s, %s, %s, %s, %s)
-    ON DUPLICATE KEY UPDATE
-        category = VALUES(category),
-        price = VALUES(price),
-        image_url = VALUES(image_url),
-        product_link = VALUES(product_link);
-    """
-
-    for product in all_products:
-        try:
-            cursor.execute(insert_query, (
-                product['product_id'],
-                product['name'],
-                product['category'],
-                product['price'],
-                product['image_url'],
-                product['product_link']
-            ))
-            print(f"Lagrer produkt: {product['name']} med lenke {product['product_link']}")
-        except mysql.connector.Error as db_err:
-            print(f"Databasefeil for {product['name']}: {db_err}")
-
-    db.commit()
-    cursor.close()
-    db.close()
-    print("Dataene er lagret i databasen!")
-
-except Exception as e:
-    print(f"Feil under kjøring: {e}")
-
-finally:
-    driver.quit()
+        return products
+
+
+if __name__ == "__main__":
+    run_sites([ZalandoAdapter()])
@@ -45,6 +45,7 @@ const upload = multer({
 });
 
 // -------------------- Kategori-mapping --------------------
+// NB: samme mapping brukes av ML-tjenesten (backend/categories.py) – hold dem i synk.
 function mapCategoryToMain(category) {
   const categoryMapping = {
     'T-skjorte': ['Tshirt', 'Tshirtstanks', 'Tskjorte', 'Tee', 'Top'],
@@ -113,40 +114,17 @@ app.get('/products', async (req, res) => {
   }
 });
 
-// -------------------- Matching-hjelpere --------------------
-function dot(u, v) {
-  let s = 0;
-  // forutsetter like lengder og L2-normaliserte vektorer
-  for (let i = 0; i < u.length; i++) s += u[i] * v[i];
-  return s; // == cosine hvis normalisert
-}
-
-// Holder topp K uten å sortere hele listen (bra nok for små K)
-function topK(items, k, scoreFn) {
-  const keep = []; // liten "min-heap" via sort; OK når k er lite
-  for (const it of items) {
-    const s = scoreFn(it);
-    if (Number.isNaN(s)) continue;
-
-    if (keep.length < k) {
-      keep.push({ s, it });
-      keep.sort((a, b) => a.s - b.s);
-    } else if (s > keep[0].s) {
-      keep[0] = { s, it };
-      keep.sort((a, b) => a.s - b.s);
-    }
-  }
-  return keep.sort((a, b) => b.s - a.s).map(x => x.it);
-}
-
 // -------------------- /analyze --------------------
-// Tar imot bilde, kaller FastAPI for embedding, matcher mot DB, returnerer topp 9
+// Tar imot bilde og videresender til ML-tjenestens /search, som embedder bildet og
+// matcher mot en ferdig lastet vektormatrise i minnet. Returnerer topp 9.
+// Valgfritt felt/parameter `category` (f.eks. "Jeans") begrenser søket til én kategori.
 app.post('/analyze', upload.single('image'), async (req, res) => {
   if (!req.file) return res.status(400).json({ error: 'Ingen fil lastet opp' });
+  const category = req.body?.category || req.query.category;
 
   try {
-    // 1) Send bilde til FastAPI (forutsetter at FastAPI kjører på denne adressen)
-    const fastApiUrl = process.env.ML_ANALYZE_URL || 'http://127.0.0.1:8000/analyze';
+    // Send bilde til FastAPI (forutsetter at FastAPI kjører på denne adressen)
+    const fastApiUrl = process.env.ML_SEARCH_URL || 'http://127.0.0.1:8000/search';
     const formData = new FormData();
     formData.append('file', req.file.buffer, {
       filename: req.file.originalname || 'upload.jpg',
@@ -155,52 +133,20 @@ app.post('/analyze', upload.single('image'), async (req, res) => {
 
     const mlResp = await axios.post(fastApiUrl, formData, {
       headers: formData.getHeaders(),
+      params: { k: 9, ...(category ? { category: String(category) } : {}) },
       timeout: Number(process.env.ML_TIMEOUT_MS || 120000),
       maxContentLength: Infinity,
       maxBodyLength: Infinity,
     });
 
-    const userVector = mlResp?.data?.features;
-    if (!Array.isArray(userVector) || userVector.length === 0) {
+    const results = mlResp?.data?.results;
+    if (!Array.isArray(results)) {
       return res.status(502).json({ error: 'Ugyldig svar fra ML-tjenesten' });
     }
 
-    // 2) Hent produkt-vektorer (kun nødvendige felt)
-    const sql = `
-      SELECT id, name, price, image_url, product_link, feature_vector
-        FROM hm_products WHERE feature_vector IS NOT NULL
-      UNION ALL
-      SELECT id, name, price, image_url, product_link, feature_vector
-        FROM weekday_products WHERE feature_vector IS NOT NULL
-      UNION ALL
-      SELECT id, name, price, image_url, product_link, feature_vector
-        FROM zara_products WHERE feature_vector IS NOT NULL
-      UNION ALL
-      SELECT id, name, price, image_url, product_link, feature_vector
-        FROM follestad_products WHERE feature_vector IS NOT NULL
-    `;
-
-    const [rows] = await pool.query(sql);
-
-    // 3) Beregn score (dot) og plukk topp 9
-    const candidates = [];
-    for (const r of rows) {
-      try {
-        const vec = JSON.parse(r.feature_vector);
-        if (!Array.isArray(vec) || vec.length !== userVector.length) continue; // dimensjonsmismatch
-        // OBS: forutsetter L2-normaliserte vektorer ved lagring og i ML
-        const score = dot(userVector, vec);
-        candidates.push({ ...r, similarity: score });
-      } catch (_) {
-        // ignorer rader med korrupt JSON
-      }
-    }
-
-    const top9 = topK(candidates, 9, (p) => p.similarity);
-
-    return res.json(top9);
+    return res.json(results);
   } catch (err) {
-    // FastAPI-feil eller DB-feil
+    // FastAPI-feil (inkl. DB-feil ved lasting av vektorer)
     const detail =
       err.response?.data?.detail ||
       err.response?.data?.error ||
@@ -0,0 +1,9 @@
+# backend/tests/conftest.py
+import os
+import sys
+
+# Modulene i backend/ og backend/scrapers/ importerer søsken direkte (kjøres fra sin egen mappe)
+_BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (_BACKEND, os.path.join(_BACKEND, "scrapers")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
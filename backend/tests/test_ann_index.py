@@ -0,0 +1,98 @@
+# backend/tests/test_ann_index.py
+import numpy as np
+import pytest
+
+from ann_index import IVFIndex, PQIndex, ProductQuantizer, _synthetic, kmeans, recall_report, topk_exact
+from categories import main_categories
+from vector_store import VectorStore
+
+# Små syntetiske data (klyngede, som ann_index --report), spørringer trukket fra katalogen.
+# Målt recall@10 er 1.0 for begge indeksene; gulvet gir rom for små endringer i trening/seed.
+N, DIM, K = 5000, 128, 10
+RECALL_FLOOR = 0.9
+
+
+@pytest.fixture(scope="module")
+def vectors():
+    return _synthetic(N, DIM, seed=1)
+
+
+@pytest.fixture(scope="module")
+def queries(vectors):
+    return vectors[np.random.default_rng(3).choice(N, size=50, replace=False)]
+
+
+def test_kmeans_returns_unit_centroids_and_rejects_k_above_n(vectors):
+    centroids = kmeans(vectors[:500], 16, iters=5)
+    assert centroids.shape == (16, DIM) and centroids.dtype == np.float32
+    assert np.allclose(np.linalg.norm(centroids, axis=1), 1.0, atol=1e-4)
+    with pytest.raises(ValueError):
+        kmeans(vectors[:10], 11)
+
+
+def test_ivf_covers_every_row_once(vectors):
+    ivf = IVFIndex.build(vectors, nlist=32, iters=5)
+    assert ivf.offsets[-1] == N and sorted(ivf.order.tolist()) == list(range(N))
+    assert len(ivf.candidates(vectors[0], nprobe=32)) == N
+
+
+def test_ivf_recall(vectors, queries):
+    ivf = IVFIndex.build(vectors)
+    rows = recall_report(vectors, ivf, queries, K, [{"nprobe": 8}])
+    assert rows[1]["recall"] >= RECALL_FLOOR
+
+
+def test_pq_recall_and_save_load(vectors, queries, tmp_path):
+    pq = PQIndex.build(vectors, m=32, rerank=200)
+    assert pq.nbytes == N * 32
+    rows = recall_report(vectors, pq, queries, K, [{"rerank": 200}])
+    assert rows[1]["recall"] >= RECALL_FLOOR
+
+    path = str(tmp_path / "pq.npz")
+    pq.save(path)
+    loaded = PQIndex.load(path, rerank=200)
+    assert loaded.count == N
+    assert loaded.search(vectors, queries[0], K) == pq.search(vectors, queries[0], K)
+
+
+def test_pq_encode_decode_is_close(vectors):
+    pq = ProductQuantizer.train(vectors[:2000], m=16, ks=64, iters=5)
+    codes = pq.encode(vectors[:100])
+    assert codes.shape == (100, 16) and codes.dtype == np.uint8
+    err = np.linalg.norm(pq.decode(codes) - vectors[:100], axis=1).mean()
+    baseline = np.linalg.norm(vectors[100:200] - vectors[:100], axis=1).mean()  # avstand til en tilfeldig annen rad
+    assert err < 0.75 * baseline
+    with pytest.raises(ValueError):
+        ProductQuantizer.train(vectors[:100], m=3)
+
+
+# ---------- Partisjonert søk i VectorStore ----------
+CATEGORIES = ["Tskjorte", "Jeans", "Blazer", "Shorts"]
+
+
+@pytest.fixture(scope="module")
+def store(vectors):
+    meta = [{"id": i, "table": "hm_products", "category": CATEGORIES[i % len(CATEGORIES)]} for i in range(N)]
+    return VectorStore(np.asarray(vectors), meta)
+
+
+@pytest.mark.parametrize("index", ["exact", "ivf", "pq"])
+def test_category_filter_only_returns_that_partition(store, queries, index):
+    store.index = None
+    if index == "ivf":
+        store.attach_ivf(nprobe=8)
+    elif index == "pq":
+        store.attach_pq(m=32, rerank=200)
+    for q in queries[:10]:
+        hits = store.search(q, K, category="jeans")
+        assert len(hits) == K
+        assert all(main_categories(store.meta[i]["category"]) == ["Jeans"] for i, _ in hits)
+        expected = topk_exact(store.matrix, q, K, store.partitions["Jeans"])
+        assert [i for i, _ in hits] == [i for i, _ in expected]
+    assert store.search(queries[0], K, category="finnes-ikke") == []
+    store.index = None
+
+
+def test_attach_ivf_clamps_nlist_to_size(vectors):
+    small = VectorStore(np.asarray(vectors[:20]), [{"id": i, "category": "Jeans"} for i in range(20)])
+    assert small.attach_ivf(nlist=1000).nlist == 20
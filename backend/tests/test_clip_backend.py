@@ -0,0 +1,20 @@
+# backend/tests/test_clip_backend.py
+import sys
+
+import pytest
+import torch
+
+import clip_backend
+
+
+def test_onnx_without_onnxruntime_exits_with_message(monkeypatch, capsys):
+    monkeypatch.setitem(sys.modules, "onnxruntime", None)  # import onnxruntime -> ImportError
+    with pytest.raises(SystemExit):
+        clip_backend.load_backend("onnx", "openai/clip-vit-base-patch32", torch.device("cpu"))
+    out = capsys.readouterr().out
+    assert "[CLIP] CLIP_BACKEND=onnx krever onnxruntime" in out and "requirements-onnx.txt" in out
+
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError):
+        clip_backend.load_backend("tensorrt", "openai/clip-vit-base-patch32", torch.device("cpu"))
@@ -0,0 +1,69 @@
+# backend/tests/test_embedding_cache.py
+import os
+
+import numpy as np
+
+import embedding_cache
+from embedding_cache import EmbeddingCache
+
+
+def vec(i: int) -> np.ndarray:
+    return np.full(8, i, dtype=np.float32)
+
+
+def files(directory) -> list[str]:
+    return sorted(name for _, _, names in os.walk(directory) for name in names)
+
+
+def npy_size(tmp_path) -> int:
+    probe = EmbeddingCache(max_items=0, disk_dir=str(tmp_path / "probe"))
+    probe.put("probe", vec(0))
+    return probe.stats()["disk_bytes"]
+
+
+def test_memory_lru_evicts_least_recently_used():
+    cache = EmbeddingCache(max_items=2)
+    cache.put("a", vec(1))
+    cache.put("b", vec(2))
+    assert cache.get("a") is not None  # a er nå nyest
+    cache.put("c", vec(3))
+    assert cache.get("b") is None
+    assert cache.get("a")[0] == 1 and cache.get("c")[0] == 3
+    assert (cache.hits_mem, cache.misses) == (3, 1)
+
+
+def test_namespace_changes_key():
+    assert EmbeddingCache(namespace="clip|full").key(b"x") != EmbeddingCache(namespace="clip|int8").key(b"x")
+
+
+def test_disk_evicts_oldest_and_survives_restart(tmp_path):
+    size = npy_size(tmp_path)
+    directory = str(tmp_path / "emb")
+    cache = EmbeddingCache(max_items=0, disk_dir=directory, max_disk_bytes=2 * size)
+    cache.put("aa01", vec(1))
+    cache.put("bb02", vec(2))
+    assert cache.get("aa01")[0] == 1  # brukt nylig -> bb02 er eldst
+    cache.put("cc03", vec(3))
+    assert cache.get("bb02") is None
+    assert files(directory) == ["aa01.npy", "cc03.npy"]
+
+    # Ny prosess: indeksen bygges fra disk og treffer uten minnecache
+    again = EmbeddingCache(max_items=0, disk_dir=directory, max_disk_bytes=2 * size)
+    assert again.get("cc03")[0] == 3 and again.hits_disk == 1
+
+    smaller = EmbeddingCache(max_items=0, disk_dir=directory, max_disk_bytes=size)
+    assert len(files(directory)) == 1 and smaller.get("cc03") is not None
+
+
+def test_failed_disk_write_leaves_no_temp_file(tmp_path, monkeypatch):
+    directory = str(tmp_path / "emb")
+    cache = EmbeddingCache(max_items=0, disk_dir=directory)
+
+    def broken_save(f, arr):
+        f.write(b"halvskrevet")
+        raise OSError("disk full")
+
+    monkeypatch.setattr(embedding_cache.np, "save", broken_save)
+    cache.put("dd04", vec(4))
+    assert files(directory) == []
+    assert cache.get("dd04") is None
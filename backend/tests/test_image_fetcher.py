@@ -0,0 +1,112 @@
+# backend/tests/test_image_fetcher.py
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import pytest
+
+from image_cache import ImageCache
+from image_fetcher import ImageFetcher, FetchReport
+
+# ImageFetcher mot en lokal http.server: retry på 503, 404 rapporteres, maks per_host samtidige
+# forespørsler, og 304 Not Modified serveres fra bildecachen.
+
+IMAGE = b"\xff\xd8\xff\xe0fake-jpeg" * 64
+
+
+class _Handler(BaseHTTPRequestHandler):
+    hits: dict = {}
+    active = 0
+    peak = 0
+    lock = threading.Lock()
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, body=b"", headers=None):
+        self.send_response(status)
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        with self.lock:
+            n = self.hits[self.path] = self.hits.get(self.path, 0) + 1
+        if self.path == "/flaky.jpg":
+            self._send(503) if n <= 2 else self._send(200, IMAGE)
+        elif self.path == "/missing.jpg":
+            self._send(404)
+        elif self.path.startswith("/slow/"):
+            with self.lock:
+                type(self).active += 1
+                type(self).peak = max(type(self).peak, type(self).active)
+            time.sleep(0.15)
+            with self.lock:
+                type(self).active -= 1
+            self._send(200, IMAGE)
+        elif self.path == "/etag.jpg":
+            if self.headers.get("If-None-Match") == '"v1"':
+                self._send(304, headers={"ETag": '"v1"'})
+            else:
+                self._send(200, IMAGE, {"ETag": '"v1"'})
+        else:
+            self._send(404)
+
+
+@pytest.fixture(scope="module")
+def base_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_503_recovers_on_retry(base_url):
+    fetcher = ImageFetcher(retries=3, backoff=0)
+    report = FetchReport("test")
+    assert fetcher.fetch(f"{base_url}/flaky.jpg", report) == IMAGE
+    assert _Handler.hits["/flaky.jpg"] == 3  # 503, 503, 200
+    assert report.ok == 1 and not report.failed
+    fetcher.close()
+
+
+def test_404_is_reported(base_url):
+    fetcher = ImageFetcher(retries=3, backoff=0)
+    report = FetchReport("test")
+    url = f"{base_url}/missing.jpg"
+    assert fetcher.fetch(url, report) is None
+    assert _Handler.hits["/missing.jpg"] == 1  # 404 prøves ikke på nytt
+    assert report.reason(url) == "HTTP 404"
+    assert report.reasons["HTTP 404"] == 1
+    fetcher.close()
+
+
+def test_per_host_cap(base_url):
+    fetcher = ImageFetcher(workers=8, per_host=2, backoff=0)
+    report = FetchReport("test")
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(lambda i: fetcher.fetch(f"{base_url}/slow/{i}.jpg", report), range(8)))
+    assert all(r == IMAGE for r in results)
+    assert _Handler.peak == 2
+    fetcher.close()
+
+
+def test_304_served_from_cache(base_url, tmp_path):
+    cache = ImageCache(str(tmp_path / "images"), max_bytes=10 * 1024 * 1024)
+    fetcher = ImageFetcher(backoff=0, cache=cache)
+    url = f"{base_url}/etag.jpg"
+
+    first = FetchReport("første")
+    assert fetcher.fetch(url, first) == IMAGE
+    assert first.not_modified == 0 and first.bytes == len(IMAGE)
+    assert cache.validators(url)["etag"] == '"v1"'
+
+    second = FetchReport("andre")
+    assert fetcher.fetch(url, second) == IMAGE
+    assert second.not_modified == 1 and second.bytes == 0  # 304 – bytes fra disk
+    assert cache.stats()["not_modified"] == 1
+    fetcher.close()
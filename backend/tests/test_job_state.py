@@ -0,0 +1,95 @@
+# backend/tests/test_job_state.py
+import json
+import os
+
+import pytest
+
+from fileio import atomic_write
+from job_state import JobCheckpoint, TableProgress
+
+PARAMS = {"tables": ["hm_products"], "dtype": "float32", "all": False, "force": False, "shard": None}
+
+
+def test_start_skips_prior_ranges():
+    progress = TableProgress(ranges=[[1, 5], [8, 9]])
+    assert progress.start([9, 1, 3, 6, 7, 8, 10]) == [6, 7, 10]
+    assert progress.is_done(4) and not progress.is_done(6)
+
+
+def test_ranges_merge_runs_with_prior():
+    progress = TableProgress(ranges=[[1, 5]])
+    progress.start(list(range(1, 11)) + [12])  # 11 er ikke valgt, så 10 og 12 er naboer i kjøringen
+    progress.mark([6, 7, 8])
+    progress.fail(9, "HTTP 404")
+    progress.mark([10, 12])
+    assert progress.ranges() == [[1, 8], [10, 12]]
+    progress.mark([9])  # vellykket forsøk fjerner feilen
+    assert progress.ranges() == [[1, 12]] and progress.failed == {}
+
+
+def test_settle_records_rows_that_were_never_marked():
+    progress = TableProgress()
+    progress.start([1, 2, 3, 4])
+    progress.mark([1])
+    progress.fail(2, "ugyldig bilde")
+    assert progress.settle("steg kastet") == 2
+    assert progress.failed == {2: "ugyldig bilde", 3: "steg kastet", 4: "steg kastet"}
+    assert progress.ranges() == [[1, 1]]
+    assert progress.settle() == 0  # allerede gjort opp
+
+
+def test_start_forgets_failed_ids_no_longer_selected():
+    progress = TableProgress(failed={"3": "HTTP 404", "99": "HTTP 500"})
+    progress.start([1, 2, 3])
+    assert progress.failed == {3: "HTTP 404"}
+
+
+def test_to_dict_round_trip(tmp_path):
+    path = str(tmp_path / "state.json")
+    checkpoint = JobCheckpoint.open(path, PARAMS, resume=False)
+    progress = checkpoint.table("hm_products")
+    progress.start([1, 2, 3, 5, 6])
+    progress.mark([1, 2, 3, 6])
+    progress.fail(5, "HTTP 404")
+    checkpoint.save()
+    assert os.listdir(tmp_path) == ["state.json"]  # ingen temp-filer igjen
+
+    with open(path, encoding="utf-8") as f:
+        saved = json.load(f)["tables"]["hm_products"]
+    assert saved == {"done": False, "cursor": 3, "ranges": [[1, 3], [6, 6]], "failed": {"5": "HTTP 404"}}
+
+    resumed = JobCheckpoint.open(path, PARAMS, resume=True)
+    again = resumed.table("hm_products")
+    assert again.to_dict() == saved
+    assert again.start([1, 2, 3, 5, 6, 7]) == [5, 7]
+    assert resumed.failures() == 1
+
+
+def test_open_ignores_other_params_and_finished_jobs(tmp_path):
+    path = str(tmp_path / "state.json")
+    checkpoint = JobCheckpoint.open(path, PARAMS, resume=True)  # finnes ikke ennå
+    checkpoint.table("hm_products").start([1])
+    checkpoint.table("hm_products").mark([1])
+    checkpoint.save()
+
+    assert JobCheckpoint.open(path, {**PARAMS, "dtype": "float16"}, resume=True).tables == {}
+    assert JobCheckpoint.open(path, PARAMS, resume=False).tables == {}
+    assert "hm_products" in JobCheckpoint.open(path, PARAMS, resume=True).tables
+
+    checkpoint.finished = True
+    checkpoint.save()
+    assert JobCheckpoint.open(path, PARAMS, resume=True).tables == {}
+
+
+def test_atomic_write_keeps_old_file_when_writer_fails(tmp_path):
+    path = str(tmp_path / "CURRENT")
+    atomic_write(path, lambda f: f.write("v1"), mode="w")
+
+    def broken(f):
+        f.write("v2")
+        raise RuntimeError("disk full")
+
+    with pytest.raises(RuntimeError):
+        atomic_write(path, broken, mode="w")
+    assert open(path, encoding="utf-8").read() == "v1"
+    assert os.listdir(tmp_path) == ["CURRENT"]
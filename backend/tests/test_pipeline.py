@@ -0,0 +1,107 @@
+# backend/tests/test_pipeline.py
+import threading
+import time
+
+import pytest
+
+from pipeline import SKIP, Pipeline
+
+
+def run_with_timeout(fn, timeout: float = 10.0):
+    """Kjører fn i en tråd, så en pipeline som henger feiler testen i stedet for å henge den."""
+    box = {}
+
+    def target():
+        try:
+            box["result"] = fn()
+        except BaseException as e:
+            box["error"] = e
+    t = threading.Thread(target=target, daemon=True)
+    t.start()
+    t.join(timeout)
+    assert not t.is_alive(), "pipelinen ble ikke ferdig"
+    if "error" in box:
+        raise box["error"]
+    return box["result"]
+
+
+def test_source_map_batch_chain():
+    p = Pipeline(queue_size=8)
+    q = p.source("rader", range(100))
+    q = p.map("dobbel", lambda x: x * 2, q, workers=4)
+    q = p.batch("sum", lambda items: [x + 1 for x in items], q, batch_size=16)
+    out = run_with_timeout(lambda: list(p.run(q)))
+    assert sorted(out) == [x * 2 + 1 for x in range(100)]
+    assert [s.items for s in p.stages] == [100, 100, 100]
+    assert all(s.finished is not None for s in p.stages)
+
+
+def test_map_counts_skip_none_and_exceptions_without_forwarding():
+    def fn(x):
+        if x % 5 == 0:
+            return SKIP
+        if x % 5 == 1:
+            return None
+        if x % 5 == 2:
+            raise ValueError("ødelagt bilde")
+        return x
+
+    p = Pipeline(queue_size=4)
+    q = p.map("steg", fn, p.source("rader", range(50)), workers=3)
+    out = run_with_timeout(lambda: list(p.run(q)))
+    stats = p.stages[1]
+    assert sorted(out) == [x for x in range(50) if x % 5 in (3, 4)]
+    assert (stats.items, stats.skipped, stats.failed) == (20, 10, 20)
+
+
+def test_batch_counts_dropped_results_and_flushes_partial_batches():
+    p = Pipeline(queue_size=4)
+    q = p.batch("par", lambda items: [x for x in items if x % 2 == 0], p.source("rader", range(10)),
+                batch_size=64, max_wait_s=0.01)
+    out = run_with_timeout(lambda: list(p.run(q)))
+    assert sorted(out) == [0, 2, 4, 6, 8]
+    assert (p.stages[1].items, p.stages[1].failed) == (5, 5)
+
+
+def test_bounded_queues_apply_backpressure():
+    pulled = []
+
+    def rows():
+        for i in range(1000):
+            pulled.append(i)
+            yield i
+
+    p = Pipeline(queue_size=2)
+    q = p.map("steg", lambda x: x, p.source("rader", rows()), workers=1)
+    it = p.run(q)
+    assert next(it) == 0
+    time.sleep(0.3)  # forbrukeren står stille: kilden skal stoppe når køene er fulle
+    assert len(pulled) <= 8  # 2 køer à 2 + ett element i hånden per tråd, ikke 1000
+    run_with_timeout(it.close)
+
+
+def test_exception_in_batch_stage_stops_pipeline_and_reraises():
+    def explode(items):
+        raise RuntimeError("modellen krasjet")
+
+    p = Pipeline(queue_size=2)
+    q = p.map("steg", lambda x: x, p.source("rader", range(10_000)), workers=4)
+    q = p.batch("clip", explode, q, batch_size=8)
+    with pytest.raises(RuntimeError, match="modellen krasjet"):
+        run_with_timeout(lambda: list(p.run(q)))
+    assert not any(t.is_alive() for t in p._threads)
+
+
+def test_consumer_stopping_early_ends_all_threads():
+    p = Pipeline(queue_size=2)
+    q = p.map("steg", lambda x: x, p.source("rader", range(10_000)), workers=4)
+
+    def take_three():
+        out = []
+        for item in p.run(q):
+            out.append(item)
+            if len(out) == 3:
+                break
+        return out
+    assert len(run_with_timeout(take_three)) == 3
+    assert not any(t.is_alive() for t in p._threads)
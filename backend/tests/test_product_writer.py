@@ -0,0 +1,129 @@
+# backend/tests/test_product_writer.py
+import mysql.connector
+import pytest
+
+import scraper_runtime
+from scraper_runtime import ProductWriter, SiteAdapter
+
+# ProductWriter mot en falsk MySQL-tilkobling som følger ON DUPLICATE KEY UPDATE-reglene
+# (rowcount 1 per ny, 2 per endret, 0 per uendret rad) og kan feile på execute/commit.
+
+
+class FakeDB:
+    def __init__(self, table=None, fail_commits=0, fail_multi=False):
+        self.table = dict(table or {})  # product_id -> rad
+        self.pending = {}
+        self.fail_commits = fail_commits
+        self.fail_multi = fail_multi
+        self.commits = 0
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        if self.fail_commits:
+            self.fail_commits -= 1
+            self.pending = {}
+            raise mysql.connector.Error("commit feilet")
+        self.table.update(self.pending)
+        self.pending = {}
+        self.commits += 1
+
+    def rollback(self):
+        self.pending = {}
+
+    def close(self):
+        pass
+
+
+class FakeCursor:
+    def __init__(self, db):
+        self.db = db
+        self.rowcount = 0
+
+    def execute(self, sql, params):
+        if sql.startswith("SELECT"):
+            self._one = (sum(pid in self.db.table for pid in params),)
+            return
+        rows = [tuple(params[i:i + 6]) for i in range(0, len(params), 6)]
+        if len(rows) > 1 and self.db.fail_multi:
+            raise mysql.connector.Error("ugyldig rad i biten")
+        if any(r[3] == "ugyldig" for r in rows):
+            raise mysql.connector.Error("ugyldig pris")
+        self.rowcount = 0
+        for r in rows:
+            old = self.db.pending.get(r[0], self.db.table.get(r[0]))
+            self.rowcount += 1 if old is None else (2 if old != r else 0)
+            self.db.pending[r[0]] = r
+
+    def fetchone(self):
+        return self._one
+
+    def close(self):
+        pass
+
+
+class Shop(SiteAdapter):
+    name = "test"
+    table = "test_products"
+
+
+def product(i, price=100.0):
+    return {"product_id": f"p{i}", "name": f"Produkt {i}", "category": "Tskjorte", "price": price,
+            "image_url": f"https://img/{i}.jpg", "product_link": f"https://shop/{i}"}
+
+
+def row(i, price=100.0):
+    p = product(i, price)
+    return tuple(p[c] for c in ProductWriter.COLUMNS)
+
+
+@pytest.fixture
+def connect(monkeypatch):
+    def use(db):
+        monkeypatch.setattr(scraper_runtime.mysql.connector, "connect", lambda **kw: db)
+        return db
+    return use
+
+
+def test_count():
+    # 5 rader, 3 fantes: 2 nye (2) + 1 endret (2) + 2 uendret (0) -> rowcount 4
+    assert ProductWriter._count(5, 3, 4) == (2, 1, 2)
+    assert ProductWriter._count(1, 0, 1) == (1, 0, 0)
+    assert ProductWriter._count(1, 1, 2) == (0, 1, 0)
+    assert ProductWriter._count(1, 1, 0) == (0, 0, 1)
+
+
+def test_chunks_count_inserted_updated_unchanged(connect):
+    db = connect(FakeDB({"p0": row(0), "p1": row(1)}))
+    writer = ProductWriter(Shop(), chunk_size=2)
+    writer.add([product(0), product(1, 200.0), product(2), product(2)])  # p2 to ganger i samme bit
+    writer.close()
+    assert (writer.inserted, writer.updated, writer.unchanged, writer.failed) == (1, 1, 1, 0)
+    assert db.table["p1"][3] == 200.0 and "p2" in db.table
+
+
+def test_failed_commit_falls_back_row_by_row_and_counts_once(connect):
+    db = connect(FakeDB({"p0": row(0)}, fail_commits=1))
+    writer = ProductWriter(Shop(), chunk_size=10)
+    writer.add([product(0), product(1), product(2)])
+    writer.close()
+    assert (writer.inserted, writer.updated, writer.unchanged, writer.failed) == (2, 0, 1, 0)
+    assert set(db.table) == {"p0", "p1", "p2"}
+
+
+def test_bad_row_only_loses_that_row(connect):
+    connect(FakeDB(fail_multi=True))
+    writer = ProductWriter(Shop(), chunk_size=10)
+    writer.add([product(1), product(2, "ugyldig"), product(3)])
+    writer.close()
+    assert (writer.inserted, writer.failed) == (2, 1)
+
+
+def test_rolled_back_fallback_is_reported_once_as_failed(connect):
+    db = connect(FakeDB(fail_commits=2))  # både biten og rad-for-rad-commit-en feiler
+    writer = ProductWriter(Shop(), chunk_size=10)
+    writer.add([product(1), product(2), product(3)])
+    writer.close()
+    assert (writer.inserted, writer.updated, writer.unchanged, writer.failed) == (0, 0, 0, 3)
+    assert db.table == {}
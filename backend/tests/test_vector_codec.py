@@ -0,0 +1,64 @@
+# backend/tests/test_vector_codec.py
+import struct
+
+import numpy as np
+import pytest
+import torch
+
+from vector_codec import HEADER, decode_vector, encode_vector, is_binary
+
+
+def test_header_layout():
+    raw = encode_vector(np.arange(512, dtype=np.float32))
+    assert HEADER.size == 8
+    assert raw[:8] == b"SMV1" + bytes([0, 0]) + struct.pack("<H", 512)
+    assert len(raw) == 8 + 512 * 4
+    assert encode_vector(np.zeros(3), "float16")[4] == 1
+
+
+def test_float32_round_trip_is_exact():
+    vec = np.random.default_rng(0).standard_normal(512).astype(np.float32)
+    out = decode_vector(encode_vector(vec))
+    assert out.dtype == np.float32 and np.array_equal(out, vec)
+
+
+def test_float16_round_trip_within_half_precision():
+    vec = np.random.default_rng(1).standard_normal(512).astype(np.float32)
+    vec /= np.linalg.norm(vec)
+    raw = encode_vector(vec, "float16")
+    assert len(raw) == 8 + 512 * 2
+    out = decode_vector(raw)
+    assert out.dtype == np.float16
+    assert np.allclose(out.astype(np.float32), vec, atol=1e-3)
+
+
+def test_accepts_tensor_and_list_and_decodes_memoryview():
+    raw = encode_vector(torch.tensor([1.0, 2.0, 3.0]))
+    assert raw == encode_vector([1.0, 2.0, 3.0])
+    assert decode_vector(memoryview(raw)).tolist() == [1.0, 2.0, 3.0]
+    assert decode_vector(bytearray(raw)).tolist() == [1.0, 2.0, 3.0]
+
+
+@pytest.mark.parametrize("raw", ["[0.5, -1.0, 2.0]", b"[0.5, -1.0, 2.0]"])
+def test_json_fallback(raw):
+    out = decode_vector(raw)
+    assert not is_binary(raw)
+    assert out.dtype == np.float32 and out.tolist() == [0.5, -1.0, 2.0]
+
+
+def test_rejects_bad_input():
+    good = encode_vector([1.0, 2.0])
+    with pytest.raises(ValueError, match="For kort"):
+        decode_vector(good[:6])
+    with pytest.raises(ValueError, match="Ukjent dtype-kode"):
+        decode_vector(HEADER.pack(b"SMV1", 7, 2) + good[8:])
+    with pytest.raises(ValueError, match="matcher ikke"):
+        decode_vector(good[:-1])
+    with pytest.raises(ValueError, match="matcher ikke"):
+        decode_vector(HEADER.pack(b"SMV1", 0, 3) + good[8:])
+    with pytest.raises(ValueError, match="NULL"):
+        decode_vector(None)
+    with pytest.raises(ValueError):
+        decode_vector(b"ikke json")
+    with pytest.raises(ValueError, match="Ukjent dtype"):
+        encode_vector([1.0], "int8")
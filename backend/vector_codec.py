@@ -0,0 +1,110 @@
+# backend/vector_codec.py
+import json
+import struct
+
+import numpy as np
+
+# Binærformat for feature_vector (BLOB):
+#   8 byte header: magic "SMV1" | dtype-kode (u8) | pad (u8) | dimensjon (u16, little-endian)
+#   deretter dim * little-endian float32 (eller float16)
+# Headeren er 8 byte slik at data-delen er justert og kan leses zero-copy med np.frombuffer.
+MAGIC = b"SMV1"
+HEADER = struct.Struct("<4sBxH")
+DTYPES = {0: np.dtype("<f4"), 1: np.dtype("<f2")}
+DTYPE_CODES = {"float32": 0, "float16": 1}
+
+
+def encode_vector(vec, dtype: str = "float32") -> bytes:
+    """np.ndarray / torch.Tensor / liste (D,) -> header + rå little-endian bytes."""
+    if dtype not in DTYPE_CODES:
+        raise ValueError(f"Ukjent dtype: {dtype} (bruk {', '.join(DTYPE_CODES)})")
+    code = DTYPE_CODES[dtype]
+    if hasattr(vec, "detach"):  # torch.Tensor
+        vec = vec.detach().cpu().numpy()
+    arr = np.asarray(vec, dtype=DTYPES[code]).reshape(-1)
+    return HEADER.pack(MAGIC, code, arr.shape[0]) + arr.tobytes()
+
+
+def is_binary(raw) -> bool:
+    return isinstance(raw, (bytes, bytearray, memoryview)) and bytes(raw[:4]) == MAGIC
+
+
+def decode_vector(raw) -> np.ndarray:
+    """
+    Leser feature_vector uansett lagringsformat:
+      - binær (SMV1): zero-copy view over bufferen (dtype som lagret, float32 eller float16)
+      - gammel JSON-tekst ("[0.1, ...]", str eller bytes etter ALTER til BLOB): json.loads
+    Kaster ValueError ved ugyldig innhold.
+    """
+    if raw is None:
+        raise ValueError("feature_vector er NULL")
+    if is_binary(raw):
+        if len(raw) < HEADER.size:
+            raise ValueError("For kort vektor-header")
+        _, code, dim = HEADER.unpack_from(raw)
+        dt = DTYPES.get(code)
+        if dt is None:
+            raise ValueError(f"Ukjent dtype-kode: {code}")
+        if len(raw) != HEADER.size + dim * dt.itemsize:
+            raise ValueError("Vektorlengde matcher ikke headeren")
+        return np.frombuffer(raw, dtype=dt, count=dim, offset=HEADER.size)
+    if isinstance(raw, (bytes, bytearray, memoryview)):
+        raw = bytes(raw).decode("utf-8")
+    return np.asarray(json.loads(raw), dtype=np.float32)
+
+
+def ensure_blob_column(cursor, table: str, column: str = "feature_vector") -> bool:
+    """
+    Sørger for at vektorkolonnen er BLOB (binærdata kan ikke lagres i TEXT).
+    Eksisterende JSON-tekst beholdes som bytes og kan fortsatt leses av decode_vector.
+    Returnerer True hvis kolonnen ble endret.
+    """
+    cursor.execute(
+        "SELECT DATA_TYPE FROM information_schema.COLUMNS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s",
+        (table, column),
+    )
+    row = cursor.fetchone()
+    if row is None:
+        raise ValueError(f"Fant ikke kolonnen {table}.{column}")
+    data_type = row["DATA_TYPE"] if isinstance(row, dict) else row[0]
+    if isinstance(data_type, (bytes, bytearray)):
+        data_type = data_type.decode("utf-8")
+    data_type = data_type.lower()
+    if data_type.endswith("blob"):
+        return False
+    cursor.execute(f"ALTER TABLE {table} MODIFY {column} BLOB NULL")
+    return True
+
+
+# Sporing av hva en vektor ble laget fra, så jobben bare beregner rader der bilde eller modell er endret
+EMBEDDING_COLUMNS = {
+    "image_hash": "CHAR(40) NULL",        # blake2b (20 byte, hex) av bildebytes
+    "embedding_model": "VARCHAR(100) NULL",
+}
+
+
+def ensure_embedding_columns(cursor, table: str) -> list[str]:
+    """Legger til image_hash/embedding_model hvis de mangler. Returnerer kolonnene som ble lagt til."""
+    cursor.execute(
+        "SELECT COLUMN_NAME FROM information_schema.COLUMNS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s",
+        (table,),
+    )
+    existing = set()
+    for row in cursor.fetchall():
+        name = row["COLUMN_NAME"] if isinstance(row, dict) else row[0]
+        if isinstance(name, (bytes, bytearray)):
+            name = name.decode("utf-8")
+        existing.add(name.lower())
+    added = []
+    for column, ddl in EMBEDDING_COLUMNS.items():
+        if column not in existing:
+            try:
+                cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}")
+            except Exception as e:
+                if getattr(e, "errno", None) == 1060:  # ER_DUP_FIELDNAME: en annen shard rakk det først
+                    continue
+                raise
+            added.append(column)
+    return added
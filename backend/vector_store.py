@@ -0,0 +1,264 @@
+# backend/vector_store.py
+import os
+import json
+import glob
+import time
+from decimal import Decimal
+
+import numpy as np
+import mysql.connector
+
+from fileio import atomic_write
+from vector_codec import decode_vector
+from ann_index import IVFIndex, PQIndex, topk_exact, default_nlist
+from categories import main_categories, resolve_category
+
+# Feltene vi trenger for å vise et treff (samme som server.js /analyze returnerte)
+META_FIELDS = ("id", "name", "price", "image_url", "product_link", "category")
+
+# Snapshot på disk: vectors-<versjon>.npy + meta-<versjon>.json, og CURRENT peker på aktiv versjon
+SNAPSHOT_POINTER = "CURRENT"
+SNAPSHOT_KEEP = 3  # behold noen gamle versjoner så lesere midt i et bytte ikke mister filen
+
+
+def _to_jsonable(value):
+    """MySQL gir DECIMAL for pris – gjør om til float så svaret kan serialiseres."""
+    if isinstance(value, Decimal):
+        return float(value)
+    return value
+
+
+class VectorStore:
+    """
+    Holder alle produktvektorer i minnet som én sammenhengende float32-matrise (N, D),
+    med en parallell metadata-liste (én dict per rad, inkl. hvilken tabell raden kom fra).
+    Søk = én matrise-vektor-multiplikasjon + argpartition for topp-k,
+    eller via en indeks: IVF (attach_ivf) scorer bare de nærmeste klyngene,
+    PQ (attach_pq) scorer komprimerte koder og re-ranker topp-kandidatene eksakt.
+    """
+
+    def __init__(self, matrix: np.ndarray, meta: list[dict], version: str | None = None):
+        if matrix.ndim != 2 or matrix.shape[0] != len(meta):
+            raise ValueError("matrix og meta må ha like mange rader")
+        # NB: for np.memmap (snapshot) blir dette et view – ingen kopi i minnet
+        self.matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+        self.meta = meta
+        self.version = version
+        self.index: IVFIndex | PQIndex | None = None
+        self._partitions: dict[str, np.ndarray] | None = None
+
+    @property
+    def size(self) -> int:
+        return self.matrix.shape[0]
+
+    @property
+    def dim(self) -> int:
+        return self.matrix.shape[1]
+
+    @classmethod
+    def empty(cls, dim: int = 0) -> "VectorStore":
+        return cls(np.empty((0, dim), dtype=np.float32), [])
+
+    @classmethod
+    def from_db(cls, db_config: dict, tables: list[str]) -> "VectorStore":
+        """
+        Leser feature_vector fra alle tabeller ÉN gang (ved oppstart).
+        Både binære BLOB-er og gammel JSON-tekst støttes (vector_codec.decode_vector).
+        Rader med korrupt innhold eller feil dimensjon hoppes over.
+        """
+        started = time.time()
+        vectors: list[np.ndarray] = []
+        meta: list[dict] = []
+        dim = None
+        skipped = 0
+
+        conn = mysql.connector.connect(**db_config)
+        try:
+            cursor = conn.cursor(dictionary=True)
+            cols = ", ".join(META_FIELDS)
+            for table in tables:
+                cursor.execute(f"SELECT {cols}, feature_vector FROM {table} WHERE feature_vector IS NOT NULL")
+                for row in cursor.fetchall():
+                    try:
+                        vec = decode_vector(row["feature_vector"])
+                    except ValueError:
+                        skipped += 1
+                        continue
+                    if vec.ndim != 1:
+                        skipped += 1
+                        continue
+                    if dim is None:
+                        dim = vec.shape[0]
+                    if vec.shape[0] != dim:
+                        skipped += 1  # dimensjonsmismatch
+                        continue
+                    vectors.append(vec)
+                    item = {f: _to_jsonable(row[f]) for f in META_FIELDS}
+                    item["table"] = table
+                    meta.append(item)
+            cursor.close()
+        finally:
+            conn.close()
+
+        if not vectors:
+            return cls.empty(dim or 0)
+        store = cls(np.stack(vectors), meta)
+        print(f"[VEKTOR] Lastet {store.size} vektorer (D={store.dim}) på {time.time()-started:.1f}s"
+              + (f", hoppet over {skipped}" if skipped else ""))
+        return store
+
+    @classmethod
+    def from_snapshot(cls, snapshot_dir: str, version: str | None = None) -> "VectorStore":
+        """
+        Åpner et snapshot skrevet av write_snapshot() med np.memmap (mmap_mode="r").
+        Flere uvicorn-workere deler da samme sidecache i stedet for hver sin kopi.
+        """
+        version = version or snapshot_version(snapshot_dir)
+        if version is None:
+            raise FileNotFoundError(f"Ingen snapshot i {snapshot_dir}")
+        started = time.time()
+        matrix = np.load(os.path.join(snapshot_dir, f"vectors-{version}.npy"), mmap_mode="r")
+        with open(os.path.join(snapshot_dir, f"meta-{version}.json"), encoding="utf-8") as f:
+            meta = json.load(f)["items"]
+        store = cls(matrix, meta, version=version)
+        print(f"[VEKTOR] Snapshot {version}: {store.size} vektorer (D={store.dim}) på {time.time()-started:.2f}s")
+        return store
+
+    @property
+    def partitions(self) -> dict[str, np.ndarray]:
+        """
+        Radnumre per hovedkategori (categories.CATEGORY_MAPPING), bygget én gang fra meta.
+        Et produkt kan ligge i flere partisjoner, samme regel som kategorisidene.
+        """
+        if self._partitions is None:
+            rows: dict[str, list[int]] = {}
+            for i, item in enumerate(self.meta):
+                for main in main_categories(item.get("category")):
+                    rows.setdefault(main, []).append(i)
+            self._partitions = {main: np.asarray(ids, dtype=np.int64) for main, ids in rows.items()}
+        return self._partitions
+
+    def search(self, query: np.ndarray, k: int = 9, category: str | None = None) -> list[tuple[int, float]]:
+        """
+        Returnerer [(radindeks, score), ...] sortert synkende.
+        Forutsetter L2-normaliserte vektorer (dot == cosine).
+        category: scor bare partisjonen for denne hovedkategorien (ukjent kategori -> ingen treff).
+        """
+        if self.size == 0 or k <= 0:
+            return []
+        q = np.asarray(query, dtype=np.float32).reshape(-1)
+        if q.shape[0] != self.dim:
+            raise ValueError(f"Feil dimensjon på spørrevektor: {q.shape[0]} != {self.dim}")
+        if category:
+            ids = self.partitions.get(resolve_category(category))
+            if ids is None:
+                return []
+            if isinstance(self.index, PQIndex):
+                return self.index.search(self.matrix, q, k, ids=ids)  # PQ over partisjonen + re-rank
+            return topk_exact(self.matrix, q, k, ids)  # partisjonen er liten nok til eksakt scoring
+        if self.index is not None:
+            return self.index.search(self.matrix, q, k)
+        return topk_exact(self.matrix, q, k)  # (N,) – ett BLAS-kall
+
+    def _cached_index(self, cache_dir: str | None, name: str, load_fn, build_fn):
+        """
+        Laster en indeks fra cache_dir/<name> hvis den finnes og passer, ellers bygges den
+        (og lagres der). Med snapshot ligger filene ved siden av, så neste oppstart/worker slipper treningen.
+        """
+        path = os.path.join(cache_dir, name) if cache_dir and self.version else None
+        if path and os.path.exists(path):
+            index = load_fn(path)
+            if index.count == self.size:
+                return index
+        index = build_fn()  # mangler eller utdatert – bygg på nytt
+        if path:
+            try:
+                index.save(path)
+            except OSError as e:
+                print(f"[VEKTOR] Kunne ikke lagre {path}: {e}")
+        return index
+
+    def attach_ivf(self, nlist: int | None = None, nprobe: int = 8, cache_dir: str | None = None) -> IVFIndex | None:
+        """Bygger/laster en IVF-indeks (ivf-<versjon>-<nlist>.npz) og bruker den i search()."""
+        if self.size == 0:
+            return None
+        nlist = min(nlist or default_nlist(self.size), self.size)  # IVF_NLIST større enn katalogen gir færre lister
+        self.index = self._cached_index(
+            cache_dir, f"ivf-{self.version}-{nlist}.npz",
+            lambda path: IVFIndex.load(path, nprobe=nprobe),
+            lambda: IVFIndex.build(self.matrix, nlist=nlist, nprobe=nprobe),
+        )
+        return self.index
+
+    def attach_pq(self, m: int = 64, rerank: int = 100, cache_dir: str | None = None,
+                  ivf: bool = False, nlist: int | None = None, nprobe: int = 8) -> PQIndex | None:
+        """
+        Bygger/laster en PQ-indeks (pq-<versjon>-<m>.npz) og bruker den i search():
+        ADC over m-byte koder + eksakt re-rank av `rerank` kandidater. ivf=True gir IVF-PQ.
+        """
+        if self.size == 0:
+            return None
+        coarse = self.attach_ivf(nlist, nprobe, cache_dir) if ivf else None
+        self.index = self._cached_index(
+            cache_dir, f"pq-{self.version}-{m}.npz",
+            lambda path: PQIndex.load(path, rerank=rerank, ivf=coarse),
+            lambda: PQIndex.build(self.matrix, m=m, rerank=rerank, ivf=coarse),
+        )
+        return self.index
+
+    def hits(self, query: np.ndarray, k: int = 9, category: str | None = None) -> list[dict]:
+        """Som search(), men returnerer metadata + 'similarity' klar for JSON."""
+        return [{**self.meta[i], "similarity": s} for i, s in self.search(query, k, category)]
+
+
+# ---------- Snapshot (eksport/versjonering) ----------
+def snapshot_version(snapshot_dir: str) -> str | None:
+    """Leser aktiv versjon fra CURRENT (None hvis det ikke finnes noe snapshot)."""
+    try:
+        with open(os.path.join(snapshot_dir, SNAPSHOT_POINTER), encoding="utf-8") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def write_snapshot(store: VectorStore, snapshot_dir: str, before_publish=None) -> str:
+    """
+    Skriver matrise + metadata som ny versjon og bytter CURRENT atomisk til den.
+    before_publish(store) kjøres etter at filene er skrevet og før CURRENT byttes (store.version er satt),
+    f.eks. for å bygge søkeindeksen ved siden av, så serveren bare laster den. Returnerer versjonsnavnet.
+    """
+    os.makedirs(snapshot_dir, exist_ok=True)
+    version = time.strftime("%Y%m%d-%H%M%S")
+    if os.path.exists(os.path.join(snapshot_dir, f"vectors-{version}.npy")):
+        version += f"-{os.getpid()}"
+
+    matrix = np.ascontiguousarray(store.matrix, dtype=np.float32)
+    atomic_write(os.path.join(snapshot_dir, f"vectors-{version}.npy"), lambda f: np.save(f, matrix))
+    manifest = {"version": version, "count": store.size, "dim": store.dim, "items": store.meta}
+    atomic_write(os.path.join(snapshot_dir, f"meta-{version}.json"),
+                  lambda f: json.dump(manifest, f, ensure_ascii=False), mode="w")
+    if before_publish is not None:
+        store.version = version
+        before_publish(store)
+    # Data først, peker sist: en leser som ser ny CURRENT finner alltid begge filene
+    atomic_write(os.path.join(snapshot_dir, SNAPSHOT_POINTER), lambda f: f.write(version), mode="w")
+
+    _prune_snapshots(snapshot_dir, keep=SNAPSHOT_KEEP)
+    return version
+
+
+def _prune_snapshots(snapshot_dir: str, keep: int):
+    versions = sorted(
+        os.path.basename(p)[len("vectors-"):-len(".npy")]
+        for p in glob.glob(os.path.join(snapshot_dir, "vectors-*.npy"))
+    )
+    for old in versions[:-keep]:
+        # inkl. indekser som er bygget for denne versjonen (ivf-/pq-<versjon>-*.npz)
+        paths = [os.path.join(snapshot_dir, f"vectors-{old}.npy"), os.path.join(snapshot_dir, f"meta-{old}.json")]
+        for kind in ("ivf", "pq"):
+            paths += glob.glob(os.path.join(snapshot_dir, f"{kind}-{old}-*.npz"))
+        for path in paths:
+            try:
+                os.remove(path)
+            except OSError:
+                pass